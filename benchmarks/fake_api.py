@@ -0,0 +1,245 @@
+"""
+Local stand-in for the Hydrology API used by the benchmarks.
+
+Serves synthetic stations, a measure catalogue and deterministic readings
+(one every 15 minutes from START_EPOCH) with the paging and filter parameters
+the pipeline uses: `_limit`, `_offset`, `_sort`, `mineq-dateTime` and
+`max-dateTime` on readings.json/readings.csv, `/data/readings.json` with
+repeated `measure` parameters, `/id/stations.json` and `/id/measures.json`.
+`/__stats` reports the number of requests served.
+
+Run standalone with `python -m benchmarks.fake_api --port 8080`; the first
+line printed is the base URL.
+"""
+
+import argparse
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from src.hydrology_pipeline.transform import epoch_to_iso, parse_epoch
+
+START_EPOCH = 1_704_067_200  # 2024-01-01T00:00:00Z
+INTERVAL = 900
+
+# Measures served for every station: (suffix, parameter, unit)
+MEASURE_KINDS = [
+    ("cond-i-subdaily-uS", "conductivity", "uS/cm"),
+    ("do-i-subdaily-mgL", "dissolved-oxygen", "mg/L"),
+]
+
+
+class FakeHydrologyApi:
+    """
+    Threaded HTTP server answering Hydrology API requests with synthetic data.
+
+    `stations` stations (FAKE0000, FAKE0001, ...) each have the measures of
+    MEASURE_KINDS with `readings_per_measure` readings. Every request is
+    delayed by `latency` seconds to model network round trips.
+    """
+
+    def __init__(
+        self,
+        stations: int = 10,
+        readings_per_measure: int = 10_000,
+        latency: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.stations = stations
+        self.readings_per_measure = readings_per_measure
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeHydrologyApi":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeHydrologyApi":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def station_ids(self) -> List[str]:
+        return [f"FAKE{i:04d}" for i in range(self.stations)]
+
+    def measure_ids(self, station_id: str) -> List[str]:
+        return [f"{station_id}-{suffix}" for suffix, _, _ in MEASURE_KINDS]
+
+    def _station(self, notation: str) -> Optional[Dict[str, Any]]:
+        if notation not in self.station_ids():
+            return None
+        return {
+            "@id": f"{self.base_url}/id/stations/{notation}",
+            "notation": notation,
+            "label": f"Fake station {notation}",
+            "lat": 53.0,
+            "long": -1.5,
+            "riverName": "Fake River",
+            "dateOpened": "2000-01-01",
+            "measures": [{"@id": f"{self.base_url}/id/measures/{m}"} for m in self.measure_ids(notation)],
+        }
+
+    def _measures(self) -> List[Dict[str, Any]]:
+        items = []
+        for station_id in self.station_ids():
+            for suffix, parameter, unit in MEASURE_KINDS:
+                items.append({
+                    "@id": f"{self.base_url}/id/measures/{station_id}-{suffix}",
+                    "notation": f"{station_id}-{suffix}",
+                    "station": {"@id": f"{self.base_url}/id/stations/{station_id}"},
+                    "parameter": parameter,
+                    "unitName": unit,
+                    "period": INTERVAL,
+                    "valueType": "instantaneous",
+                })
+        return items
+
+    def _index_range(self, query: Dict[str, List[str]]) -> Tuple[int, int]:
+        """Reading indexes matching the mineq-dateTime / max-dateTime filters."""
+        lo, hi = 0, self.readings_per_measure
+        if "mineq-dateTime" in query:
+            lo = max(lo, math.ceil((parse_epoch(query["mineq-dateTime"][0]) - START_EPOCH) / INTERVAL))
+        if "max-dateTime" in query:
+            hi = min(hi, math.ceil((parse_epoch(query["max-dateTime"][0]) - START_EPOCH) / INTERVAL))
+        return lo, max(lo, hi)
+
+    @staticmethod
+    def _page(query: Dict[str, List[str]], total: int) -> Tuple[int, int]:
+        offset = int(query.get("_offset", ["0"])[0])
+        limit = int(query.get("_limit", [str(total)])[0])
+        return offset, min(total, offset + limit)
+
+    def _readings(self, measure_id: str, query: Dict[str, List[str]]) -> List[Tuple[int, float]]:
+        lo, hi = self._index_range(query)
+        indexes = range(lo, hi)
+        if query.get("_sort", [""])[0] == "-dateTime":
+            indexes = indexes[::-1]
+        start, stop = self._page(query, len(indexes))
+        seed = sum(map(ord, measure_id)) % 100
+        return [(START_EPOCH + i * INTERVAL, round(seed + math.sin(i / 96) * 10, 3)) for i in indexes[start:stop]]
+
+    def _station_readings(self, query: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        measures = [m for m in query.get("measure", []) if m.split("-", 1)[0] in self.station_ids()]
+        lo, hi = self._index_range(query)
+        start, stop = self._page(query, (hi - lo) * len(measures))
+        items = []
+        for k in range(start, stop):
+            measure_id = measures[k % len(measures)]
+            epoch = START_EPOCH + (lo + k // len(measures)) * INTERVAL
+            items.append({
+                "measure": {"@id": f"{self.base_url}/id/measures/{measure_id}"},
+                "dateTime": epoch_to_iso(epoch),
+                "value": round(math.sin(k) * 10, 3),
+                "quality": "Good",
+            })
+        return items
+
+    def route(self, path: str, query: Dict[str, List[str]]) -> Tuple[int, str, str]:
+        """Return (status, content type, body) for a request."""
+        if path == "/__stats":
+            return 200, "application/json", json.dumps({"requests": self.requests})
+
+        parts = path.strip("/").split("/")
+
+        if parts == ["id", "stations.json"]:
+            stations = [self._station(notation) for notation in self.station_ids()]
+            start, stop = self._page(query, len(stations))
+            return 200, "application/json", json.dumps({"items": stations[start:stop]})
+
+        if parts[:2] == ["id", "stations"] and len(parts) == 3 and parts[2].endswith(".json"):
+            station = self._station(parts[2][: -len(".json")])
+            return 200, "application/json", json.dumps({"items": [station] if station else []})
+
+        if parts == ["id", "measures.json"]:
+            measures = self._measures()
+            start, stop = self._page(query, len(measures))
+            return 200, "application/json", json.dumps({"items": measures[start:stop]})
+
+        if parts[:2] == ["id", "measures"] and len(parts) == 4:
+            measure_id, resource = parts[2], parts[3]
+            if measure_id.split("-", 1)[0] not in self.station_ids():
+                return 404, "application/json", json.dumps({"error": "unknown measure"})
+            readings = self._readings(measure_id, query)
+            if resource == "readings.json":
+                items = [
+                    {"dateTime": epoch_to_iso(e), "value": v, "quality": "Good"} for e, v in readings
+                ]
+                return 200, "application/json", json.dumps({"items": items})
+            if resource == "readings.csv":
+                lines = ["measure,dateTime,date,value,quality"]
+                lines.extend(f"{measure_id},{epoch_to_iso(e)},,{v},Good" for e, v in readings)
+                return 200, "text/csv", "\n".join(lines) + "\n"
+
+        if parts == ["data", "readings.json"]:
+            return 200, "application/json", json.dumps({"items": self._station_readings(query)})
+
+        return 404, "application/json", json.dumps({"error": f"no route for {path}"})
+
+    def _handler(self) -> type:
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                if url.path != "/__stats":
+                    with api._lock:
+                        api.requests += 1
+                    if api.latency:
+                        time.sleep(api.latency)
+                status, content_type, body = api.route(url.path, parse_qs(url.query))
+                payload = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Serve a synthetic Hydrology API for benchmarks")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    p.add_argument("--stations", type=int, default=10)
+    p.add_argument("--readings", type=int, default=10_000, help="Readings per measure")
+    p.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request")
+    args = p.parse_args()
+
+    api = FakeHydrologyApi(args.stations, args.readings, args.latency_ms / 1000, args.host, args.port)
+    print(api.base_url, flush=True)
+    try:
+        api._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Offline benchmark suite for the hydrology pipeline.
+
+Starts the local API stand-in (benchmarks/fake_api.py) in a subprocess,
+points the pipeline at it through HYDROLOGY_BASE_URL and runs each scenario
+in a fresh process, so peak RSS is measured per scenario. Reports rows/s,
+requests/s and peak RSS, and compares them with a saved baseline:
+
+    python -m benchmarks.run                      # run and print
+    python -m benchmarks.run --save-baseline      # store benchmarks/baselines/<size>.json
+    python -m benchmarks.run --check              # exit 1 on regressions beyond --threshold
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.fake_api import INTERVAL, START_EPOCH
+from src.hydrology_pipeline.api_client import HydrologyClient, set_default_client
+from src.hydrology_pipeline.config import PipelineConfig
+from src.hydrology_pipeline.db import connect, init_db, insert_measurements
+from src.hydrology_pipeline.extract import iter_readings
+from src.hydrology_pipeline.pipeline import run_many
+from src.hydrology_pipeline.transform import epoch_to_iso, normalize_reading, normalize_readings
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+# rows: synthetic rows for in-process scenarios; stations/readings: fake API size
+SIZES: Dict[str, Dict[str, int]] = {
+    "small": {"rows": 20_000, "stations": 4, "readings": 5_000},
+    "medium": {"rows": 200_000, "stations": 10, "readings": 20_000},
+    "large": {"rows": 1_000_000, "stations": 20, "readings": 100_000},
+}
+
+
+def _payloads(count: int) -> List[Dict[str, Any]]:
+    return [
+        {"dateTime": epoch_to_iso(START_EPOCH + i * INTERVAL), "value": i * 0.5, "quality": "Good"}
+        for i in range(count)
+    ]
+
+
+def bench_normalize_reading(opts: Dict[str, Any]) -> int:
+    payloads = _payloads(opts["rows"])
+    start = time.perf_counter()
+    for p in payloads:
+        normalize_reading(p, "S1", "conductivity", "M1")
+    opts["seconds"] = time.perf_counter() - start
+    return len(payloads)
+
+
+def bench_normalize_readings(opts: Dict[str, Any]) -> int:
+    payloads = _payloads(opts["rows"])
+    start = time.perf_counter()
+    batch = normalize_readings(payloads, "S1", "conductivity", "M1")
+    opts["seconds"] = time.perf_counter() - start
+    return len(batch)
+
+
+def bench_insert_measurements(opts: Dict[str, Any]) -> int:
+    payloads = _payloads(opts["rows"])
+    rows = [normalize_reading(p, "S1", "conductivity", "M1") for p in payloads]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "bench.db", wal=opts["wal"])
+        init_db(conn)
+        start = time.perf_counter()
+        inserted = insert_measurements(conn, rows)
+        opts["seconds"] = time.perf_counter() - start
+        conn.close()
+    return inserted
+
+
+def bench_extract(opts: Dict[str, Any]) -> int:
+    pages = iter_readings("FAKE0000-cond-i-subdaily-uS", since=epoch_to_iso(START_EPOCH), page_size=opts["page_size"])
+    return sum(len(page) for page in pages)
+
+
+def bench_pipeline(opts: Dict[str, Any]) -> int:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        configs = [
+            PipelineConfig(
+                station_notation=f"FAKE{i:04d}",
+                required_station_label=None,
+                db_path=Path(tmpdir) / "bench.db",
+                since=epoch_to_iso(START_EPOCH),
+                page_size=opts["page_size"],
+                wal=opts["wal"],
+            )
+            for i in range(opts["stations"])
+        ]
+        return run_many(configs, max_workers=opts["workers"])
+
+
+# Scenario name -> function returning the number of rows processed
+SCENARIOS: Dict[str, Callable[[Dict[str, Any]], int]] = {
+    "normalize_reading": bench_normalize_reading,
+    "normalize_readings": bench_normalize_readings,
+    "insert_measurements": bench_insert_measurements,
+    "extract": bench_extract,
+    "pipeline": bench_pipeline,
+}
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_child(name: str, opts: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one scenario in the current (fresh) process."""
+    set_default_client(HydrologyClient(pool_size=max(16, opts["workers"]), rate_limit=None))
+    start = time.perf_counter()
+    rows = SCENARIOS[name](opts)
+    seconds = opts.get("seconds", time.perf_counter() - start)
+    return {"rows": rows, "seconds": seconds, "peak_rss_mb": _peak_rss_mb()}
+
+
+def _requests_served(base_url: str) -> int:
+    return requests.get(f"{base_url}/__stats", timeout=10).json()["requests"]
+
+
+def run_scenario(name: str, opts: Dict[str, Any], base_url: str, repeat: int) -> Dict[str, Any]:
+    """Run a scenario `repeat` times in fresh processes and keep the fastest run."""
+    best: Optional[Dict[str, Any]] = None
+    for _ in range(repeat):
+        before = _requests_served(base_url)
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(_run_child, name, opts).result()
+        result["requests"] = _requests_served(base_url) - before
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+
+    seconds = max(best["seconds"], 1e-9)
+    return {
+        "rows": best["rows"],
+        "seconds": round(seconds, 4),
+        "rows_per_s": round(best["rows"] / seconds, 1),
+        "requests": best["requests"],
+        "requests_per_s": round(best["requests"] / seconds, 1),
+        "peak_rss_mb": best["peak_rss_mb"],
+    }
+
+
+def check_regressions(
+    current: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: float,
+) -> List[str]:
+    """
+    Compare results with a baseline and describe every regression beyond `threshold`.
+
+    A scenario regresses when its rows/s drops, or its peak RSS grows, by more
+    than `threshold` (a fraction, e.g. 0.15). Scenarios missing from either
+    side are skipped.
+    """
+    problems = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["rows_per_s"] < base["rows_per_s"] * (1 - threshold):
+            problems.append(
+                f"{name}: {result['rows_per_s']:.0f} rows/s vs baseline {base['rows_per_s']:.0f} "
+                f"({result['rows_per_s'] / base['rows_per_s'] - 1:+.0%})"
+            )
+        if result.get("peak_rss_mb") and base.get("peak_rss_mb"):
+            if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+                problems.append(
+                    f"{name}: peak RSS {result['peak_rss_mb']} MB vs baseline {base['peak_rss_mb']} MB"
+                )
+    return problems
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Offline benchmarks for the hydrology pipeline")
+    p.add_argument("--size", choices=sorted(SIZES), default="small")
+    p.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    p.add_argument("--repeat", type=int, default=3, help="Runs per scenario; the fastest is kept")
+    p.add_argument("--latency-ms", type=float, default=0.0, help="Latency added to every fake API request")
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--page-size", type=int, default=2000)
+    p.add_argument("--wal", action="store_true", help="Use the WAL bulk-load profile")
+    p.add_argument("--output", default=None, help="Also write the results to this JSON file")
+    p.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline for --size")
+    p.add_argument("--check", action="store_true", help="Exit with status 1 on regressions against the baseline")
+    p.add_argument("--threshold", type=float, default=0.15, help="Tolerated regression as a fraction")
+    args = p.parse_args()
+
+    size = SIZES[args.size]
+    opts = {
+        "rows": size["rows"],
+        "stations": size["stations"],
+        "workers": args.workers,
+        "page_size": args.page_size,
+        "wal": args.wal,
+    }
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_api",
+            "--stations", str(size["stations"]),
+            "--readings", str(size["readings"]),
+            "--latency-ms", str(args.latency_ms),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        base_url = server.stdout.readline().strip()
+        os.environ["HYDROLOGY_BASE_URL"] = base_url
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for name in args.scenarios:
+            results[name] = run_scenario(name, opts, base_url, args.repeat)
+            r = results[name]
+            print(
+                f"{name:<22} {r['rows']:>9} rows {r['seconds']:>8.3f}s {r['rows_per_s']:>12.0f} rows/s "
+                f"{r['requests_per_s']:>8.1f} req/s  peak RSS {r['peak_rss_mb']} MB",
+                flush=True,
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {"size": args.size, "latency_ms": args.latency_ms, "results": results}
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    baseline_path = BASELINE_DIR / f"{args.size}.json"
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline saved to {baseline_path}")
+
+    if args.check:
+        if not baseline_path.exists():
+            sys.exit(f"No baseline at {baseline_path}; run with --save-baseline first")
+        problems = check_regressions(results, json.loads(baseline_path.read_text())["results"], args.threshold)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
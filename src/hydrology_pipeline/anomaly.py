@@ -0,0 +1,139 @@
+import logging
+import math
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from . import metrics
+from .config import (
+    ANOMALY_DIRECTIONS,
+    DEFAULT_ANOMALY_ALPHA,
+    DEFAULT_ANOMALY_WARMUP,
+    DEFAULT_ANOMALY_ZSCORE,
+)
+from .transform import MeasurementBatch
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Per-measure detector state: [last_epoch, n, mean, var]
+State = List[float]
+
+# Alert kind per direction of the deviation
+_KINDS = {1: "spike", -1: "sag"}
+
+
+def _load_states(conn: sqlite3.Connection, keys: Sequence[int]) -> Dict[int, State]:
+    states: Dict[int, State] = {}
+    for key in keys:
+        row = conn.execute(
+            "SELECT last_epoch, n, mean, var FROM anomaly_state WHERE measure_key = ?;", (key,)
+        ).fetchone()
+        states[key] = list(row) if row else [float("-inf"), 0, 0.0, 0.0]
+    return states
+
+
+def _scan(
+    state: State,
+    epochs: Sequence[int],
+    values: Sequence[float],
+    direction: str,
+    alpha: float,
+    zscore: float,
+    warmup: int,
+) -> List[Tuple[int, str, float, float, float]]:
+    """
+    Feed readings newer than the state's last epoch through the detector, oldest first.
+
+    Each reading is first scored against the exponentially weighted mean and
+    variance of the readings before it, then folded into them, so it costs
+    O(1) however long the history is. Returns (epoch, kind, value, expected,
+    z) for every reading deviating by more than `zscore` standard deviations
+    in the watched `direction` ("high", "low" or "both"), once at least
+    `warmup` readings were seen.
+    """
+    last_epoch, n, mean, var = state
+    alerts = []
+    for epoch, value in sorted(zip(epochs, values)):
+        if epoch <= last_epoch or value != value:
+            continue
+        if n >= warmup and var > 0:
+            z = (value - mean) / math.sqrt(var)
+            if abs(z) > zscore and (direction == "both" or (direction == "high") == (z > 0)):
+                alerts.append((epoch, _KINDS[1 if z > 0 else -1], value, mean, z))
+        # Early readings get a larger weight, so the mean starts as a plain average.
+        weight = max(alpha, 1.0 / (n + 1))
+        diff = value - mean
+        mean += weight * diff
+        var = (1 - weight) * (var + weight * diff * diff)
+        n += 1
+        last_epoch = epoch
+    state[:] = [last_epoch, n, mean, var]
+    return alerts
+
+
+def detect_anomalies(
+    conn: sqlite3.Connection,
+    batches: Sequence[MeasurementBatch],
+    alpha: float = DEFAULT_ANOMALY_ALPHA,
+    zscore: float = DEFAULT_ANOMALY_ZSCORE,
+    warmup: int = DEFAULT_ANOMALY_WARMUP,
+    directions: Optional[Dict[str, str]] = None,
+) -> int:
+    """
+    Score newly loaded readings against each measure's rolling statistics and record alerts.
+
+    The per-measure state (exponentially weighted mean and variance, count and
+    last epoch) is read from and written back to `anomaly_state`, so
+    detection continues across runs without rescanning stored readings.
+    Readings not newer than a measure's last scored reading (duplicates,
+    backfilled history) are skipped. Which deviations are flagged depends on
+    the observed property (see ANOMALY_DIRECTIONS): conductivity spikes and
+    dissolved-oxygen sags by default, both directions otherwise.
+
+    Returns the number of new rows in `alerts`.
+    """
+    directions = ANOMALY_DIRECTIONS if directions is None else directions
+    try:
+        with metrics.span("anomaly"), conn:
+            keys = {}
+            for batch in batches:
+                row = conn.execute(
+                    "SELECT measure_key FROM measures WHERE measure_id = ?;", (batch.measure_id,)
+                ).fetchone()
+                if row:
+                    keys[batch.measure_id] = row[0]
+            states = _load_states(conn, list(set(keys.values())))
+
+            alerts = []
+            for batch in batches:
+                key = keys.get(batch.measure_id)
+                if key is None or not len(batch):
+                    continue
+                direction = directions.get(batch.observed_property.lower(), "both")
+                found = _scan(states[key], batch.epochs, batch.values, direction, alpha, zscore, warmup)
+                alerts.extend((key, *alert) for alert in found)
+
+            conn.executemany(
+                """
+                INSERT INTO anomaly_state(measure_key, last_epoch, n, mean, var) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(measure_key) DO UPDATE SET
+                    last_epoch=excluded.last_epoch, n=excluded.n, mean=excluded.mean, var=excluded.var;
+                """,
+                [(key, *state) for key, state in states.items() if state[1]],
+            )
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO alerts(measure_key, epoch, kind, value, expected, zscore)
+                VALUES (?, ?, ?, ?, ?, ?);
+                """,
+                alerts,
+            )
+            recorded = conn.total_changes - before
+        for _, _, kind, *_ in alerts:
+            metrics.inc("alerts_total", kind=kind)
+        if recorded:
+            logger.warning(f"Recorded {recorded} anomaly alerts")
+        return recorded
+    except Exception as exc:  # type: Exception
+        logger.error(f"Failed to run anomaly detection: {exc}")
+        raise
@@ -1,36 +1,498 @@
+import csv
+import json
 import logging
-from typing import Any, Dict, Optional
+import random
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode, urlsplit
 import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .config import (
+    DEFAULT_CACHE_MAX_BYTES,
+    DEFAULT_CACHE_TTLS,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_RATE_LIMIT,
+)
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+# HTTP statuses worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def endpoint_label(url: str) -> str:
+    """Low-cardinality metrics label for an API URL (identifiers stripped)."""
+    path = urlsplit(url).path
+    if "/data/readings" in path:
+        return "data/readings"
+    if "/readings." in path:
+        return "measure/" + path.rsplit("/", 1)[-1]
+    if "/id/stations" in path:
+        return "stations"
+    if "/id/measures" in path:
+        return "measures"
+    return "other"
+
 class HydrologyApiError(RuntimeError):
     """Raised when the Hydrology API request fails or returns invalid JSON."""
     pass
 
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the sustained request rate.
+
+    The rate adapts to the API: it is halved whenever the API throttles us
+    (HTTP 429) and recovers gradually towards the configured rate on success.
+    """
+
+    def __init__(self, rate: float, min_rate: float = 0.5) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.max_rate: float = rate
+        self.min_rate: float = min(min_rate, rate)
+        self.rate: float = rate
+        self.capacity: float = max(1.0, rate)
+        self._tokens: float = self.capacity
+        self._updated: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self) -> None:
+        """Halve the current rate after the API signalled overload."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+        logger.warning(f"Rate limit lowered to {self.rate:.2f} req/s")
+
+    def recover(self) -> None:
+        """Increase the current rate a little after a successful request."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """A cached response body with its validators and expiry time."""
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+class ResponseCache:
+    """
+    Persistent HTTP response cache stored in a SQLite file.
+
+    Entries are keyed by URL and sorted query params and keep the response
+    body together with its ETag/Last-Modified validators. Each endpoint gets a
+    freshness lifetime from `ttls` (URL regex -> seconds): fresh entries are
+    served without a request, stale ones are revalidated with a conditional
+    GET. URLs that match no rule are never cached. When the total body size
+    exceeds `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        ttls: Sequence[Tuple[str, float]] = DEFAULT_CACHE_TTLS,
+    ) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._ttls = [(re.compile(pattern), float(ttl)) for pattern, ttl in ttls]
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    key           TEXT PRIMARY KEY,
+                    body          BLOB NOT NULL,
+                    etag          TEXT,
+                    last_modified TEXT,
+                    expires_at    REAL NOT NULL,
+                    last_access   REAL NOT NULL,
+                    size          INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_http_cache_last_access ON http_cache(last_access);
+                """
+            )
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """Build a stable cache key from a URL and its query params."""
+        if not params:
+            return url
+        return f"{url}?{urlencode(sorted(params.items()), doseq=True)}"
+
+    def ttl_for(self, url: str) -> Optional[float]:
+        """Return the freshness lifetime for a URL, or None if it is not cacheable."""
+        for pattern, ttl in self._ttls:
+            if pattern.search(url):
+                return ttl
+        return None
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the cached entry for a key (fresh or stale) and mark it as used."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, expires_at FROM http_cache WHERE key = ?;",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE http_cache SET last_access = ? WHERE key = ?;", (time.time(), key)
+                )
+        return CacheEntry(body=row[0], etag=row[1], last_modified=row[2], expires_at=row[3])
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        ttl: float,
+    ) -> None:
+        """Store a response body with its validators, then enforce the size cap."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO http_cache(key, body, etag, last_modified, expires_at, last_access, size)
+                VALUES(?,?,?,?,?,?,?)
+                ON CONFLICT(key) DO UPDATE SET
+                    body=excluded.body,
+                    etag=excluded.etag,
+                    last_modified=excluded.last_modified,
+                    expires_at=excluded.expires_at,
+                    last_access=excluded.last_access,
+                    size=excluded.size;
+                """,
+                (key, body, etag, last_modified, now + ttl, now, len(body)),
+            )
+            self._evict()
+
+    def refresh(self, key: str, ttl: float) -> None:
+        """Extend the lifetime of an entry after a 304 Not Modified response."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE http_cache SET expires_at = ?, last_access = ? WHERE key = ?;",
+                (now + ttl, now, key),
+            )
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache;").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM http_cache ORDER BY last_access;"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM http_cache WHERE key = ?;", (key,))
+            total -= size
+            evicted += 1
+        logger.debug(f"Evicted {evicted} cached responses")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class HydrologyClient:
+    """
+    Reusable Hydrology API client.
+
+    Owns a pooled keep-alive requests.Session so TCP/TLS connections are reused
+    across requests and threads, a token-bucket rate limiter, and a retry loop
+    with jittered exponential backoff that honors Retry-After (both capped at
+    `backoff_cap` seconds). An optional ResponseCache serves cacheable
+    endpoints from disk and revalidates them with conditional GETs.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        rate_limit: Optional[float] = DEFAULT_RATE_LIMIT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        cache: Optional[ResponseCache] = None,
+    ) -> None:
+        if pool_size <= 0:
+            raise ValueError("pool_size must be a positive integer")
+        if max_retries < 0:
+            raise ValueError("max_retries must not be negative")
+
+        self.session: requests.Session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.rate_limiter: Optional[TokenBucket] = TokenBucket(rate_limit) if rate_limit else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.cache = cache
+
+    def close(self) -> None:
+        """Close the underlying session, its pooled connections and the cache."""
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self) -> "HydrologyClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for the given attempt."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: int = 30,
+        stream: bool = False,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> requests.Response:
+        """
+        Perform a rate-limited HTTP GET request, retrying transient failures.
+
+        Raises HydrologyApiError once retries are exhausted or on a non-retryable error.
+        """
+        endpoint = endpoint_label(url)
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            logger.debug(f"Requesting URL: {url} with params: {params} and timeout: {timeout}")
+            started = time.perf_counter()
+            try:
+                response: requests.Response = self.session.get(
+                    url, params=params, timeout=timeout, stream=stream, headers=headers
+                )
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                metrics.inc("http_requests_total", endpoint=endpoint, status="error")
+                if attempt >= self.max_retries:
+                    logger.error(f"HTTP request failed: url={url} params={params} error={exc}")
+                    raise HydrologyApiError(f"HTTP request failed: url={url} params={params} error={exc}") from exc
+                delay = self._backoff(attempt)
+                reason = str(exc)
+            except requests.RequestException as exc:  # type: requests.RequestException
+                logger.error(f"HTTP request failed: url={url} params={params} error={exc}")
+                raise HydrologyApiError(f"HTTP request failed: url={url} params={params} error={exc}") from exc
+            else:
+                metrics.observe("http_request_seconds", time.perf_counter() - started, endpoint=endpoint)
+                metrics.inc("http_requests_total", endpoint=endpoint, status=response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    try:
+                        response.raise_for_status()
+                    except requests.RequestException as exc:  # type: requests.RequestException
+                        logger.error(f"HTTP request failed: url={url} params={params} error={exc}")
+                        raise HydrologyApiError(
+                            f"HTTP request failed: url={url} params={params} error={exc}"
+                        ) from exc
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.recover()
+                    logger.info(f"Successful GET request: {url}")
+                    return response
+
+                if response.status_code == 429 and self.rate_limiter is not None:
+                    self.rate_limiter.throttle()
+                retry_after = _retry_after_seconds(response)
+                # Retry-After is capped like the backoff, so one response cannot stall a worker for hours.
+                delay = min(retry_after, self.backoff_cap) if retry_after is not None else self._backoff(attempt)
+                reason = f"HTTP {response.status_code}"
+                response.close()
+
+            attempt += 1
+            metrics.inc("http_retries_total", endpoint=endpoint)
+            logger.warning(
+                f"Retrying GET {url} in {delay:.2f}s ({reason}); attempt {attempt}/{self.max_retries}"
+            )
+            time.sleep(delay)
+
+    def get_json(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: int = 30,
+    ) -> Dict[str, Any]:
+        """
+        Perform an HTTP GET request and return the parsed JSON response.
+
+        Cacheable endpoints are served from the ResponseCache while fresh and
+        revalidated with If-None-Match/If-Modified-Since once stale.
+
+        Raises HydrologyApiError if the request fails or the response is not valid JSON.
+        """
+        endpoint = endpoint_label(url)
+        ttl = self.cache.ttl_for(url) if self.cache is not None else None
+        if ttl is None:
+            body = self.get(url, params=params, timeout=timeout).content
+            metrics.inc("http_response_bytes_total", len(body), endpoint=endpoint)
+            return self._parse_json(body, url, params)
+
+        key = ResponseCache.make_key(url, params)
+        entry = self.cache.get(key)
+        if entry is not None and entry.expires_at > time.time():
+            logger.debug(f"Cache hit: {key}")
+            metrics.inc("http_cache_total", endpoint=endpoint, result="hit")
+            return self._parse_json(entry.body, url, params)
+
+        headers: Dict[str, str] = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        response = self.get(url, params=params, timeout=timeout, headers=headers or None)
+        if response.status_code == 304 and entry is not None:
+            logger.debug(f"Cache revalidated: {key}")
+            metrics.inc("http_cache_total", endpoint=endpoint, result="revalidated")
+            self.cache.refresh(key, ttl)
+            return self._parse_json(entry.body, url, params)
+
+        metrics.inc("http_cache_total", endpoint=endpoint, result="miss")
+        metrics.inc("http_response_bytes_total", len(response.content), endpoint=endpoint)
+        json_data = self._parse_json(response.content, url, params)
+        self.cache.put(
+            key,
+            response.content,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            ttl,
+        )
+        return json_data
+
+    def iter_csv(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: int = 30,
+    ) -> Iterator[List[str]]:
+        """
+        Stream a CSV response row by row without loading the body into memory.
+
+        The first yielded row is the header. Rows are parsed incrementally from
+        `iter_lines`, so memory use does not grow with the response size.
+
+        Raises HydrologyApiError if the request fails.
+        """
+        response = self.get(url, params=params, timeout=timeout, stream=True)
+        received = 0
+
+        def lines() -> Iterator[str]:
+            nonlocal received
+            for line in response.iter_lines(decode_unicode=True):
+                received += len(line) + 1
+                if line:
+                    yield line
+
+        try:
+            response.encoding = response.encoding or "utf-8"
+            yield from csv.reader(lines())
+        except requests.RequestException as exc:  # type: requests.RequestException
+            logger.error(f"CSV stream failed: url={url} params={params} error={exc}")
+            raise HydrologyApiError(f"CSV stream failed: url={url} params={params} error={exc}") from exc
+        finally:
+            response.close()
+            metrics.inc("http_response_bytes_total", received, endpoint=endpoint_label(url))
+
+    @staticmethod
+    def _parse_json(body: bytes, url: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Decode a JSON response body, raising HydrologyApiError if it is invalid."""
+        try:
+            json_data = json.loads(body)
+            logger.debug(f"Received JSON response from {url}")
+            return json_data
+        except ValueError as exc:  # type: ValueError
+            logger.error(f"Invalid JSON response: url={url} params={params}")
+            raise HydrologyApiError(f"Invalid JSON response: url={url} params={params}") from exc
+
+_default_client: Optional[HydrologyClient] = None
+_default_client_lock = threading.Lock()
+
+def get_default_client() -> HydrologyClient:
+    """Return the process-wide client, creating it with default settings on first use."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HydrologyClient()
+        return _default_client
+
+def set_default_client(client: HydrologyClient) -> None:
+    """Replace the process-wide client used by get_json, closing the previous one."""
+    global _default_client
+    with _default_client_lock:
+        previous, _default_client = _default_client, client
+    if previous is not None and previous is not client:
+        previous.close()
+
 def get_json(
     url: str,
     params: Optional[Dict[str, Any]] = None,
     timeout: int = 30,
 ) -> Dict[str, Any]:
     """
-    Perform an HTTP GET request and return the parsed JSON response.
+    Perform an HTTP GET request through the shared client and return the parsed JSON response.
 
     Raises HydrologyApiError if the request fails or the response is not valid JSON.
     """
-    logger.debug(f"Requesting URL: {url} with params: {params} and timeout: {timeout}")
-    try:
-        response: requests.Response = requests.get(url, params=params, timeout=timeout)
-        response.raise_for_status()
-        logger.info(f"Successful GET request: {url}")
-    except requests.RequestException as exc:  # type: requests.RequestException
-        logger.error(f"HTTP request failed: url={url} params={params} error={exc}")
-        raise HydrologyApiError(f"HTTP request failed: url={url} params={params} error={exc}") from exc
+    return get_default_client().get_json(url, params=params, timeout=timeout)
 
-    try:
-        json_data = response.json()
-        logger.debug(f"Received JSON response from {url}")
-        return json_data
-    except ValueError as exc:  # type: ValueError
-        logger.error(f"Invalid JSON response: url={url} params={params}")
-        raise HydrologyApiError(f"Invalid JSON response: url={url} params={params}") from exc
+def iter_csv(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: int = 30,
+) -> Iterator[List[str]]:
+    """
+    Stream a CSV response through the shared client, header row first.
+
+    Raises HydrologyApiError if the request fails.
+    """
+    return get_default_client().iter_csv(url, params=params, timeout=timeout)
@@ -0,0 +1,236 @@
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import sys
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+from .config import DEFAULT_BATCH_SIZE
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Column files of a measure archive: name -> array typecode
+COLUMNS = {"epoch.i64": "q", "value.f64": "d", "quality.u8": "B"}
+
+INDEX_FILE = "index.json"
+
+# Rows per entry of the time-range index
+BLOCK_ROWS = 65536
+
+
+def measure_dir(archive_dir: Path, measure_id: str) -> Path:
+    """Return the directory holding the column files of a measure."""
+    return archive_dir / quote(measure_id, safe="-_.")
+
+
+def _load_index(path: Path) -> Dict[str, Any]:
+    """Read a measure index, or return an empty one."""
+    index_path = path / INDEX_FILE
+    if not index_path.exists():
+        return {"rows": 0, "blocks": [], "quality_labels": {}}
+    return json.loads(index_path.read_text())
+
+
+def _write_index(path: Path, index: Dict[str, Any]) -> None:
+    """Atomically replace the index, publishing the rows appended before it."""
+    tmp = path / f"{INDEX_FILE}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path / INDEX_FILE)
+
+
+def _reindex_blocks(path: Path, index: Dict[str, Any]) -> None:
+    """Recompute the [first, last, offset, count] entries of blocks that gained rows."""
+    rows = index["rows"]
+    blocks = [b for b in index["blocks"] if b[3] == BLOCK_ROWS]
+    start = len(blocks) * BLOCK_ROWS
+    if start < rows:
+        with open(path / "epoch.i64", "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            epochs = memoryview(mm).cast("q")
+            try:
+                for offset in range(start, rows, BLOCK_ROWS):
+                    count = min(BLOCK_ROWS, rows - offset)
+                    blocks.append([epochs[offset], epochs[offset + count - 1], offset, count])
+            finally:
+                epochs.release()
+    index["blocks"] = blocks
+
+
+def export_measure(
+    conn: sqlite3.Connection,
+    measure_id: str,
+    archive_dir: Path,
+    full: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """
+    Append a measure's readings newer than its archived history to its column files.
+
+    Readings are streamed from the (measure_key, epoch) primary key in time
+    order and appended as native-endian int64 epochs, float64 values (NaN for
+    NULL) and uint8 quality codes. The index is rewritten atomically last, so
+    a crash mid-export leaves the previous archive readable; the unpublished
+    tail is truncated on the next export. With `full=True` the archive is
+    rewritten from scratch (needed after late readings older than the archive).
+
+    Returns the number of rows appended.
+    """
+    path = measure_dir(archive_dir, measure_id)
+    path.mkdir(parents=True, exist_ok=True)
+    index = {"rows": 0, "blocks": [], "quality_labels": {}} if full else _load_index(path)
+    if index.get("byteorder", sys.byteorder) != sys.byteorder:
+        raise ValueError(f"Archive for {measure_id} was written with {index['byteorder']}-endian columns")
+
+    rows = index["rows"]
+    high_water = index["blocks"][-1][1] if index["blocks"] else None
+    sql = """
+    SELECT r.epoch, r.value, r.quality
+    FROM readings r
+    WHERE r.measure_key = (SELECT measure_key FROM measures WHERE measure_id = ?) AND r.epoch > ?
+    ORDER BY r.epoch;
+    """
+
+    appended = 0
+    try:
+        files = {name: open(path / name, "r+b" if (path / name).exists() else "w+b") for name in COLUMNS}
+        try:
+            for name, f in files.items():
+                f.truncate(rows * array(COLUMNS[name]).itemsize)
+                f.seek(0, os.SEEK_END)
+
+            cur = conn.execute(sql, (measure_id, high_water if high_water is not None else -(2**63)))
+            nan = float("nan")
+            while True:
+                chunk = cur.fetchmany(batch_size)
+                if not chunk:
+                    break
+                array("q", [r[0] for r in chunk]).tofile(files["epoch.i64"])
+                array("d", [nan if r[1] is None else r[1] for r in chunk]).tofile(files["value.f64"])
+                array("B", [r[2] for r in chunk]).tofile(files["quality.u8"])
+                appended += len(chunk)
+
+            for f in files.values():
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            for f in files.values():
+                f.close()
+
+        index["rows"] = rows + appended
+        index["byteorder"] = sys.byteorder
+        index["measure_id"] = measure_id
+        index["quality_labels"] = {"0": None}
+        index["quality_labels"].update(
+            (str(code), label) for code, label in conn.execute("SELECT code, label FROM quality_codes;")
+        )
+        _reindex_blocks(path, index)
+        _write_index(path, index)
+    except Exception as exc:  # type: Exception
+        logger.error(f"Failed to export archive for {measure_id}: {exc}")
+        raise
+
+    logger.info(f"Archived {appended} new readings for {measure_id} ({index['rows']} total).")
+    return appended
+
+
+def export_archive(
+    conn: sqlite3.Connection,
+    archive_dir: Path,
+    measure_ids: Optional[Iterable[str]] = None,
+    full: bool = False,
+) -> int:
+    """
+    Export the given measures (default: every measure with readings) to `archive_dir`.
+
+    Returns the total number of rows appended.
+    """
+    if measure_ids is None:
+        measure_ids = [
+            row[0]
+            for row in conn.execute(
+                "SELECT measure_id FROM measures m "
+                "WHERE EXISTS (SELECT 1 FROM readings r WHERE r.measure_key = m.measure_key) "
+                "ORDER BY measure_id;"
+            )
+        ]
+    return sum(export_measure(conn, measure_id, archive_dir, full=full) for measure_id in measure_ids)
+
+
+class MeasureArchive:
+    """
+    Read-only memory-mapped view of one measure's archive.
+
+    `slice(start, end)` returns zero-copy memoryviews (typecodes q, d and B)
+    over the mapped column files, e.g. `numpy.frombuffer(values, dtype="f8")`.
+    Release the returned views before calling close().
+    """
+
+    def __init__(self, archive_dir: Path, measure_id: str) -> None:
+        path = measure_dir(archive_dir, measure_id)
+        index = _load_index(path)
+        if not index["rows"]:
+            raise ValueError(f"No archive for measure_id={measure_id}")
+        if index["byteorder"] != sys.byteorder:
+            raise ValueError(f"Archive for {measure_id} was written with {index['byteorder']}-endian columns")
+
+        self.measure_id = measure_id
+        self.rows: int = index["rows"]
+        self.quality_labels: Dict[int, Optional[str]] = {int(k): v for k, v in index["quality_labels"].items()}
+        self._blocks: List[List[int]] = index["blocks"]
+        self._block_lasts = [b[1] for b in self._blocks]
+        self._maps: List[mmap.mmap] = []
+        self._views: Dict[str, memoryview] = {}
+        try:
+            for name, typecode in COLUMNS.items():
+                with open(path / name, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps.append(mm)
+                # Only the published rows; a torn tail from an interrupted export is ignored.
+                self._views[name] = memoryview(mm).cast(typecode)[: self.rows]
+        except Exception:
+            self.close()
+            raise
+
+    def _position(self, epoch: int) -> int:
+        """First row with a time >= `epoch`, searched within one block of the time-range index."""
+        block = bisect_left(self._block_lasts, epoch)
+        if block == len(self._blocks):
+            return self.rows
+        _, _, offset, count = self._blocks[block]
+        return bisect_left(self._views["epoch.i64"], epoch, offset, offset + count)
+
+    def slice(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Tuple[memoryview, memoryview, memoryview]:
+        """Return (epochs, values, quality codes) for readings with start <= epoch < end."""
+        lo = 0 if start is None else self._position(start)
+        hi = self.rows if end is None else self._position(end)
+        return (
+            self._views["epoch.i64"][lo:hi],
+            self._views["value.f64"][lo:hi],
+            self._views["quality.u8"][lo:hi],
+        )
+
+    def close(self) -> None:
+        """Release the column views and unmap the files."""
+        for view in self._views.values():
+            view.release()
+        self._views.clear()
+        for mm in self._maps:
+            mm.close()
+        self._maps.clear()
+
+    def __enter__(self) -> "MeasureArchive":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,319 @@
+import dataclasses
+import logging
+import queue
+import sqlite3
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import metrics
+from .config import DEFAULT_BACKFILL_CHUNK_DAYS, DEFAULT_MAX_WORKERS, PipelineConfig
+from .db import find_gaps, get_completed_chunks, mark_gaps_checked, record_chunk, upsert_station
+from .partitions import PartitionedStore
+from .pipeline import catalogued_measures, fetch_station, measure_pages, store_for, write_page, writer_for
+from .transform import epoch_to_iso, parse_epoch
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+Chunk = Tuple[int, int]
+
+
+class ChunkTask(NamedTuple):
+    """One measure's readings within one [start, end) chunk, fetched as a unit."""
+
+    config: PipelineConfig
+    station_id: str
+    param: str
+    measure_id: str
+    chunk: Chunk
+
+
+def plan_chunks(
+    start: int,
+    end: int,
+    chunk_seconds: int,
+    completed: Sequence[Chunk] = (),
+) -> List[Chunk]:
+    """
+    Split the epoch range [start, end) into chunks that still need fetching.
+
+    Chunk boundaries are aligned to multiples of `chunk_seconds`, so runs over
+    overlapping ranges plan the same chunks and share checkpoints. Chunks
+    covered by a `completed` range are left out.
+    """
+    if chunk_seconds <= 0:
+        raise ValueError("chunk_seconds must be a positive integer")
+
+    chunks: List[Chunk] = []
+    lo = start
+    while lo < end:
+        hi = min(end, (lo // chunk_seconds + 1) * chunk_seconds)
+        if not any(done_lo <= lo and hi <= done_hi for done_lo, done_hi in completed):
+            chunks.append((lo, hi))
+        lo = hi
+    return chunks
+
+
+def _fetch_chunk(
+    config: PipelineConfig,
+    measure_id: str,
+    chunk: Chunk,
+    task_id: int,
+    results: queue.Queue,
+) -> None:
+    """
+    Worker task: stream the readings of one measure within one chunk.
+
+    Puts any number of ("page", ...) or ("csv", ...) messages followed by
+    exactly one ("chunk", ...) or ("error", ...) message, all tagged with
+    `task_id`, on `results`.
+    """
+    try:
+        chunk_config = dataclasses.replace(config, until=epoch_to_iso(chunk[1]))
+        kind, pages = measure_pages(chunk_config, measure_id, epoch_to_iso(chunk[0]))
+        for page in pages:
+            results.put((kind, task_id, page))
+        results.put(("chunk", task_id))
+    except Exception as exc:  # type: Exception
+        results.put(("error", task_id, exc))
+
+
+class _ChunkLoader:
+    """
+    Fetches chunks on a bounded thread pool while the calling thread writes them.
+
+    Stations submitted with submit_station are handed to `on_station`, which
+    typically plans and submits their chunks. Once all pages of a chunk are
+    written, `on_chunk` is called with the writer connection, the task and
+    the number of rows inserted. Chunks whose fetch or write failed are not
+    passed on, so a rerun fetches them again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        on_chunk: Callable[[sqlite3.Connection, ChunkTask, int], None],
+        on_station: Optional[Callable[[PipelineConfig, Any, Dict[str, str]], None]] = None,
+    ) -> None:
+        if max_workers <= 0:
+            raise ValueError("max_workers must be a positive integer")
+        self.name = name
+        self.on_chunk = on_chunk
+        self.on_station = on_station
+        self.results: queue.Queue = queue.Queue(maxsize=max_workers * 2)
+        self.conns: Dict[Path, sqlite3.Connection] = {}
+        self.stores: Dict[Path, PartitionedStore] = {}
+        self.failures: List[Exception] = []
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"hydrology-{name}")
+        self._futures: List[Future] = []
+        self._tasks: Dict[int, ChunkTask] = {}
+        # Rows written per in-flight chunk; None once one of its pages failed to write
+        self._written: Dict[int, Optional[int]] = {}
+        self._pending = 0
+
+    def writer(self, config: PipelineConfig) -> sqlite3.Connection:
+        return writer_for(self.conns, config)
+
+    def store(self, config: PipelineConfig) -> Optional[PartitionedStore]:
+        return store_for(self.stores, self.conns, config)
+
+    def submit_station(self, config: PipelineConfig, catalogued: Optional[Dict[str, str]]) -> None:
+        self._futures.append(self._pool.submit(fetch_station, config, catalogued, self.results))
+        self._pending += 1
+
+    def submit(self, task: ChunkTask) -> None:
+        task_id = len(self._futures)
+        self._tasks[task_id] = task
+        self._written[task_id] = 0
+        self._futures.append(
+            self._pool.submit(_fetch_chunk, task.config, task.measure_id, task.chunk, task_id, self.results)
+        )
+        self._pending += 1
+
+    def run(self) -> int:
+        """
+        Write results until every submitted station and chunk is processed.
+
+        Failures do not stop the other chunks; the first one is re-raised at
+        the end. Returns the number of newly inserted rows.
+        """
+        total_inserted = 0
+        while self._pending:
+            message: Tuple[Any, ...] = self.results.get()
+            kind = message[0]
+            if kind not in ("page", "csv"):
+                self._pending -= 1
+
+            if kind == "station":
+                self.on_station(*message[1:])
+
+            elif kind in ("page", "csv"):
+                _, task_id, readings = message
+                if self._written[task_id] is None:
+                    continue
+                config, station_id, param, measure_id, _ = self._tasks[task_id]
+                try:
+                    _, inserted = write_page(
+                        self.writer(config),
+                        kind,
+                        station_id,
+                        param,
+                        measure_id,
+                        readings,
+                        config.lenient,
+                        config.detect_anomalies,
+                        self.store(config),
+                    )
+                except Exception as exc:  # type: Exception
+                    # Later pages are skipped and the chunk is not passed on, so a rerun fetches it again.
+                    logger.error(f"Failed to write {self.name} chunk of {measure_id}: {exc}")
+                    self.failures.append(exc)
+                    self._written[task_id] = None
+                    continue
+                self._written[task_id] += inserted
+                total_inserted += inserted
+
+            elif kind == "chunk":
+                task_id = message[1]
+                rows = self._written.pop(task_id)
+                task = self._tasks.pop(task_id)
+                if rows is None:
+                    metrics.inc(f"{self.name}_chunks_total", result="failed")
+                    continue
+                self.on_chunk(self.writer(task.config), task, rows)
+                metrics.inc(f"{self.name}_chunks_total", result="done")
+
+            else:
+                _, target, exc = message
+                if isinstance(target, PipelineConfig):
+                    logger.error(f"Station {target.station_notation} failed: {exc}")
+                else:
+                    self._written.pop(target)
+                    task = self._tasks.pop(target)
+                    lo, hi = task.chunk
+                    logger.error(
+                        f"{self.name.capitalize()} chunk {epoch_to_iso(lo)}..{epoch_to_iso(hi)} "
+                        f"of {task.measure_id} failed: {exc}"
+                    )
+                    metrics.inc(f"{self.name}_chunks_total", result="failed")
+                self.failures.append(exc)
+
+        logger.info(f"{self.name.capitalize()} done (failures={len(self.failures)}). Total inserted={total_inserted}.")
+        if self.failures:
+            raise self.failures[0]
+        return total_inserted
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        # Drain the queue so workers blocked on a full queue can exit.
+        while any(not f.done() for f in self._futures):
+            try:
+                self.results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for store in self.stores.values():
+            store.close()
+        for conn in self.conns.values():
+            conn.close()
+        self.conns.clear()
+
+    def __enter__(self) -> "_ChunkLoader":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def run_backfill(
+    configs: Sequence[PipelineConfig],
+    chunk_days: int = DEFAULT_BACKFILL_CHUNK_DAYS,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> int:
+    """
+    Load the history between each config's `since` and `until` (default: now) in resumable chunks.
+
+    Every measure's range is split into `chunk_days` chunks that are fetched
+    in parallel on a bounded thread pool, while the calling thread remains the
+    single SQLite writer. A chunk is checkpointed in `backfill_chunks` once all
+    of its readings are written, so an interrupted or partly failed backfill
+    only fetches the missing chunks when run again.
+
+    Failures of one station or chunk do not stop the others; once every chunk
+    has been processed, the first failure is re-raised.
+
+    Returns the total number of newly inserted measurement rows.
+    """
+    if chunk_days <= 0:
+        raise ValueError("chunk_days must be a positive integer")
+    for config in configs:
+        if not config.since:
+            raise ValueError(f"Backfill of {config.station_notation} needs a start time (since)")
+
+    chunk_seconds = chunk_days * 86400
+    now = int(time.time())
+
+    def plan(config: PipelineConfig, station: Any, measure_map: Dict[str, str]) -> None:
+        conn = loader.writer(config)
+        upsert_station(conn, station)
+        start = parse_epoch(config.since)
+        end = parse_epoch(config.until) if config.until else now
+        for param, measure_id in measure_map.items():
+            chunks = plan_chunks(start, end, chunk_seconds, get_completed_chunks(conn, measure_id))
+            skipped = len(plan_chunks(start, end, chunk_seconds)) - len(chunks)
+            metrics.inc("backfill_chunks_total", skipped, result="skipped")
+            logger.info(f"Backfill of {measure_id}: {len(chunks)} chunks to fetch, {skipped} already done")
+            for chunk in chunks:
+                loader.submit(ChunkTask(config, station.station_id, param, measure_id, chunk))
+
+    def checkpoint(conn: sqlite3.Connection, task: ChunkTask, rows: int) -> None:
+        record_chunk(conn, task.measure_id, task.chunk[0], task.chunk[1], rows)
+
+    with _ChunkLoader("backfill", max_workers, checkpoint, plan) as loader:
+        for config, catalogued in zip(configs, catalogued_measures(loader.conns, configs)):
+            loader.submit_station(config, catalogued)
+        return loader.run()
+
+
+def repair_gaps(
+    config: PipelineConfig,
+    measure_ids: Optional[Iterable[str]] = None,
+    include_checked: bool = False,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    station_ids: Optional[Iterable[str]] = None,
+) -> int:
+    """
+    Refetch only the missing intervals recorded in the `gaps` table of `config.db_path`.
+
+    Each gap is fetched as one chunk strictly between the readings on either
+    side of it, so the bandwidth spent is proportional to the holes rather than
+    the history. Inserting the readings shrinks or removes the gap. Gaps that
+    are still there afterwards are missing upstream; they are flagged and not
+    fetched again unless `include_checked` is set. `config` supplies the
+    database and fetch options (page size, csv, wal, lenient). `measure_ids`
+    and `station_ids` restrict the repair to those measures or stations.
+
+    Returns the total number of newly inserted measurement rows.
+    """
+    def checked(conn: sqlite3.Connection, task: ChunkTask, rows: int) -> None:
+        store = loader.store(task.config)
+        if store:
+            store.mark_gaps_checked(task.measure_id, task.chunk[0] - 1, task.chunk[1])
+        else:
+            mark_gaps_checked(conn, task.measure_id, task.chunk[0] - 1, task.chunk[1])
+
+    with _ChunkLoader("repair", max_workers, checked) as loader:
+        store = loader.store(config)
+        if store:
+            gaps = store.find_gaps(measure_ids, include_checked)
+        else:
+            gaps = find_gaps(loader.writer(config), measure_ids, include_checked)
+        if station_ids is not None:
+            stations = set(station_ids)
+            gaps = [gap for gap in gaps if gap[1] in stations]
+        logger.info(f"Repairing {len(gaps)} gaps ({sum(g[5] for g in gaps)} missing readings)")
+        for measure_id, station_id, param, gap_start, gap_end, _ in gaps:
+            task_config = dataclasses.replace(config, station_notation=station_id or "", required_station_label=None)
+            loader.submit(ChunkTask(task_config, station_id or "", param or "", measure_id, (gap_start + 1, gap_end)))
+        return loader.run()
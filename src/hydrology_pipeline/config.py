@@ -1,9 +1,12 @@
-from dataclasses import dataclass
+import json
+import os
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 # Base endpoint for the Environment Agency Hydrology API
-BASE_URL = "https://environment.data.gov.uk/hydrology"
+# (HYDROLOGY_BASE_URL points the pipeline elsewhere, e.g. at the benchmark stand-in)
+BASE_URL = os.environ.get("HYDROLOGY_BASE_URL", "https://environment.data.gov.uk/hydrology").rstrip("/")
 
 # Required station identifier (Hydrology API notation)
 DEFAULT_STATION_NOTATION = "E64999A"
@@ -17,15 +20,105 @@ DEFAULT_PARAMS = ["conductivity", "dissolved-oxygen"]
 # Parameters supported by the pipeline validation layer
 ALLOWED_PARAMETERS = {"conductivity", "dissolved-oxygen"}
 
+# Preferred unit per parameter when a station has several candidate measures
+PREFERRED_UNITS = {"dissolved-oxygen": "mg/L"}
+
 # Number of latest readings to fetch per parameter
 DEFAULT_LIMIT = 10
+
+# Number of readings requested per page when streaming a measure's history
+DEFAULT_PAGE_SIZE = 2000
+
+# Size cap of the on-disk HTTP response cache before LRU eviction
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Freshness lifetime in seconds per endpoint (URL regex); unmatched URLs are not cached.
+# Single station and measure documents change rarely; the paginated catalogue listings
+# (crawled to refresh the catalogue) and readings are never cached.
+DEFAULT_CACHE_TTLS = (
+    (r"/id/stations/[^/]+\.json$", 24 * 3600),
+    (r"/id/measures/[^/]+\.json$", 24 * 3600),
+)
+
+# Number of rows sent to SQLite per executemany batch
+DEFAULT_BATCH_SIZE = 5000
+
+# Number of concurrent API workers used for multi-station runs
+DEFAULT_MAX_WORKERS = 8
+
+# Number of threads normalizing fetched pages between the fetchers and the writer
+DEFAULT_TRANSFORM_WORKERS = 2
+
+# Upper bound on the rows the writer commits in one transaction
+DEFAULT_COMMIT_ROWS = 50000
+
+# Size of the pooled keep-alive HTTP connection pool
+DEFAULT_POOL_SIZE = 16
+
+# Sustained request rate (requests per second) allowed against the API
+DEFAULT_RATE_LIMIT = 10.0
+
+# Number of retries for throttled (429), unavailable (5xx) or dropped requests
+DEFAULT_MAX_RETRIES = 5
+
+# Backfill: length of the time range fetched and checkpointed as one unit (days)
+DEFAULT_BACKFILL_CHUNK_DAYS = 30
+
+# Daemon: poll interval for measures without an observed or catalogued period (seconds)
+DEFAULT_POLL_INTERVAL = 900
+
+# Daemon: shortest poll interval, however close together a measure's readings are (seconds)
+MIN_POLL_INTERVAL = 60
+
+# Daemon: random spread applied to each poll interval, as a fraction of it
+DEFAULT_POLL_JITTER = 0.1
+
+# Read API: address the local serving endpoint binds to
+DEFAULT_SERVE_HOST = "127.0.0.1"
+DEFAULT_SERVE_PORT = 8088
+
+# Read API: read-only SQLite connections (and threads) answering cache misses
+DEFAULT_READ_POOL_SIZE = 4
+
+# Read API: encoded responses kept in the in-process LRU cache
+DEFAULT_RESULT_CACHE_ENTRIES = 1024
+
+# Anomaly detection: weight of the newest reading in the rolling mean and variance
+DEFAULT_ANOMALY_ALPHA = 0.05
+
+# Anomaly detection: deviation from the rolling mean, in standard deviations, that raises an alert
+DEFAULT_ANOMALY_ZSCORE = 4.0
+
+# Anomaly detection: readings a measure needs before its alerts are trusted
+DEFAULT_ANOMALY_WARMUP = 30
+
+# Anomaly detection: deviations watched per parameter ("high", "low"; others watch "both")
+ANOMALY_DIRECTIONS = {"conductivity": "high", "dissolved-oxygen": "low"}
+
+
 @dataclass(frozen=True)
 class PipelineConfig:
     """
     Configuration object for the ETL pipeline.
 
     Holds runtime parameters such as station, selected measures,
-    database path and timeout configuration.
+    database path and timeout configuration. When `since` is set the
+    pipeline streams the measure history between `since` and `until`
+    page by page instead of fetching the latest `limit` readings.
+    With `incremental` set, measures already in the database are only
+    fetched from their latest stored reading onwards; unseen measures
+    fall back to the latest `limit` readings (or to `since`).
+    With `batch_measures` set, measures streamed from a start time are
+    fetched together with one station-level readings request.
+    With `csv` set, history streams use the CSV endpoint and feed the
+    bulk loader in fixed-size batches.
+    With `lenient` set, readings with a bad timestamp, an unparsable value or
+    an unexpected quality flag are stored in `rejected_readings` and the
+    valid readings of the page still load, instead of the run failing.
+    With `partitioned` set, `db_path` is a directory holding one readings
+    shard per year next to a catalog database (see partitions.py).
+    With `detect_anomalies` set, loaded readings are scored against each
+    measure's rolling statistics and flagged in `alerts` (see anomaly.py).
     """
 
     station_notation: str = DEFAULT_STATION_NOTATION
@@ -34,7 +127,60 @@ class PipelineConfig:
     limit: int = DEFAULT_LIMIT
     db_path: Path = Path("data") / "hydrology.db"
     timeout_seconds: int = 30
+    since: Optional[str] = None
+    until: Optional[str] = None
+    page_size: int = DEFAULT_PAGE_SIZE
+    incremental: bool = False
+    batch_measures: bool = False
+    csv: bool = False
+    wal: bool = False
+    lenient: bool = False
+    detect_anomalies: bool = False
+    partitioned: bool = False
 
     def __post_init__(self) -> None:
         # Ensure default parameters are applied if none are provided
-        object.__setattr__(self, "params", self.params or list(DEFAULT_PARAMS))
\ No newline at end of file
+        object.__setattr__(self, "params", self.params or list(DEFAULT_PARAMS))
+
+
+def load_manifest(path: Path, defaults: Optional[Dict[str, Any]] = None) -> List[PipelineConfig]:
+    """
+    Load a list of PipelineConfig objects from a JSON manifest file.
+
+    The manifest is either a list of entries or an object with a "stations" list.
+    Each entry is a station notation string or an object whose keys match
+    PipelineConfig fields. Values in `defaults` apply to every entry unless the
+    entry overrides them. Unlike the single-station CLI, manifest entries do not
+    check the station label unless `required_station_label` is given.
+
+    Raises ValueError if the manifest is malformed.
+    """
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        raise ValueError(f"Could not read manifest {path}: {exc}") from exc
+
+    entries = data.get("stations") if isinstance(data, dict) else data
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"Manifest {path} must contain a non-empty list of stations")
+
+    allowed = {f.name for f in fields(PipelineConfig)}
+    base: Dict[str, Any] = {"required_station_label": None, **(defaults or {})}
+
+    configs: List[PipelineConfig] = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"station_notation": entry}
+        if not isinstance(entry, dict) or "station_notation" not in entry:
+            raise ValueError(f"Invalid manifest entry: {entry!r}")
+
+        unknown = set(entry) - allowed
+        if unknown:
+            raise ValueError(f"Unknown manifest fields: {sorted(unknown)}")
+
+        merged = {**base, **entry}
+        if "db_path" in merged:
+            merged["db_path"] = Path(merged["db_path"])
+        configs.append(PipelineConfig(**merged))
+
+    return configs
@@ -0,0 +1,299 @@
+import heapq
+import logging
+import queue
+import random
+import signal
+import sqlite3
+import statistics
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from . import metrics
+from .config import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_POLL_JITTER,
+    MIN_POLL_INTERVAL,
+    PipelineConfig,
+)
+from .db import get_high_water_marks, get_reading_periods, upsert_station
+from .partitions import PartitionedStore
+from .pipeline import catalogued_measures, fetch_station, measure_pages, store_for, write_page, writer_for
+from .transform import epoch_to_iso
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Delay before retrying the setup of a station that failed to load (seconds)
+STATION_RETRY_SECONDS = 300
+
+# Base delay of the exponential backoff after failed polls (seconds)
+FAILURE_BACKOFF_SECONDS = 60
+
+
+@dataclass(order=True)
+class PollTask:
+    """
+    A scheduled poll of one measure, ordered by due time on the scheduler heap.
+
+    `since` is the latest stored reading time (None until the measure has
+    readings), `period` the measure's reading interval in seconds. A task
+    without `measure_id` (re)loads its station. `broken` marks a poll whose
+    results could not be written; it is retried like a failed request.
+    """
+
+    due: float
+    seq: int
+    config: PipelineConfig = field(compare=False)
+    station_id: str = field(compare=False, default="")
+    param: str = field(compare=False, default="")
+    measure_id: Optional[str] = field(compare=False, default=None)
+    period: int = field(compare=False, default=DEFAULT_POLL_INTERVAL)
+    since: Optional[str] = field(compare=False, default=None)
+    failures: int = field(compare=False, default=0)
+    broken: bool = field(compare=False, default=False)
+
+
+class PollingDaemon:
+    """
+    Long-running poller that keeps the HTTP session and SQLite connections open.
+
+    Each station is looked up once; each of its measures is then polled on
+    its own cadence, taken from the observed reading interval (e.g. 15
+    minutes or daily, updated from every fetched page) with random jitter so
+    polls do not synchronize. A poll fetches only readings from the measure's
+    latest stored reading onwards.
+
+    Backpressure: at most `max_inflight` polls run at once. Due polls wait on
+    the heap while the API is slow, and failed polls back off exponentially,
+    on top of the client's adaptive rate limit.
+    """
+
+    def __init__(
+        self,
+        configs: Sequence[PipelineConfig],
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        jitter: float = DEFAULT_POLL_JITTER,
+        metrics_prom: Optional[Path] = None,
+        metrics_interval: float = 15.0,
+    ) -> None:
+        if max_workers <= 0:
+            raise ValueError("max_workers must be a positive integer")
+        self.configs = list(configs)
+        self.max_inflight = max_workers
+        self.jitter = jitter
+        self.metrics_prom = metrics_prom
+        self.metrics_interval = metrics_interval
+        self.results: queue.Queue = queue.Queue(maxsize=max_workers * 2)
+        self._heap: List[PollTask] = []
+        self._seq = 0
+        self._inflight = 0
+        self._futures: List[Future] = []
+        self._conns: Dict[Path, sqlite3.Connection] = {}
+        self._stores: Dict[Path, PartitionedStore] = {}
+        self._stop = threading.Event()
+        self._metrics_written = 0.0
+
+    def stop(self) -> None:
+        """Ask the daemon to stop; polls already in flight are finished first."""
+        self._stop.set()
+
+    def install_signal_handlers(self) -> Dict[int, Any]:
+        """
+        Stop gracefully on SIGINT/SIGTERM (must be called from the main thread).
+
+        Returns the previous handlers so they can be restored.
+        """
+        previous = {}
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            previous[sig] = signal.signal(sig, lambda signum, frame: self._on_signal(signum))
+        return previous
+
+    def _on_signal(self, signum: int) -> None:
+        logger.info(f"Received signal {signum}; finishing in-flight polls and shutting down")
+        self.stop()
+
+    def _schedule(self, task: PollTask, delay: float) -> None:
+        self._seq += 1
+        task.seq = self._seq
+        task.due = time.monotonic() + max(0.0, delay)
+        heapq.heappush(self._heap, task)
+
+    def _jittered(self, period: float) -> float:
+        return period * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _add_station(self, config: PipelineConfig, station: Any, measure_map: Dict[str, str]) -> None:
+        """Register a loaded station and schedule its measures, spread over one period."""
+        conn = writer_for(self._conns, config)
+        store = store_for(self._stores, self._conns, config)
+        upsert_station(conn, station)
+        if store:
+            marks = store.high_water_marks(measure_map.values())
+            periods = store.reading_periods(measure_map.values())
+        else:
+            marks = get_high_water_marks(conn, measure_map.values())
+            periods = get_reading_periods(conn, measure_map.values())
+        for param, measure_id in measure_map.items():
+            period = max(MIN_POLL_INTERVAL, periods.get(measure_id, DEFAULT_POLL_INTERVAL))
+            task = PollTask(0.0, 0, config, station.station_id, param, measure_id, period, marks.get(measure_id))
+            self._schedule(task, random.uniform(0, self.jitter * period))
+            logger.info(f"Scheduled {measure_id} every {period}s")
+
+    def _submit(self, pool: ThreadPoolExecutor, task: PollTask) -> None:
+        self._inflight += 1
+        self._futures = [f for f in self._futures if not f.done()]
+        if task.measure_id is None:
+            catalogued = catalogued_measures(self._conns, [task.config])[0]
+            self._futures.append(pool.submit(fetch_station, task.config, catalogued, self.results))
+        else:
+            self._futures.append(pool.submit(self._poll, task))
+
+    def _poll(self, task: PollTask) -> None:
+        """Worker: fetch a measure's readings since its high-water mark."""
+        try:
+            kind, pages = measure_pages(task.config, task.measure_id, task.since)
+            for page in pages:
+                self.results.put((kind, task, page))
+            self.results.put(("done", task))
+        except Exception as exc:  # type: Exception
+            self.results.put(("error", task, exc))
+
+    def _write(self, kind: str, task: PollTask, readings: Any) -> None:
+        """Insert one page of a poll and advance the measure's high-water mark."""
+        if task.broken:
+            return
+        try:
+            conn = writer_for(self._conns, task.config)
+            batch, inserted = write_page(
+                conn,
+                kind,
+                task.station_id,
+                task.param,
+                task.measure_id,
+                readings,
+                task.config.lenient,
+                task.config.detect_anomalies,
+                store_for(self._stores, self._conns, task.config),
+            )
+        except Exception as exc:  # type: Exception
+            # Later pages are skipped so the high-water mark never passes unwritten rows.
+            logger.error(f"Failed to write poll results for {task.measure_id}: {exc}")
+            task.broken = True
+            return
+        if len(batch):
+            latest = epoch_to_iso(max(batch.epochs))
+            task.since = max(task.since or latest, latest)
+        gaps = [b - a for a, b in zip(batch.epochs, batch.epochs[1:]) if b > a]
+        if gaps:
+            # Follow the cadence the readings actually have (e.g. a 15-minute measure switched to daily);
+            # the median ignores bursts and corrected readings, the floor event-driven measures.
+            task.period = max(MIN_POLL_INTERVAL, statistics.median_low(gaps))
+        metrics.inc("daemon_rows_inserted_total", inserted)
+
+    def _retry(self, target: Any, exc: Exception) -> None:
+        """Reschedule a failed poll with exponential backoff, or a failed station setup."""
+        metrics.inc("daemon_polls_total", result="error")
+        if isinstance(target, PollTask):
+            target.failures += 1
+            target.broken = False
+            delay = min(target.period, FAILURE_BACKOFF_SECONDS * 2 ** (target.failures - 1))
+            logger.error(f"Poll of {target.measure_id} failed ({exc}); retrying in {delay:.0f}s")
+            self._schedule(target, delay)
+        else:
+            logger.error(f"Station {target.station_notation} failed ({exc}); retrying in {STATION_RETRY_SECONDS}s")
+            self._schedule(PollTask(0.0, 0, target), STATION_RETRY_SECONDS)
+
+    def _handle(self, message: Any) -> None:
+        kind = message[0]
+        if kind == "station":
+            _, config, station, measure_map = message
+            self._inflight -= 1
+            self._add_station(config, station, measure_map)
+        elif kind in ("page", "csv"):
+            _, task, readings = message
+            self._write(kind, task, readings)
+        elif kind == "done":
+            task = message[1]
+            self._inflight -= 1
+            if task.broken:
+                self._retry(task, ValueError("results could not be written"))
+                return
+            task.failures = 0
+            metrics.inc("daemon_polls_total", result="ok")
+            self._schedule(task, self._jittered(task.period))
+        else:
+            _, target, exc = message
+            self._inflight -= 1
+            self._retry(target, exc)
+
+    def _write_metrics(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if self.metrics_prom and (force or now - self._metrics_written >= self.metrics_interval):
+            metrics.REGISTRY.write_prometheus(self.metrics_prom)
+            self._metrics_written = now
+
+    def run_forever(self, max_polls: Optional[int] = None) -> None:
+        """
+        Poll until stop() is called (or `max_polls` polls have completed).
+
+        Installs SIGINT/SIGTERM handlers for the duration of the call when
+        called from the main thread. On shutdown no new polls start, in-flight
+        ones are written, and the SQLite connections are closed.
+        """
+        previous_handlers: Dict[int, Any] = {}
+        if threading.current_thread() is threading.main_thread():
+            previous_handlers = self.install_signal_handlers()
+
+        pool = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix="hydrology-poll")
+        completed = 0
+        try:
+            for config in self.configs:
+                self._schedule(PollTask(0.0, 0, config), 0)
+
+            while self._inflight or not self._stop.is_set():
+                now = time.monotonic()
+                while (
+                    not self._stop.is_set()
+                    and self._heap
+                    and self._heap[0].due <= now
+                    and self._inflight < self.max_inflight
+                ):
+                    self._submit(pool, heapq.heappop(self._heap))
+
+                if self._heap and self._inflight < self.max_inflight:
+                    wait = min(1.0, max(0.0, self._heap[0].due - now))
+                else:
+                    wait = 1.0
+                try:
+                    message = self.results.get(timeout=wait)
+                except queue.Empty:
+                    self._write_metrics()
+                    continue
+
+                self._handle(message)
+                if message[0] == "done":
+                    completed += 1
+                    if max_polls is not None and completed >= max_polls:
+                        self.stop()
+                self._write_metrics()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            # Drain the queue so workers blocked on a full queue can exit.
+            while any(not f.done() for f in self._futures):
+                try:
+                    self.results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            for store in self._stores.values():
+                store.close()
+            self._stores.clear()
+            for conn in self._conns.values():
+                conn.close()
+            self._conns.clear()
+            self._write_metrics(force=True)
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+            logger.info(f"Daemon stopped after {completed} polls.")
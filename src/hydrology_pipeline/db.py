@@ -1,21 +1,58 @@
 import logging
 import sqlite3
+import statistics
+from itertools import islice
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from .transform import MeasurementRow, StationRow
+from . import metrics
+from .config import DEFAULT_BATCH_SIZE, PREFERRED_UNITS
+from .transform import (
+    QUALITY_CODES,
+    MeasureRow,
+    MeasurementBatch,
+    MeasurementRow,
+    MeasurementTuple,
+    StationRow,
+    epoch_to_iso,
+    parse_epoch,
+)
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+# Schema version stored in PRAGMA user_version.
+# 1: text `measurements` fact table; 2: integer-keyed `readings` table and `measurements` view;
+# 3: hourly/daily `rollups`.
+SCHEMA_VERSION = 3
 
-def connect(db_path: Path) -> sqlite3.Connection:
+# Rollup grains kept in the `rollups` table: name -> bucket width in seconds
+ROLLUP_GRAINS = {"1h": 3600, "1d": 86400}
+
+# Two consecutive readings further apart than this many periods are recorded as a gap
+GAP_TOLERANCE = 1.5
+
+# Compact reading as stored in the `readings` fact table: (measure_key, epoch, value, quality)
+ReadingTuple = Tuple[int, int, Optional[float], int]
+
+
+def connect(db_path: Path, wal: bool = False) -> sqlite3.Connection:
     """
     Connect to the SQLite database, creating parent directories if needed.
+
+    With `wal=True` the connection uses the bulk-load profile: write-ahead
+    logging with synchronous=NORMAL (durable across application crashes, one
+    fsync per checkpoint instead of per commit), in-memory temp storage and a
+    larger page cache. Readers are not blocked by the writer in WAL mode.
     """
     db_path.parent.mkdir(parents=True, exist_ok=True)
     try:
         conn = sqlite3.connect(str(db_path))
         conn.execute("PRAGMA foreign_keys = ON;")
+        if wal:
+            conn.execute("PRAGMA journal_mode = WAL;")
+            conn.execute("PRAGMA synchronous = NORMAL;")
+            conn.execute("PRAGMA temp_store = MEMORY;")
+            conn.execute("PRAGMA cache_size = -65536;")
         logger.info(f"Connected to SQLite DB at {db_path}")
         return conn
     except Exception as exc:  # type: Exception
@@ -23,9 +60,41 @@ def connect(db_path: Path) -> sqlite3.Connection:
         raise
 
 
+# Readings with their original text columns, as exposed by the `measurements` view
+MEASUREMENTS_VIEW_SQL = """
+SELECT
+    m.station_id,
+    m.observed_property,
+    m.measure_id,
+    strftime('%Y-%m-%dT%H:%M:%S+00:00', r.epoch, 'unixepoch') AS date_time,
+    r.value,
+    q.label AS quality,
+    datetime(r.ingested_at, 'unixepoch') AS ingested_at,
+    r.epoch
+FROM readings r
+JOIN measures m ON m.measure_key = r.measure_key
+LEFT JOIN quality_codes q ON q.code = r.quality
+"""
+
+
 def init_db(conn: sqlite3.Connection) -> None:
     """
-    Initialize the database schema for stations and measurements tables.
+    Initialize the database schema, migrating a version 1 database if needed.
+
+    Readings live in the compact `readings` fact table: a WITHOUT ROWID table
+    keyed on (measure_key, epoch) with INTEGER epoch seconds and a small-int
+    quality code. Measure identity (measure_id, station_id, observed_property)
+    is stored once in the `measures` dimension and quality labels in
+    `quality_codes`. The `measurements` view exposes the original text columns
+    to readers. `rollups` holds hourly and daily aggregates per measure and
+    `gaps` the holes in each measure's series; both are populated from
+    existing readings when they are first created. When SQLite has the
+    R*Tree module, `stations_rtree` indexes station coordinates and is kept
+    in sync with `stations` by triggers. `anomaly_state` holds the rolling
+    statistics of the anomaly detector per measure and `alerts` the readings
+    it flagged.
+    `backfill_chunks` records the finished [start, end) chunks of backfills
+    and `rejected_readings` the raw payloads that failed validation in lenient runs.
     """
     schema = """
     CREATE TABLE IF NOT EXISTS stations (
@@ -38,50 +107,412 @@ def init_db(conn: sqlite3.Connection) -> None:
         extracted_at TEXT DEFAULT (datetime('now'))
     );
 
-    CREATE TABLE IF NOT EXISTS measurements (
-        station_id        TEXT NOT NULL,
-        observed_property TEXT NOT NULL,
-        measure_id        TEXT NOT NULL,
-        date_time         TEXT NOT NULL,
-        value             REAL,
-        quality           TEXT,
-        ingested_at       TEXT DEFAULT (datetime('now')),
-        PRIMARY KEY (measure_id, date_time),
-        FOREIGN KEY (station_id) REFERENCES stations(station_id)
+    CREATE TABLE IF NOT EXISTS measures (
+        measure_key       INTEGER PRIMARY KEY,
+        measure_id        TEXT NOT NULL UNIQUE,
+        station_id        TEXT,
+        observed_property TEXT,
+        unit              TEXT,
+        period            INTEGER,
+        value_type        TEXT,
+        label             TEXT,
+        updated_at        TEXT DEFAULT (datetime('now'))
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_measures_station_prop
+    ON measures(station_id, observed_property, value_type, period, unit);
+
+    CREATE TABLE IF NOT EXISTS quality_codes (
+        code  INTEGER PRIMARY KEY,
+        label TEXT NOT NULL UNIQUE
+    );
+
+    CREATE TABLE IF NOT EXISTS readings (
+        measure_key INTEGER NOT NULL REFERENCES measures(measure_key),
+        epoch       INTEGER NOT NULL,
+        value       REAL,
+        quality     INTEGER NOT NULL DEFAULT 0,
+        ingested_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        PRIMARY KEY (measure_key, epoch)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS rollups (
+        measure_key INTEGER NOT NULL REFERENCES measures(measure_key),
+        grain       INTEGER NOT NULL,
+        bucket      INTEGER NOT NULL,
+        n           INTEGER NOT NULL,
+        total       REAL,
+        minimum     REAL,
+        maximum     REAL,
+        sumsq       REAL,
+        PRIMARY KEY (measure_key, grain, bucket)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS gaps (
+        measure_key INTEGER NOT NULL REFERENCES measures(measure_key),
+        gap_start   INTEGER NOT NULL,
+        gap_end     INTEGER NOT NULL,
+        missing     INTEGER NOT NULL,
+        checked_at  INTEGER,
+        PRIMARY KEY (measure_key, gap_start)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS anomaly_state (
+        measure_key INTEGER PRIMARY KEY REFERENCES measures(measure_key),
+        last_epoch  INTEGER NOT NULL,
+        n           INTEGER NOT NULL,
+        mean        REAL NOT NULL,
+        var         REAL NOT NULL
     );
 
-    CREATE INDEX IF NOT EXISTS idx_measurements_station_prop_dt
-    ON measurements(station_id, observed_property, date_time);
+    CREATE TABLE IF NOT EXISTS alerts (
+        measure_key INTEGER NOT NULL REFERENCES measures(measure_key),
+        epoch       INTEGER NOT NULL,
+        kind        TEXT NOT NULL,
+        value       REAL NOT NULL,
+        expected    REAL NOT NULL,
+        zscore      REAL NOT NULL,
+        created_at  INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        PRIMARY KEY (measure_key, epoch, kind)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS rejected_readings (
+        measure_id  TEXT NOT NULL,
+        payload     TEXT NOT NULL,
+        reason      TEXT NOT NULL,
+        rejected_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        PRIMARY KEY (measure_id, payload, reason)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS backfill_chunks (
+        measure_id   TEXT NOT NULL,
+        chunk_start  INTEGER NOT NULL,
+        chunk_end    INTEGER NOT NULL,
+        rows         INTEGER NOT NULL,
+        completed_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        PRIMARY KEY (measure_id, chunk_start, chunk_end)
+    ) WITHOUT ROWID;
     """
 
+    view = f"CREATE VIEW IF NOT EXISTS measurements AS {MEASUREMENTS_VIEW_SQL};"
+
+    seed = "INSERT OR IGNORE INTO quality_codes(code, label) VALUES %s;" % ", ".join(
+        f"({code}, '{label}')" for label, code in QUALITY_CODES.items() if label is not None
+    )
+
     try:
-        with conn:
-            conn.executescript(schema)
+        legacy = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'measurements';"
+        ).fetchone()
+        total = conn.execute("SELECT COUNT(*) FROM measurements;").fetchone()[0] if legacy else 0
+        if legacy:
+            logger.info(f"Migrating {total} measurements to schema version {SCHEMA_VERSION}")
+        new_rollups = not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollups';"
+        ).fetchone()
+        new_gaps = not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'gaps';"
+        ).fetchone()
+        spatial = _STATIONS_RTREE_SQL if has_rtree(conn) else ""
+
+        # One script, one transaction: a failed migration leaves the v1 table untouched.
+        conn.executescript(
+            "BEGIN;"
+            + schema
+            + seed
+            + (_MIGRATE_V1_SQL if legacy else "")
+            + ("".join(f"{sql};" for sql in _rollup_sql("true")) if new_rollups else "")
+            + view
+            + spatial
+            + f"PRAGMA user_version = {SCHEMA_VERSION};"
+            + "COMMIT;"
+        )
+
+        if legacy:
+            migrated = conn.execute("SELECT COUNT(*) FROM readings;").fetchone()[0]
+            if migrated < total:
+                logger.warning(
+                    f"Migration kept {migrated}/{total} rows (unparsable or duplicate timestamps dropped)"
+                )
+            logger.info("Migration complete; run VACUUM to reclaim the space of the old table.")
+        if new_gaps:
+            rebuild_gaps(conn)
         logger.info("Database schema initialized.")
     except Exception as exc:  # type: Exception
+        if conn.in_transaction:
+            conn.rollback()
         logger.error(f"Failed to initialize database schema: {exc}")
         raise
 
 
-def upsert_station(conn: sqlite3.Connection, station: StationRow) -> None:
+# Spatial index over station coordinates (one point box per station rowid),
+# filled from existing stations once and then maintained by triggers.
+_STATIONS_RTREE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS stations_rtree USING rtree(id, min_lat, max_lat, min_long, max_long);
+
+INSERT OR IGNORE INTO stations_rtree SELECT rowid, lat, lat, long, long FROM stations;
+
+CREATE TRIGGER IF NOT EXISTS stations_rtree_insert AFTER INSERT ON stations BEGIN
+    INSERT INTO stations_rtree VALUES (new.rowid, new.lat, new.lat, new.long, new.long);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stations_rtree_update AFTER UPDATE OF lat, long ON stations BEGIN
+    UPDATE stations_rtree SET min_lat = new.lat, max_lat = new.lat, min_long = new.long, max_long = new.long
+    WHERE id = new.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stations_rtree_delete AFTER DELETE ON stations BEGIN
+    DELETE FROM stations_rtree WHERE id = old.rowid;
+END;
+"""
+
+
+def has_rtree(conn: sqlite3.Connection) -> bool:
+    """Return True if this SQLite build includes the R*Tree module."""
+    return any(row[0] == "ENABLE_RTREE" for row in conn.execute("PRAGMA compile_options;"))
+
+
+# Moves a version 1 `measurements` table into the compact layout: measures and
+# quality labels are registered in their dimension tables, readings are copied
+# in primary-key order with ISO timestamps converted to epoch seconds (naive
+# values as UTC), and the old table and its index are dropped.
+_MIGRATE_V1_SQL = """
+ALTER TABLE measurements RENAME TO measurements_v1;
+
+INSERT OR IGNORE INTO measures(measure_id, station_id, observed_property)
+SELECT measure_id, MIN(station_id), MIN(observed_property)
+FROM measurements_v1
+GROUP BY measure_id;
+
+INSERT OR IGNORE INTO quality_codes(label)
+SELECT DISTINCT quality FROM measurements_v1 WHERE quality IS NOT NULL;
+
+INSERT OR IGNORE INTO readings(measure_key, epoch, value, quality, ingested_at)
+SELECT
+    m.measure_key,
+    CAST(strftime('%s', v.date_time) AS INTEGER) AS epoch,
+    v.value,
+    COALESCE(q.code, 0),
+    COALESCE(CAST(strftime('%s', v.ingested_at) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+FROM measurements_v1 v
+JOIN measures m ON m.measure_id = v.measure_id
+LEFT JOIN quality_codes q ON q.label = v.quality
+WHERE epoch IS NOT NULL
+ORDER BY m.measure_key, epoch;
+
+DROP TABLE measurements_v1;
+"""
+
+
+def _rollup_sql(where: str) -> Tuple[str, str]:
     """
-    Insert or update a station record in the database.
+    Statements recomputing rollup buckets for the readings matching `where`.
+
+    Hourly buckets are aggregated from `readings`, then daily buckets from the
+    hourly rows, so a day costs 24 rows rather than every raw reading. `where`
+    filters `readings` and is applied to the hourly bucket column for days.
+    """
+    upsert = """
+    ON CONFLICT(measure_key, grain, bucket) DO UPDATE SET
+        n=excluded.n,
+        total=excluded.total,
+        minimum=excluded.minimum,
+        maximum=excluded.maximum,
+        sumsq=excluded.sumsq
+    """
+    hourly = f"""
+    INSERT INTO rollups(measure_key, grain, bucket, n, total, minimum, maximum, sumsq)
+    SELECT measure_key, 3600, (epoch / 3600) * 3600,
+           COUNT(value), SUM(value), MIN(value), MAX(value), SUM(value * value)
+    FROM readings
+    WHERE {where}
+    GROUP BY measure_key, epoch / 3600
+    {upsert}
+    """
+    daily = f"""
+    INSERT INTO rollups(measure_key, grain, bucket, n, total, minimum, maximum, sumsq)
+    SELECT measure_key, 86400, (epoch / 86400) * 86400,
+           SUM(n), SUM(total), MIN(minimum), MAX(maximum), SUM(sumsq)
+    FROM (SELECT measure_key, bucket AS epoch, n, total, minimum, maximum, sumsq
+          FROM rollups WHERE grain = 3600)
+    WHERE {where}
+    GROUP BY measure_key, epoch / 86400
+    {upsert}
+    """
+    return hourly, daily
+
+
+def _refresh_rollups(conn: sqlite3.Connection, spans: Dict[int, List[int]]) -> None:
+    """
+    Recompute the rollup buckets covering each measure's [first, last] epoch span.
+
+    Runs inside the caller's transaction. Whole days are recomputed so that
+    the daily buckets see every hour that contributes to them.
+    """
+    hourly, daily = _rollup_sql("measure_key = ? AND epoch >= ? AND epoch < ?")
+    params = [(key, lo - lo % 86400, hi - hi % 86400 + 86400) for key, (lo, hi) in spans.items()]
+    conn.executemany(hourly, params)
+    conn.executemany(daily, params)
+
+
+def rebuild_rollups(conn: sqlite3.Connection) -> int:
+    """
+    Recompute every rollup bucket from the stored readings.
+
+    Use after loading readings outside this module (e.g. manual SQL).
+    Returns the number of rollup rows written.
+    """
+    try:
+        with conn:
+            conn.execute("DELETE FROM rollups;")
+            for statement in _rollup_sql("true"):
+                conn.execute(statement)
+            written = conn.execute("SELECT COUNT(*) FROM rollups;").fetchone()[0]
+        logger.info(f"Rebuilt {written} rollup buckets.")
+        return written
+    except Exception as exc:  # type: Exception
+        logger.error(f"Failed to rebuild rollups: {exc}")
+        raise
+
+
+# Gaps between consecutive readings of one measure within [:lo, :hi], from a
+# LAG window over the primary key; `missing` counts the expected readings.
+_GAPS_SQL = """
+INSERT INTO gaps(measure_key, gap_start, gap_end, missing)
+SELECT :key, prev, epoch, MAX(1, CAST(ROUND(1.0 * (epoch - prev) / :period) AS INTEGER) - 1)
+FROM (
+    SELECT epoch, LAG(epoch) OVER (ORDER BY epoch) AS prev
+    FROM readings
+    WHERE measure_key = :key AND epoch >= :lo AND epoch <= :hi
+)
+WHERE epoch - prev > :period * :tolerance;
+"""
+
+
+def _observed_period(conn: sqlite3.Connection, key: int) -> Optional[int]:
+    """
+    Return the median gap between a measure's latest few stored readings (a backwards primary-key scan).
+
+    The median keeps a burst or a single off-cadence reading from shrinking the period.
+    """
+    epochs = [r[0] for r in conn.execute(
+        "SELECT epoch FROM readings WHERE measure_key = ? ORDER BY epoch DESC LIMIT 8;", (key,)
+    )]
+    gaps = [a - b for a, b in zip(epochs, epochs[1:]) if a > b]
+    return statistics.median_low(gaps) if gaps else None
+
+
+def _expected_period(conn: sqlite3.Connection, key: int) -> Optional[int]:
+    """Return a measure's reading period: the catalogue `period`, else the observed one."""
+    row = conn.execute("SELECT period FROM measures WHERE measure_key = ?;", (key,)).fetchone()
+    if row and row[0]:
+        return int(row[0])
+    return _observed_period(conn, key)
+
+
+def _refresh_gaps(conn: sqlite3.Connection, spans: Dict[int, List[int]]) -> None:
+    """
+    Recompute the gaps around each measure's [first, last] inserted epoch span.
+
+    Runs inside the caller's transaction. The span is widened to the stored
+    readings just outside it, so a gap that new readings split or close is
+    replaced. Measures without a known period are skipped.
+    """
+    for key, (lo, hi) in spans.items():
+        period = _expected_period(conn, key)
+        if not period:
+            continue
+        before = conn.execute(
+            "SELECT MAX(epoch) FROM readings WHERE measure_key = ? AND epoch < ?;", (key, lo)
+        ).fetchone()[0]
+        after = conn.execute(
+            "SELECT MIN(epoch) FROM readings WHERE measure_key = ? AND epoch > ?;", (key, hi)
+        ).fetchone()[0]
+        lo = lo if before is None else before
+        hi = hi if after is None else after
+        conn.execute("DELETE FROM gaps WHERE measure_key = ? AND gap_start < ? AND gap_end > ?;", (key, hi, lo))
+        conn.execute(_GAPS_SQL, {"key": key, "lo": lo, "hi": hi, "period": period, "tolerance": GAP_TOLERANCE})
+
+
+def rebuild_gaps(conn: sqlite3.Connection) -> int:
+    """
+    Recompute the `gaps` table from the stored readings of every measure.
+
+    Use after the catalogue periods changed or readings were loaded outside
+    this module. Returns the number of gaps found.
+    """
+    try:
+        with conn:
+            conn.execute("DELETE FROM gaps;")
+            spans = conn.execute("SELECT measure_key, MIN(epoch), MAX(epoch) FROM readings GROUP BY measure_key;")
+            _refresh_gaps(conn, {key: [lo, hi] for key, lo, hi in spans.fetchall()})
+            found = conn.execute("SELECT COUNT(*) FROM gaps;").fetchone()[0]
+        logger.info(f"Found {found} gaps.")
+        return found
+    except Exception as exc:  # type: Exception
+        logger.error(f"Failed to rebuild gaps: {exc}")
+        raise
+
+
+def find_gaps(
+    conn: sqlite3.Connection,
+    measure_ids: Optional[Iterable[str]] = None,
+    include_checked: bool = False,
+) -> List[Tuple[str, Optional[str], Optional[str], int, int, int]]:
+    """
+    Return the gaps to repair as (measure_id, station_id, observed_property, gap_start, gap_end, missing).
+
+    `gap_start` and `gap_end` are the epochs of the stored readings on either
+    side of the hole. Gaps already fetched by a repair without being filled
+    (missing upstream) are left out unless `include_checked` is set.
     """
     sql = """
-    INSERT INTO stations(station_id, label, lat, long, river_name, date_opened)
-    VALUES(?,?,?,?,?,?)
-    ON CONFLICT(station_id) DO UPDATE SET
-        label=excluded.label,
-        lat=excluded.lat,
-        long=excluded.long,
-        river_name=excluded.river_name,
-        date_opened=excluded.date_opened;
+    SELECT m.measure_id, m.station_id, m.observed_property, g.gap_start, g.gap_end, g.missing
+    FROM gaps g
+    JOIN measures m ON m.measure_key = g.measure_key
+    WHERE (? OR g.checked_at IS NULL)
     """
+    params: List[Any] = [include_checked]
+    if measure_ids is not None:
+        ids = list(measure_ids)
+        sql += f" AND m.measure_id IN ({', '.join('?' * len(ids))})"
+        params.extend(ids)
+    return conn.execute(sql + " ORDER BY m.measure_id, g.gap_start;", params).fetchall()
+
+
+def mark_gaps_checked(conn: sqlite3.Connection, measure_id: str, start: int, end: int) -> None:
+    """Flag the remaining gaps of a measure within [start, end] as fetched by a repair."""
+    with conn:
+        conn.execute(
+            """
+            UPDATE gaps SET checked_at = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE measure_key = (SELECT measure_key FROM measures WHERE measure_id = ?)
+              AND gap_start >= ? AND gap_end <= ?;
+            """,
+            (measure_id, start, end),
+        )
+
 
+_UPSERT_STATION_SQL = """
+INSERT INTO stations(station_id, label, lat, long, river_name, date_opened)
+VALUES(?,?,?,?,?,?)
+ON CONFLICT(station_id) DO UPDATE SET
+    label=excluded.label,
+    lat=excluded.lat,
+    long=excluded.long,
+    river_name=excluded.river_name,
+    date_opened=excluded.date_opened;
+"""
+
+
+def upsert_station(conn: sqlite3.Connection, station: StationRow) -> None:
+    """
+    Insert or update a station record in the database.
+    """
     try:
         with conn:
             conn.execute(
-                sql,
+                _UPSERT_STATION_SQL,
                 (
                     station.station_id,
                     station.label,
@@ -97,42 +528,396 @@ def upsert_station(conn: sqlite3.Connection, station: StationRow) -> None:
         raise
 
 
-def insert_measurements(conn: sqlite3.Connection, rows: Iterable[MeasurementRow]) -> int:
+def upsert_stations(conn: sqlite3.Connection, rows: Iterable[StationRow]) -> int:
     """
-    Insert measurement rows into the database.
+    Insert or update station records in one executemany batch.
 
-    Duplicates are ignored via the composite primary key
-    (measure_id, date_time), ensuring idempotent pipeline runs.
+    Returns the number of records written.
+    """
+    # Every row is either inserted or updated; total_changes would also count trigger writes.
+    params = [(s.station_id, s.label, s.lat, s.long, s.river_name, s.date_opened) for s in rows]
+    try:
+        with conn:
+            conn.executemany(_UPSERT_STATION_SQL, params)
+        written = len(params)
+        logger.info(f"Upserted {written} stations.")
+        return written
+    except Exception as exc:  # type: Exception
+        logger.error(f"Failed to upsert stations: {exc}")
+        raise
+
+
+def upsert_measures(conn: sqlite3.Connection, rows: Iterable[MeasureRow]) -> int:
+    """
+    Insert or update measure catalogue records in one executemany batch.
+
+    Returns the number of records written.
     """
     sql = """
-    INSERT INTO measurements(
-        station_id, observed_property, measure_id, date_time,
-        value, quality
+    INSERT INTO measures(measure_id, station_id, observed_property, unit, period, value_type, label)
+    VALUES(?,?,?,?,?,?,?)
+    ON CONFLICT(measure_id) DO UPDATE SET
+        station_id=excluded.station_id,
+        observed_property=excluded.observed_property,
+        unit=excluded.unit,
+        period=excluded.period,
+        value_type=excluded.value_type,
+        label=excluded.label,
+        updated_at=datetime('now');
+    """
+
+    try:
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                sql,
+                (
+                    (m.measure_id, m.station_id, m.observed_property, m.unit, m.period, m.value_type, m.label)
+                    for m in rows
+                ),
+            )
+            written = conn.total_changes - before
+        logger.info(f"Upserted {written} catalogue measures.")
+        return written
+    except Exception as exc:  # type: Exception
+        logger.error(f"Failed to upsert measures: {exc}")
+        raise
+
+
+def _measure_preference(param: str, unit: Optional[str], period: Optional[int], value_type: Optional[str]) -> tuple:
+    """Sort key ranking candidate measures: instantaneous, preferred unit, finest period."""
+    preferred_unit = PREFERRED_UNITS.get(param)
+    return (
+        value_type != "instantaneous",
+        preferred_unit is not None and (unit or "").lower() != preferred_unit.lower(),
+        period if period is not None else float("inf"),
     )
-    VALUES(?,?,?,?,?,?)
-    ON CONFLICT(measure_id, date_time) DO NOTHING;
+
+
+def find_measures(
+    conn: sqlite3.Connection,
+    station_ids: Sequence[str],
+    params: Sequence[str],
+) -> Dict[str, Dict[str, str]]:
+    """
+    Resolve measure IDs for many stations and parameters from the catalogue.
+
+    Runs a single query served by idx_measures_station_prop and, where a
+    station has several candidates for a parameter, prefers instantaneous
+    values, then the preferred unit (PREFERRED_UNITS), then the finest period.
+
+    Returns a mapping station_id -> {parameter -> measure_id}; stations or
+    parameters missing from the catalogue are absent from the result.
+    """
+    station_ids = list(dict.fromkeys(station_ids))
+    params = list(dict.fromkeys(p.lower() for p in params))
+    if not station_ids or not params:
+        return {}
+
+    sql = f"""
+    SELECT station_id, observed_property, measure_id, unit, period, value_type
+    FROM measures
+    WHERE station_id IN ({",".join("?" * len(station_ids))})
+      AND observed_property IN ({",".join("?" * len(params))});
+    """
+
+    best: Dict[Tuple[str, str], Tuple[tuple, str]] = {}
+    for station_id, param, measure_id, unit, period, value_type in conn.execute(sql, [*station_ids, *params]):
+        rank = (_measure_preference(param, unit, period, value_type), measure_id)
+        if (station_id, param) not in best or rank < best[(station_id, param)]:
+            best[(station_id, param)] = rank
+
+    resolved: Dict[str, Dict[str, str]] = {}
+    for (station_id, param), (_, measure_id) in best.items():
+        resolved.setdefault(station_id, {})[param] = measure_id
+    return resolved
+
+
+class KeyCache:
+    """
+    Per-call lookup of measure keys and quality codes.
+
+    Unknown measures are registered in the `measures` dimension (keeping any
+    catalogue metadata already present) and unknown quality labels in
+    `quality_codes`, so each identifier hits the database once per call.
+    """
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+        self.measures: Dict[str, int] = {}
+        self.qualities: Dict[Optional[str], int] = {None: 0}
+        self.qualities.update((label, code) for code, label in conn.execute("SELECT code, label FROM quality_codes;"))
+        self.day_cache: Dict[str, int] = {}
+
+    def measure_key(self, measure_id: str, station_id: str, observed_property: str) -> int:
+        key = self.measures.get(measure_id)
+        if key is None:
+            self.conn.execute(
+                """
+                INSERT INTO measures(measure_id, station_id, observed_property)
+                VALUES(?,?,?)
+                ON CONFLICT(measure_id) DO UPDATE SET
+                    station_id=COALESCE(measures.station_id, excluded.station_id),
+                    observed_property=COALESCE(measures.observed_property, excluded.observed_property)
+                WHERE measures.station_id IS NULL OR measures.observed_property IS NULL;
+                """,
+                (measure_id, station_id, observed_property),
+            )
+            key = self.conn.execute(
+                "SELECT measure_key FROM measures WHERE measure_id = ?;", (measure_id,)
+            ).fetchone()[0]
+            self.measures[measure_id] = key
+        return key
+
+    def quality_code(self, label: Optional[str]) -> int:
+        code = self.qualities.get(label)
+        if code is None:
+            code = self.conn.execute("INSERT INTO quality_codes(label) VALUES(?);", (label,)).lastrowid
+            self.qualities[label] = code
+        return code
+
+    def compact(self, row: MeasurementTuple) -> ReadingTuple:
+        """Convert a MeasurementTuple into a compact readings row."""
+        station_id, observed_property, measure_id, date_time, value, quality = row
+        return (
+            self.measure_key(measure_id, station_id, observed_property),
+            parse_epoch(date_time, self.day_cache),
+            value,
+            self.quality_code(quality),
+        )
+
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield successive lists of at most `size` items."""
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _as_tuples(rows: Iterable[MeasurementRow]) -> Iterator[MeasurementTuple]:
+    """Convert MeasurementRow objects into insert parameter tuples."""
+    for r in rows:
+        yield (r.station_id, r.observed_property, r.measure_id, r.date_time, r.value, r.quality)
+
+
+def _insert_readings(
+    conn: sqlite3.Connection,
+    rows: Iterable[Any],
+    to_reading: Callable[[Any], ReadingTuple],
+    batch_size: int,
+) -> int:
+    """
+    Insert rows into `readings` in chunked executemany batches, inside the caller's transaction.
+
+    Each chunk is converted first (which may register measures or quality
+    labels), so the `total_changes` delta around executemany counts only
+    readings that were actually inserted. The rollup buckets and gaps touched
+    by chunks that inserted anything are recomputed at the end.
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be a positive integer")
+
+    sql = """
+    INSERT INTO readings(measure_key, epoch, value, quality)
+    VALUES(?,?,?,?)
+    ON CONFLICT(measure_key, epoch) DO NOTHING;
     """
 
     inserted = 0
+    seen = 0
+    spans: Dict[int, List[int]] = {}
+    with metrics.span("insert"):
+        for chunk in _chunks(rows, batch_size):
+            compact = [to_reading(r) for r in chunk]
+            before = conn.total_changes
+            conn.executemany(sql, compact)
+            changed = conn.total_changes - before
+            inserted += changed
+            seen += len(compact)
+            if changed:
+                for key, epoch, _, _ in compact:
+                    span = spans.get(key)
+                    if span is None:
+                        spans[key] = [epoch, epoch]
+                    elif epoch < span[0]:
+                        span[0] = epoch
+                    elif epoch > span[1]:
+                        span[1] = epoch
+    if spans:
+        with metrics.span("rollups"):
+            _refresh_rollups(conn, spans)
+        with metrics.span("gaps"):
+            _refresh_gaps(conn, spans)
+    metrics.inc("rows_inserted_total", inserted)
+    metrics.inc("rows_skipped_total", seen - inserted)
+    return inserted
+
+
+def insert_measurement_tuples(
+    conn: sqlite3.Connection,
+    rows: Iterable[MeasurementTuple],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """
+    Insert measurement tuples in chunked executemany batches.
+
+    Tuples follow the column order (station_id, observed_property, measure_id,
+    date_time, value, quality). All batches share one transaction.
+    Duplicates are ignored via the primary key (measure_key, epoch);
+    the returned count comes from `total_changes`, so it only includes rows
+    that were actually inserted.
+    """
     try:
         with conn:
-            cur: sqlite3.Cursor = conn.cursor()
-            for r in rows:
-                r_row: MeasurementRow = r
-                cur.execute(
-                    sql,
-                    (
-                        r_row.station_id,
-                        r_row.observed_property,
-                        r_row.measure_id,
-                        r_row.date_time,
-                        r_row.value,
-                        r_row.quality,
-                    ),
-                )
-                inserted += cur.rowcount  # 1 if inserted, 0 if skipped
+            inserted = _insert_readings(conn, rows, KeyCache(conn).compact, batch_size)
+        logger.info(f"Inserted {inserted} new measurements.")
+        return inserted
+    except Exception as exc:  # type: Exception
+        logger.error(f"Failed to insert measurements batch: {exc}")
+        raise
+
+
+def insert_measurements(
+    conn: sqlite3.Connection,
+    rows: Iterable[MeasurementRow],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """
+    Insert measurement rows into the database.
+
+    Duplicates are ignored via the composite primary key
+    (measure_key, epoch), ensuring idempotent pipeline runs.
+    """
+    return insert_measurement_tuples(conn, _as_tuples(rows), batch_size=batch_size)
+
+
+def insert_batch(
+    conn: sqlite3.Connection,
+    batch: MeasurementBatch,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """
+    Insert the accepted readings of a columnar MeasurementBatch.
+
+    The batch's epochs and quality codes are written as they are; only the
+    measure key and the batch's quality dictionary are resolved, once per batch.
+
+    Returns the number of newly inserted rows.
+    """
+    return insert_batches(conn, [batch], batch_size=batch_size)
+
+
+def insert_batches(
+    conn: sqlite3.Connection,
+    batches: Sequence[MeasurementBatch],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """
+    Insert several MeasurementBatches (e.g. pages of different measures) in one transaction.
+
+    Rows of all batches share the executemany chunks, the rollup refresh and
+    the commit, so many small pages cost one fsync.
+
+    Returns the number of newly inserted rows.
+    """
+    keys = KeyCache(conn)
+
+    def rows() -> Iterator[ReadingTuple]:
+        for batch in batches:
+            measure_key = keys.measure_key(batch.measure_id, batch.station_id, batch.observed_property)
+            codes = [keys.quality_code(label) for label in batch.quality_labels]
+            for epoch, value, quality in zip(batch.epochs, batch.values, batch.quality_codes):
+                yield measure_key, epoch, None if value != value else value, codes[quality]
+
+    try:
+        with conn:
+            inserted = _insert_readings(conn, rows(), lambda r: r, batch_size)
         logger.info(f"Inserted {inserted} new measurements.")
         return inserted
     except Exception as exc:  # type: Exception
         logger.error(f"Failed to insert measurements batch: {exc}")
-        raise
\ No newline at end of file
+        raise
+
+
+def insert_rejected(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str, str]]) -> int:
+    """
+    Store readings that failed validation as (measure_id, raw JSON payload, reason).
+
+    A reading rejected again by a later run is not stored twice.
+    Returns the number of newly stored rows.
+    """
+    try:
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO rejected_readings(measure_id, payload, reason) VALUES (?, ?, ?);", rows
+            )
+            return conn.total_changes - before
+    except Exception as exc:  # type: Exception
+        logger.error(f"Failed to store rejected readings: {exc}")
+        raise
+
+
+def get_high_water_marks(conn: sqlite3.Connection, measure_ids: Iterable[str]) -> Dict[str, str]:
+    """
+    Return the latest stored reading time per measure as an ISO-8601 UTC string.
+
+    Each lookup is a MAX over the (measure_key, epoch) primary key, so it
+    costs one index seek regardless of table size. Measures without any stored
+    readings are omitted from the result.
+    """
+    sql = """
+    SELECT MAX(epoch) FROM readings
+    WHERE measure_key = (SELECT measure_key FROM measures WHERE measure_id = ?);
+    """
+
+    marks: Dict[str, str] = {}
+    for measure_id in measure_ids:
+        latest = conn.execute(sql, (measure_id,)).fetchone()[0]
+        if latest is not None:
+            marks[measure_id] = epoch_to_iso(latest)
+    return marks
+
+
+def get_reading_periods(conn: sqlite3.Connection, measure_ids: Iterable[str]) -> Dict[str, int]:
+    """
+    Return the reading interval in seconds per measure, as observed in `readings`.
+
+    The interval is the median gap between the latest few stored readings
+    (see _observed_period), falling back to the catalogue `period`.
+    Measures with neither are omitted from the result.
+    """
+    periods: Dict[str, int] = {}
+    for measure_id in measure_ids:
+        row = conn.execute("SELECT measure_key, period FROM measures WHERE measure_id = ?;", (measure_id,)).fetchone()
+        if row is None:
+            continue
+        key, catalogue_period = row
+        period = _observed_period(conn, key) or catalogue_period
+        if period:
+            periods[measure_id] = int(period)
+    return periods
+
+
+def get_completed_chunks(conn: sqlite3.Connection, measure_id: str) -> List[Tuple[int, int]]:
+    """Return the [start, end) epoch ranges of a measure's finished backfill chunks, in order."""
+    return conn.execute(
+        "SELECT chunk_start, chunk_end FROM backfill_chunks WHERE measure_id = ? ORDER BY chunk_start;",
+        (measure_id,),
+    ).fetchall()
+
+
+def record_chunk(conn: sqlite3.Connection, measure_id: str, start: int, end: int, rows: int) -> None:
+    """Checkpoint a backfill chunk whose readings have all been written."""
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO backfill_chunks(measure_id, chunk_start, chunk_end, rows) VALUES (?, ?, ?, ?);",
+                (measure_id, start, end, rows),
+            )
+    except Exception as exc:  # type: Exception
+        logger.error(f"Failed to record backfill chunk for {measure_id}: {exc}")
+        raise
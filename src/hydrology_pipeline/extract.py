@@ -1,7 +1,8 @@
 import logging
-from typing import Any, Dict, List
-from .api_client import get_json
-from .config import BASE_URL, ALLOWED_PARAMETERS
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from . import metrics
+from .api_client import get_json, iter_csv
+from .config import BASE_URL, ALLOWED_PARAMETERS, DEFAULT_BATCH_SIZE, DEFAULT_PAGE_SIZE
 
 logger: logging.Logger = logging.getLogger(__name__)
 
@@ -158,6 +159,293 @@ def fetch_latest_readings_for_measure(
         logger.warning(f"No readings found for measure_id={measure_id}")
         return []
 
+    metrics.inc("readings_fetched_total", len(readings), source="latest")
     # Return in chronological order (oldest -> newest) for nicer storage/analysis.
     readings_sorted = sorted(readings, key=lambda r: r.get("dateTime", ""))
-    return readings_sorted
\ No newline at end of file
+    return readings_sorted
+
+def iter_readings(
+    measure_id: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    timeout: int = 30,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream the reading history of a measure as chronological pages.
+
+    Walks the API with `_offset` pages of at most `page_size` readings sorted
+    by `dateTime` ascending, so only one page is held in memory at a time.
+
+    Parameters
+    ----------
+    measure_id : str
+        Unique identifier of the measure.
+    since : Optional[str]
+        Inclusive lower bound on `dateTime` (ISO-8601), sent as `mineq-dateTime`.
+    until : Optional[str]
+        Exclusive upper bound on `dateTime` (ISO-8601), sent as `max-dateTime`.
+    page_size : int
+        Maximum number of readings per request and per yielded page.
+    timeout : int
+        Request timeout in seconds.
+
+    Yields
+    ------
+    List[Dict[str, Any]]
+        Non-empty pages of reading records, oldest first.
+    """
+    if page_size <= 0:
+        raise ValueError("page_size must be a positive integer")
+
+    url: str = f"{BASE_URL}/id/measures/{measure_id}/readings.json"
+    params: Dict[str, Any] = {"_limit": page_size, "_sort": "dateTime"}
+    if since:
+        params["mineq-dateTime"] = since
+    if until:
+        params["max-dateTime"] = until
+
+    offset = 0
+    while True:
+        params["_offset"] = offset
+        logger.info(f"Fetching readings page offset={offset} size={page_size} for measure_id={measure_id}")
+        data: Dict[str, Any] = get_json(url, params=dict(params), timeout=timeout)
+        page: List[Dict[str, Any]] = data.get("items", []) or []
+        metrics.inc("readings_fetched_total", len(page), source="json")
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+def iter_readings_csv(
+    measure_id: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    page_size: int = 100_000,
+    timeout: int = 30,
+) -> Iterator[List[Tuple[str, Optional[str], Optional[str]]]]:
+    """
+    Stream the reading history of a measure from `readings.csv` as raw tuples.
+
+    Each CSV page is parsed line by line from the HTTP stream. Rows become
+    compact (dateTime, value, quality) string tuples, and no per-row dict is
+    built. They are yielded in batches of at most `batch_size`, so memory
+    stays constant regardless of the download size.
+
+    Parameters
+    ----------
+    measure_id : str
+        Unique identifier of the measure.
+    since : Optional[str]
+        Inclusive lower bound on `dateTime` (ISO-8601), sent as `mineq-dateTime`.
+    until : Optional[str]
+        Exclusive upper bound on `dateTime` (ISO-8601), sent as `max-dateTime`.
+    batch_size : int
+        Maximum number of tuples per yielded batch.
+    page_size : int
+        Maximum number of rows requested per CSV download.
+    timeout : int
+        Request timeout in seconds.
+
+    Yields
+    ------
+    List[Tuple[str, Optional[str], Optional[str]]]
+        Non-empty batches of (dateTime, value, quality), oldest first.
+    """
+    if batch_size <= 0 or page_size <= 0:
+        raise ValueError("batch_size and page_size must be positive integers")
+
+    url: str = f"{BASE_URL}/id/measures/{measure_id}/readings.csv"
+    params: Dict[str, Any] = {"_limit": page_size, "_sort": "dateTime"}
+    if since:
+        params["mineq-dateTime"] = since
+    if until:
+        params["max-dateTime"] = until
+
+    offset = 0
+    while True:
+        params["_offset"] = offset
+        logger.info(f"Streaming CSV readings offset={offset} for measure_id={measure_id}")
+        rows = iter_csv(url, params=dict(params), timeout=timeout)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        try:
+            dt_idx = header.index("dateTime") if "dateTime" in header else header.index("date")
+            value_idx = header.index("value")
+        except ValueError as exc:
+            raise ValueError(f"Unexpected CSV header for measure_id={measure_id}: {header}") from exc
+        quality_idx = header.index("quality") if "quality" in header else None
+
+        count = 0
+        batch: List[Tuple[str, Optional[str], Optional[str]]] = []
+        for row in rows:
+            count += 1
+            batch.append((
+                row[dt_idx],
+                row[value_idx] if value_idx < len(row) else None,
+                row[quality_idx] if quality_idx is not None and quality_idx < len(row) else None,
+            ))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+        metrics.inc("readings_fetched_total", count, source="csv")
+        if count < page_size:
+            return
+        offset += count
+
+def _reading_measure_id(reading: Dict[str, Any]) -> str:
+    """Return the measure ID a reading from /data/readings belongs to."""
+    measure = reading.get("measure")
+    if isinstance(measure, dict):
+        measure = measure.get("@id", "")
+    return _measure_id_from_uri(str(measure or ""))
+
+def iter_station_readings(
+    measure_ids: List[str],
+    since: str,
+    until: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    timeout: int = 30,
+) -> Iterator[Dict[str, List[Dict[str, Any]]]]:
+    """
+    Stream readings for several measures of a station with one paginated request.
+
+    Queries the `/data/readings` endpoint with every measure at once instead of
+    one `/id/measures/{id}/readings` request per measure, then splits each page
+    by measure so the rows can be normalized per measure.
+
+    Parameters
+    ----------
+    measure_ids : List[str]
+        Measures to fetch (typically all selected measures of one station).
+    since : str
+        Inclusive lower bound on `dateTime` (ISO-8601), sent as `mineq-dateTime`.
+    until : Optional[str]
+        Exclusive upper bound on `dateTime` (ISO-8601), sent as `max-dateTime`.
+    page_size : int
+        Maximum number of readings per request, across all measures.
+    timeout : int
+        Request timeout in seconds.
+
+    Yields
+    ------
+    Dict[str, List[Dict[str, Any]]]
+        Per page, a mapping of measure ID to its readings, oldest first.
+    """
+    if page_size <= 0:
+        raise ValueError("page_size must be a positive integer")
+    if not measure_ids:
+        raise ValueError("At least one measure_id is required")
+
+    wanted = set(measure_ids)
+    url: str = f"{BASE_URL}/data/readings.json"
+    params: Dict[str, Any] = {
+        "measure": list(measure_ids),
+        "mineq-dateTime": since,
+        "_limit": page_size,
+        "_sort": "dateTime",
+    }
+    if until:
+        params["max-dateTime"] = until
+
+    offset = 0
+    while True:
+        params["_offset"] = offset
+        logger.info(
+            f"Fetching readings page offset={offset} size={page_size} for {len(measure_ids)} measures"
+        )
+        data: Dict[str, Any] = get_json(url, params=dict(params), timeout=timeout)
+        page: List[Dict[str, Any]] = data.get("items", []) or []
+        metrics.inc("readings_fetched_total", len(page), source="station")
+
+        by_measure: Dict[str, List[Dict[str, Any]]] = {}
+        for reading in page:
+            measure_id = _reading_measure_id(reading)
+            if measure_id in wanted:
+                by_measure.setdefault(measure_id, []).append(reading)
+            else:
+                logger.debug(f"Ignoring reading for unexpected measure {measure_id}")
+        if by_measure:
+            yield by_measure
+
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+def iter_stations(
+    page_size: int = DEFAULT_PAGE_SIZE,
+    timeout: int = 30,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream all monitoring stations from /id/stations as pages.
+
+    Parameters
+    ----------
+    page_size : int
+        Maximum number of stations per request and per yielded page.
+    timeout : int
+        Request timeout in seconds.
+
+    Yields
+    ------
+    List[Dict[str, Any]]
+        Non-empty pages of station records.
+    """
+    if page_size <= 0:
+        raise ValueError("page_size must be a positive integer")
+
+    url: str = f"{BASE_URL}/id/stations.json"
+    offset = 0
+    while True:
+        params: Dict[str, Any] = {"_limit": page_size, "_offset": offset}
+        logger.info(f"Fetching stations page offset={offset} size={page_size}")
+        data: Dict[str, Any] = get_json(url, params=params, timeout=timeout)
+        page: List[Dict[str, Any]] = data.get("items", []) or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+
+def iter_measures(
+    page_size: int = DEFAULT_PAGE_SIZE,
+    timeout: int = 30,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream the full measure catalogue from /id/measures as pages.
+
+    Parameters
+    ----------
+    page_size : int
+        Maximum number of measures per request and per yielded page.
+    timeout : int
+        Request timeout in seconds.
+
+    Yields
+    ------
+    List[Dict[str, Any]]
+        Non-empty pages of measure records.
+    """
+    if page_size <= 0:
+        raise ValueError("page_size must be a positive integer")
+
+    url: str = f"{BASE_URL}/id/measures.json"
+    offset = 0
+    while True:
+        params: Dict[str, Any] = {"_limit": page_size, "_offset": offset}
+        logger.info(f"Fetching measures page offset={offset} size={page_size}")
+        data: Dict[str, Any] = get_json(url, params=params, timeout=timeout)
+        page: List[Dict[str, Any]] = data.get("items", []) or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        offset += len(page)
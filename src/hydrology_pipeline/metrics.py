@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Prefix of every exported Prometheus metric name
+METRIC_PREFIX = "hydrology_"
+
+# Upper bounds (seconds) of latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _prom_labels(key: LabelKey) -> str:
+    """Render a label set as `{k="v",...}` with Prometheus escaping."""
+    if not key:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in key
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _prom_value(value: float) -> str:
+    """Render a sample value exactly: whole numbers as integers, others with full float precision."""
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a running count, sum and max."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-process counters and latency histograms.
+
+    Metrics are keyed by name and label set, e.g.
+    `inc("http_requests_total", endpoint="readings.json", status=200)`.
+    Updates are meant for per-request or per-page granularity, not per row.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.started_at = time.time()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, stage: str, **labels: Any) -> Iterator[None]:
+        """Time the enclosed block into the `stage_seconds` histogram, also on error."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    def report(self) -> Dict[str, Any]:
+        """Return a JSON-serializable snapshot, with a per-stage timing summary."""
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in sorted(series.items())]
+                for name, series in sorted(self.counters.items())
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": h.count,
+                        "sum": round(h.sum, 6),
+                        "max": round(h.max, 6),
+                        "buckets": dict(zip([*map(str, h.buckets), "+Inf"], h.counts)),
+                    }
+                    for key, h in sorted(series.items())
+                ]
+                for name, series in sorted(self.histograms.items())
+            }
+            stages: Dict[str, Dict[str, float]] = {}
+            for key, h in self.histograms.get("stage_seconds", {}).items():
+                stage = stages.setdefault(
+                    dict(key)["stage"], {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+                )
+                stage["count"] += h.count
+                stage["total_seconds"] = round(stage["total_seconds"] + h.sum, 6)
+                stage["max_seconds"] = round(max(stage["max_seconds"], h.max), 6)
+        return {
+            "started_at": self.started_at,
+            "elapsed_seconds": round(time.time() - self.started_at, 6),
+            "stages": dict(sorted(stages.items(), key=lambda s: -s[1]["total_seconds"])),
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{METRIC_PREFIX}{name}{_prom_labels(key)} {_prom_value(value)}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+                for key, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip([*map(str, h.buckets), "+Inf"], h.counts):
+                        cumulative += count
+                        labels = _prom_labels(key + (("le", bound),))
+                        lines.append(f"{METRIC_PREFIX}{name}_bucket{labels} {cumulative}")
+                    lines.append(f"{METRIC_PREFIX}{name}_sum{_prom_labels(key)} {h.sum:.6f}")
+                    lines.append(f"{METRIC_PREFIX}{name}_count{_prom_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: Path) -> None:
+        _write_atomic(Path(path), json.dumps(self.report(), indent=2) + "\n")
+        logger.info(f"Wrote metrics report to {path}")
+
+    def write_prometheus(self, path: Path) -> None:
+        _write_atomic(Path(path), self.to_prometheus())
+        logger.info(f"Wrote Prometheus metrics to {path}")
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    """Write via a temp file and rename, so collectors never read a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+# Process-wide registry used by the pipeline modules
+REGISTRY = MetricsRegistry()
+
+
+def inc(name: str, value: float = 1, **labels: Any) -> None:
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    REGISTRY.observe(name, value, **labels)
+
+
+def span(stage: str, **labels: Any) -> Any:
+    return REGISTRY.span(stage, **labels)
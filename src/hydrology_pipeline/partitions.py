@@ -0,0 +1,335 @@
+import calendar
+import logging
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .config import DEFAULT_BATCH_SIZE
+from .db import (
+    MEASUREMENTS_VIEW_SQL,
+    KeyCache,
+    connect,
+    find_gaps,
+    get_high_water_marks,
+    get_reading_periods,
+    init_db,
+    insert_batches,
+    insert_measurements,
+    mark_gaps_checked,
+    rebuild_rollups,
+)
+from .transform import MeasurementBatch, MeasurementRow, parse_epoch
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# File in the partition directory holding stations, measures and run bookkeeping
+CATALOG_NAME = "catalog.db"
+
+# Per-year reading shards: readings_<year>.db
+_SHARD_RE = re.compile(r"readings_(\d{4})\.db")
+
+# Tables of a shard exposed through TEMP views on a reader connection
+_SHARDED_TABLES = ("readings", "rollups")
+
+
+def catalog_path(root: Path) -> Path:
+    """Path of the catalog database of the partitioned store in `root`."""
+    return root / CATALOG_NAME
+
+
+def shard_path(root: Path, year: int) -> Path:
+    """Path of the readings shard for one calendar year (UTC)."""
+    return root / f"readings_{year}.db"
+
+
+def list_years(root: Path) -> List[int]:
+    """Return the years that have a shard in `root`, oldest first."""
+    if not root.is_dir():
+        return []
+    return sorted(int(m.group(1)) for m in map(_SHARD_RE.fullmatch, (p.name for p in root.iterdir())) if m)
+
+
+def year_bounds(year: int) -> Tuple[int, int]:
+    """Return the [start, end) epoch range of a UTC calendar year."""
+    return calendar.timegm((year, 1, 1, 0, 0, 0)), calendar.timegm((year + 1, 1, 1, 0, 0, 0))
+
+
+def _split_by_year(batch: MeasurementBatch) -> Dict[int, MeasurementBatch]:
+    """Split a batch into per-year batches; a batch within one year is returned as is."""
+    if not len(batch):
+        return {}
+    first, last = time.gmtime(min(batch.epochs)).tm_year, time.gmtime(max(batch.epochs)).tm_year
+    if first == last:
+        return {first: batch}
+
+    parts: Dict[int, MeasurementBatch] = {}
+    for epoch, value, code in zip(batch.epochs, batch.values, batch.quality_codes):
+        year = time.gmtime(epoch).tm_year
+        part = parts.get(year)
+        if part is None:
+            part = parts[year] = MeasurementBatch(
+                batch.station_id, batch.observed_property, batch.measure_id, quality_labels=batch.quality_labels
+            )
+        part.epochs.append(epoch)
+        part.values.append(value)
+        part.quality_codes.append(code)
+    return parts
+
+
+def open_reader(
+    root: Path,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    check_same_thread: bool = True,
+) -> sqlite3.Connection:
+    """
+    Open a read-only connection that sees the readings of [start, end) as one database.
+
+    The catalog is the main database and only the shards of the years
+    overlapping the range are attached. TEMP views named `readings`,
+    `rollups` and `measurements` combine them with UNION ALL and shadow
+    the catalog's tables, so query.py and other readers work unchanged;
+    filters on measure_key and epoch are pushed down to each shard's
+    primary key. Raises ValueError if the range needs more shards than
+    SQLite can attach; query such ranges in parts.
+    """
+    years = [
+        year for year in list_years(root)
+        if (start is None or year_bounds(year)[1] > start) and (end is None or year_bounds(year)[0] < end)
+    ]
+    conn = sqlite3.connect(
+        f"{catalog_path(root).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=check_same_thread
+    )
+    try:
+        limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        if len(years) > limit:
+            raise ValueError(f"Range spans {len(years)} yearly shards; at most {limit} can be attached")
+        for year in years:
+            conn.execute(
+                "ATTACH DATABASE ? AS ?;",
+                (f"{shard_path(root, year).resolve().as_uri()}?mode=ro", f"y{year}"),
+            )
+        for table in _SHARDED_TABLES:
+            union = " UNION ALL ".join(
+                f"SELECT * FROM {schema}.{table}" for schema in ["main", *(f"y{year}" for year in years)]
+            )
+            conn.execute(f"CREATE TEMP VIEW {table} AS {union};")
+        conn.execute(f"CREATE TEMP VIEW measurements AS {MEASUREMENTS_VIEW_SQL};")
+    except Exception as exc:  # type: Exception
+        conn.close()
+        logger.error(f"Failed to open partitioned reader on {root}: {exc}")
+        raise
+    logger.info(f"Opened reader on {root} with shards {years}")
+    return conn
+
+
+class PartitionedStore:
+    """
+    Readings stored in one SQLite file per UTC year under a directory.
+
+    `catalog.db` holds the stations, measures and everything that is not a
+    reading (rejected readings, backfill checkpoints, anomaly state); its
+    `readings` table stays empty. Each `readings_<year>.db` shard is a
+    complete database with that year's readings and their rollups and gaps,
+    plus copies of the catalog's measures and quality codes under the same
+    keys, so a shard can also be opened on its own.
+
+    Writes are routed to the shards by reading time. reader() attaches only
+    the shards a time range needs, and old years are dropped or compacted
+    file by file (drop_before, compact) instead of deleting rows from, or
+    vacuuming, one large database. Backfills of past years lock only their
+    shards, not the current one.
+    """
+
+    def __init__(self, root: Path, catalog: sqlite3.Connection, wal: bool = False) -> None:
+        self.root = root
+        self.catalog = catalog
+        self.wal = wal
+        self._shards: Dict[int, sqlite3.Connection] = {}
+
+    def shard(self, year: int) -> sqlite3.Connection:
+        """Return the writer connection of a year's shard, creating the shard on first use."""
+        conn = self._shards.get(year)
+        if conn is None:
+            conn = connect(shard_path(self.root, year), wal=self.wal)
+            init_db(conn)
+            self._shards[year] = conn
+        return conn
+
+    def _sync_dimensions(self, conn: sqlite3.Connection, measure_ids: Iterable[str]) -> None:
+        """Copy measures and quality codes from the catalog into a shard, keeping their keys."""
+        ids = sorted(set(measure_ids))
+        measures = self.catalog.execute(
+            f"""
+            SELECT measure_key, measure_id, station_id, observed_property, unit, period, value_type, label
+            FROM measures WHERE measure_id IN ({",".join("?" * len(ids))});
+            """,
+            ids,
+        ).fetchall()
+        qualities = self.catalog.execute("SELECT code, label FROM quality_codes;").fetchall()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO quality_codes(code, label) VALUES (?, ?);", qualities)
+            conn.executemany(
+                """
+                INSERT INTO measures(
+                    measure_key, measure_id, station_id, observed_property, unit, period, value_type, label
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(measure_key) DO UPDATE SET
+                    station_id=excluded.station_id, observed_property=excluded.observed_property,
+                    unit=excluded.unit, period=excluded.period, value_type=excluded.value_type, label=excluded.label;
+                """,
+                measures,
+            )
+
+    def _register(self, measures: Iterable[Tuple[str, str, str]], labels: Iterable[Optional[str]]) -> None:
+        """Register (measure_id, station_id, observed_property) and quality labels in the catalog."""
+        keys = KeyCache(self.catalog)
+        with self.catalog:
+            for measure in measures:
+                keys.measure_key(*measure)
+            for label in labels:
+                keys.quality_code(label)
+
+    def insert_batches(self, batches: Sequence[MeasurementBatch], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Insert MeasurementBatches into the shards of their reading years (see db.insert_batches).
+
+        Returns the number of newly inserted rows.
+        """
+        self._register(
+            ((b.measure_id, b.station_id, b.observed_property) for b in batches),
+            {label for b in batches for label in b.quality_labels},
+        )
+        by_year: Dict[int, List[MeasurementBatch]] = {}
+        for batch in batches:
+            for year, part in _split_by_year(batch).items():
+                by_year.setdefault(year, []).append(part)
+
+        inserted = 0
+        for year, parts in sorted(by_year.items()):
+            conn = self.shard(year)
+            self._sync_dimensions(conn, (part.measure_id for part in parts))
+            inserted += insert_batches(conn, parts, batch_size=batch_size)
+        return inserted
+
+    def insert_measurements(self, rows: Iterable[MeasurementRow], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Insert MeasurementRows into the shards of their reading years (see db.insert_measurements).
+
+        Returns the number of newly inserted rows.
+        """
+        by_year: Dict[int, List[MeasurementRow]] = {}
+        for row in rows:
+            by_year.setdefault(time.gmtime(parse_epoch(row.date_time)).tm_year, []).append(row)
+        every = [row for group in by_year.values() for row in group]
+        self._register(((r.measure_id, r.station_id, r.observed_property) for r in every), {r.quality for r in every})
+
+        inserted = 0
+        for year, group in sorted(by_year.items()):
+            conn = self.shard(year)
+            self._sync_dimensions(conn, (row.measure_id for row in group))
+            inserted += insert_measurements(conn, group, batch_size=batch_size)
+        return inserted
+
+    def high_water_marks(self, measure_ids: Iterable[str]) -> Dict[str, str]:
+        """Return the latest stored reading time per measure, searching the newest shards first."""
+        remaining = set(measure_ids)
+        marks: Dict[str, str] = {}
+        for year in reversed(list_years(self.root)):
+            if not remaining:
+                break
+            found = get_high_water_marks(self.shard(year), remaining)
+            marks.update(found)
+            remaining -= set(found)
+        return marks
+
+    def reading_periods(self, measure_ids: Iterable[str]) -> Dict[str, int]:
+        """Return the reading interval per measure from its newest shard, else the catalogue period."""
+        remaining = set(measure_ids)
+        periods = get_reading_periods(self.catalog, remaining)
+        for year in reversed(list_years(self.root)):
+            if not remaining:
+                break
+            conn = self.shard(year)
+            present = set(get_high_water_marks(conn, remaining))
+            periods.update(get_reading_periods(conn, present))
+            remaining -= present
+        return periods
+
+    def find_gaps(
+        self,
+        measure_ids: Optional[Iterable[str]] = None,
+        include_checked: bool = False,
+    ) -> List[Tuple[str, Optional[str], Optional[str], int, int, int]]:
+        """Return the gaps of every shard (see db.find_gaps); gaps spanning a new year are not detected."""
+        ids = None if measure_ids is None else list(measure_ids)
+        gaps = []
+        for year in list_years(self.root):
+            gaps.extend(find_gaps(self.shard(year), ids, include_checked))
+        return gaps
+
+    def mark_gaps_checked(self, measure_id: str, start: int, end: int) -> None:
+        """Flag the remaining gaps of a measure within [start, end] in the shards that overlap it."""
+        for year in list_years(self.root):
+            lo, hi = year_bounds(year)
+            if start < hi and end >= lo:
+                mark_gaps_checked(self.shard(year), measure_id, start, end)
+
+    def rebuild_rollups(self) -> int:
+        """Recompute the rollups of every shard. Returns the number of rollup buckets written."""
+        return sum(rebuild_rollups(self.shard(year)) for year in list_years(self.root))
+
+    def reader(self, start: Optional[int] = None, end: Optional[int] = None) -> sqlite3.Connection:
+        """Open a read-only connection over the shards of [start, end) (see open_reader)."""
+        return open_reader(self.root, start, end)
+
+    def drop_before(self, year: int) -> List[int]:
+        """
+        Delete the shards of all years before `year`.
+
+        Each partition is removed as a file, so retention costs no row deletes
+        and no VACUUM. The catalog's backfill checkpoints of chunks starting
+        before `year` are deleted with them, so a later backfill of those
+        years fetches them again. Returns the dropped years.
+        """
+        with self.catalog:
+            self.catalog.execute("DELETE FROM backfill_chunks WHERE chunk_start < ?;", (year_bounds(year)[0],))
+        dropped = [y for y in list_years(self.root) if y < year]
+        for y in dropped:
+            conn = self._shards.pop(y, None)
+            if conn is not None:
+                conn.close()
+            path = shard_path(self.root, y)
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                Path(f"{path}{suffix}").unlink(missing_ok=True)
+            logger.info(f"Dropped partition {path.name}")
+        return dropped
+
+    def compact(self, years: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        VACUUM the shards of `years` (default: every year before the current one).
+
+        Past years no longer receive live writes, so compacting them one file
+        at a time never blocks the current year's ingest. Returns the
+        compacted years.
+        """
+        current = time.gmtime().tm_year
+        wanted = set(years) if years is not None else None
+        compacted = []
+        for year in list_years(self.root):
+            if (wanted is None and year < current) or (wanted is not None and year in wanted):
+                before = shard_path(self.root, year).stat().st_size
+                self.shard(year).execute("VACUUM;")
+                after = shard_path(self.root, year).stat().st_size
+                logger.info(f"Compacted partition {year}: {before} -> {after} bytes")
+                compacted.append(year)
+        return compacted
+
+    def close(self) -> None:
+        """Close the shard connections (the catalog connection belongs to the caller)."""
+        for conn in self._shards.values():
+            conn.close()
+        self._shards.clear()
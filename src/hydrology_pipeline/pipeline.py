@@ -1,34 +1,61 @@
+import json
 import logging
+import queue
+import sqlite3
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from .db import connect, init_db, upsert_station, insert_measurements
+from . import metrics
+from .anomaly import detect_anomalies
+from .archive import export_archive
+from .config import (
+    DEFAULT_COMMIT_ROWS,
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_TRANSFORM_WORKERS,
+    PipelineConfig,
+)
+from .db import (
+    connect,
+    find_measures,
+    get_high_water_marks,
+    init_db,
+    insert_batch,
+    insert_batches,
+    insert_rejected,
+    rebuild_rollups,
+    upsert_measures,
+    upsert_station,
+    upsert_stations,
+)
 from .extract import (
     fetch_station_by_notation,
     resolve_measures_from_station,
     fetch_latest_readings_for_measure,
+    iter_measures,
+    iter_readings,
+    iter_readings_csv,
+    iter_station_readings,
+    iter_stations,
 )
-from .transform import normalize_station, normalize_reading
+from .transform import (
+    MeasureRow,
+    MeasurementBatch,
+    StationRow,
+    normalize_measure,
+    normalize_raw_readings,
+    normalize_readings,
+    normalize_station,
+)
+from .partitions import PartitionedStore, catalog_path
 
 logger: logging.Logger = logging.getLogger(__name__)
 
 
-def run(config) -> None:
-    """
-    Execute the end-to-end ETL pipeline.
-
-    Steps:
-    1. Connect to SQLite and initialize schema
-    2. Fetch station metadata
-    3. Resolve measure IDs for requested parameters
-    4. Retrieve latest readings from API
-    5. Normalize and insert into database (idempotent)
-    """
-    conn = connect(config.db_path)
-    init_db(conn)
-
-    station_item = fetch_station_by_notation(
-        config.station_notation,
-        timeout=config.timeout_seconds,
-    )
+def _check_station_label(config: PipelineConfig, station_item: Dict[str, Any]) -> None:
+    """Raise ValueError if the station label does not match the configured one."""
     if config.required_station_label:
         label = station_item.get("label")
         if label != config.required_station_label:
@@ -36,33 +63,577 @@ def run(config) -> None:
                 "Station label mismatch. Expected "
                 f"{config.required_station_label}, got {label}."
             )
-    station = normalize_station(station_item)
-    upsert_station(conn, station)
 
-    measure_map = resolve_measures_from_station(station_item, config.params)
 
-    total_inserted = 0
+def fetch_station(
+    config: PipelineConfig,
+    catalogued: Optional[Dict[str, str]],
+    results: queue.Queue,
+) -> None:
+    """
+    Worker task: fetch and validate a station, then resolve its measures.
+
+    Uses the measures already resolved from the local catalogue when given,
+    otherwise falls back to matching the station payload's measures list.
+    Puts exactly one ("station", ...) or ("error", ...) message on `results`.
+    """
+    try:
+        with metrics.span("station_fetch"):
+            station_item = fetch_station_by_notation(
+                config.station_notation,
+                timeout=config.timeout_seconds,
+            )
+            _check_station_label(config, station_item)
+            station = normalize_station(station_item)
+        if catalogued is not None:
+            measure_map = catalogued
+        else:
+            with metrics.span("measure_resolution"):
+                measure_map = resolve_measures_from_station(station_item, config.params)
+        results.put(("station", config, station, measure_map))
+    except Exception as exc:  # type: Exception
+        results.put(("error", config, exc))
+
+
+def measure_pages(config: PipelineConfig, measure_id: str, since: Optional[str]) -> Tuple[str, Iterator[Any]]:
+    """
+    Return the message kind and page iterator for fetching one measure.
 
-    for param, measure_id in measure_map.items():
-        readings = fetch_latest_readings_for_measure(
-            measure_id=measure_id,
-            limit=config.limit,
+    Fetches the latest `config.limit` readings, or streams the history between
+    `since` and `config.until` when `since` is set (from `readings.csv` in
+    raw-tuple batches when `config.csv` is set).
+    """
+    if since and config.csv:
+        return "csv", iter_readings_csv(
+            measure_id,
+            since=since,
+            until=config.until,
             timeout=config.timeout_seconds,
         )
-
-        rows = [
-            normalize_reading(
-                reading=r,
-                station_id=station.station_id,
-                observed_property=param,
+    if since:
+        return "page", iter_readings(
+            measure_id,
+            since=since,
+            until=config.until,
+            page_size=config.page_size,
+            timeout=config.timeout_seconds,
+        )
+    return "page", iter(
+        [
+            fetch_latest_readings_for_measure(
                 measure_id=measure_id,
+                limit=config.limit,
+                timeout=config.timeout_seconds,
             )
-            for r in readings
         ]
+    )
+
+
+def _fetch_measure(
+    config: PipelineConfig,
+    station_id: str,
+    param: str,
+    measure_id: str,
+    since: Optional[str],
+    results: queue.Queue,
+    transform: Executor,
+) -> None:
+    """
+    Worker task: fetch readings for one measure and hand them over page by page.
+
+    See measure_pages for what is fetched. Each page is submitted to the
+    `transform` pool and its pending MeasurementBatch is put on `results` as a
+    ("batch", ...) message, so the worker requests the next page while the
+    previous one is normalized. Ends with exactly one ("done", ...) or
+    ("error", ...) message. The bounded queue blocks the worker while the
+    writer is behind, so only a few pages are ever in memory.
+    """
+    try:
+        kind, pages = measure_pages(config, measure_id, since)
+        for page in pages:
+            batch = transform.submit(_normalize_page, kind, station_id, param, measure_id, page, config.lenient)
+            results.put(("batch", config, batch))
+        results.put(("done", config))
+    except Exception as exc:  # type: Exception
+        results.put(("error", config, exc))
 
-        inserted = insert_measurements(conn, rows)
-        total_inserted += inserted
 
-        logger.info(f"Inserted {inserted}/{len(rows)} rows for {param} ({measure_id})")
+def _fetch_station_batch(
+    config: PipelineConfig,
+    station_id: str,
+    params_by_measure: Dict[str, str],
+    since: str,
+    results: queue.Queue,
+    transform: Executor,
+) -> None:
+    """
+    Worker task: stream readings of several measures of one station in one request.
+
+    Splits each page by measure and puts one ("batch", ...) message per
+    measure (normalized on the `transform` pool, see _fetch_measure),
+    followed by exactly one ("done", ...) or ("error", ...) message.
+    """
+    try:
+        pages = iter_station_readings(
+            list(params_by_measure),
+            since=since,
+            until=config.until,
+            page_size=config.page_size,
+            timeout=config.timeout_seconds,
+        )
+        for by_measure in pages:
+            for measure_id, readings in by_measure.items():
+                param = params_by_measure[measure_id]
+                batch = transform.submit(
+                    _normalize_page, "page", station_id, param, measure_id, readings, config.lenient
+                )
+                results.put(("batch", config, batch))
+        results.put(("done", config))
+    except Exception as exc:  # type: Exception
+        results.put(("error", config, exc))
+
+
+def _normalize_page(
+    kind: str,
+    station_id: str,
+    param: str,
+    measure_id: str,
+    readings: Any,
+    lenient: bool = False,
+) -> Tuple[MeasurementBatch, List[Tuple[str, str, str]]]:
+    """
+    Normalize one fetched page ("page": reading dicts, "csv": raw tuples).
+
+    Raises ValueError if any reading fails validation, unless `lenient` is
+    set: then unparsable values and unexpected quality flags are rejected as
+    well, and the rejects are returned as (measure_id, raw JSON payload,
+    reason) rows for `rejected_readings` next to the batch of valid readings.
+    """
+    normalize = normalize_readings if kind == "page" else normalize_raw_readings
+    batch = normalize(readings, station_id, param, measure_id, reject_invalid=lenient)
+    if not batch.rejected:
+        return batch, []
+    if not lenient:
+        index, reason = batch.rejected[0]
+        raise ValueError(f"Invalid reading #{index} for measure_id={measure_id}: {reason}")
+    logger.warning(f"Rejected {len(batch.rejected)}/{len(readings)} readings for {measure_id}")
+    return batch, [(measure_id, json.dumps(readings[i], default=str), reason) for i, reason in batch.rejected]
+
+
+def write_page(
+    conn: sqlite3.Connection,
+    kind: str,
+    station_id: str,
+    param: str,
+    measure_id: str,
+    readings: Any,
+    lenient: bool = False,
+    detect: bool = False,
+    store: Optional[PartitionedStore] = None,
+) -> Tuple[MeasurementBatch, int]:
+    """
+    Normalize one fetched page and insert it (see _normalize_page).
+
+    Raises ValueError if any reading fails validation and `lenient` is not
+    set. With `detect` set, the page is then run through anomaly detection.
+    The readings go to the shards of `store` when given, else to `conn`.
+    Returns the batch and the number of newly inserted rows.
+    """
+    batch, rejects = _normalize_page(kind, station_id, param, measure_id, readings, lenient)
+    if rejects:
+        insert_rejected(conn, rejects)
+    inserted = store.insert_batches([batch]) if store else insert_batch(conn, batch)
+    if detect:
+        detect_anomalies(conn, [batch])
+    logger.info(f"Inserted {inserted}/{len(batch)} rows for {param} ({measure_id})")
+    return batch, inserted
+
+
+def writer_for(conns: Dict[Path, sqlite3.Connection], config: PipelineConfig) -> sqlite3.Connection:
+    """
+    Return the writer connection for a config's database, opening it on first use.
+
+    For a partitioned store this is the catalog database (see store_for).
+    """
+    conn = conns.get(config.db_path)
+    if conn is None:
+        conn = connect(catalog_path(config.db_path) if config.partitioned else config.db_path, wal=config.wal)
+        init_db(conn)
+        conns[config.db_path] = conn
+    return conn
+
+
+def store_for(
+    stores: Dict[Path, PartitionedStore],
+    conns: Dict[Path, sqlite3.Connection],
+    config: PipelineConfig,
+) -> Optional[PartitionedStore]:
+    """Return the partitioned store of a config's database, or None for a single-file database."""
+    if not config.partitioned:
+        return None
+    store = stores.get(config.db_path)
+    if store is None:
+        store = PartitionedStore(config.db_path, writer_for(conns, config), wal=config.wal)
+        stores[config.db_path] = store
+    return store
+
+
+def catalogued_measures(
+    conns: Dict[Path, sqlite3.Connection],
+    configs: Sequence[PipelineConfig],
+) -> List[Optional[Dict[str, str]]]:
+    """
+    Resolve every config's measures from the local catalogue, one query per database.
+
+    Returns, per config, the parameter -> measure_id mapping, or None when the
+    catalogue does not cover all requested parameters of that station.
+    """
+    by_db: Dict[Path, List[PipelineConfig]] = {}
+    for config in configs:
+        by_db.setdefault(config.db_path, []).append(config)
+
+    found: Dict[Tuple[Path, str], Dict[str, str]] = {}
+    for db_path, group in by_db.items():
+        conn = writer_for(conns, group[0])
+        params = [p for c in group for p in c.params]
+        for station_id, measure_map in find_measures(conn, [c.station_notation for c in group], params).items():
+            found[(db_path, station_id)] = measure_map
+
+    resolved: List[Optional[Dict[str, str]]] = []
+    for config in configs:
+        available = found.get((config.db_path, config.station_notation), {})
+        wanted = [p.lower() for p in config.params]
+        if all(p in available for p in wanted):
+            logger.info(f"Resolved measures for {config.station_notation} from catalogue")
+            resolved.append({p: available[p] for p in wanted})
+        else:
+            resolved.append(None)
+    return resolved
+
+
+def run_many(
+    configs: Sequence[PipelineConfig],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    transform_workers: int = DEFAULT_TRANSFORM_WORKERS,
+    commit_rows: int = DEFAULT_COMMIT_ROWS,
+) -> int:
+    """
+    Execute the ETL pipeline for several stations concurrently.
+
+    Measures are resolved up front from the local catalogue (see
+    sync_measure_catalogue) with one query per database; stations the
+    catalogue does not cover fall back to their station payload.
+
+    The run is a staged pipeline connected by bounded queues: API calls
+    (station metadata and readings per measure) run on a pool of
+    `max_workers` fetchers, fetched pages are normalized on a pool of
+    `transform_workers`, and the calling thread is the single SQLite writer
+    for each database path. The writer commits the batches that are already
+    waiting together, up to `commit_rows` rows per transaction, so network,
+    CPU and disk work overlap instead of adding up.
+
+    Failures of one station do not stop the others; once every station has
+    been processed, the first failure is re-raised.
+
+    Returns the total number of newly inserted measurement rows.
+    """
+    if max_workers <= 0 or transform_workers <= 0:
+        raise ValueError("max_workers and transform_workers must be positive integers")
+
+    results: queue.Queue = queue.Queue(maxsize=max_workers * 2)
+    conns: Dict[Path, sqlite3.Connection] = {}
+    stores: Dict[Path, PartitionedStore] = {}
+    futures: List[Future] = []
+    failures: List[Tuple[PipelineConfig, Exception]] = []
+    # Normalized batches and rejected readings waiting for the next commit, per database
+    buffered: Dict[Path, List[MeasurementBatch]] = {}
+    rejected: Dict[Path, List[Tuple[str, str, str]]] = {}
+    # Buffered batches of configs with detect_anomalies, per database
+    watched: Dict[Path, List[MeasurementBatch]] = {}
+    buffered_rows = 0
+    total_inserted = 0
+
+    def flush() -> None:
+        nonlocal buffered_rows, total_inserted
+        for db_path, rows in rejected.items():
+            insert_rejected(conns[db_path], rows)
+        rejected.clear()
+        for db_path, batches in buffered.items():
+            store = stores.get(db_path)
+            inserted = store.insert_batches(batches) if store else insert_batches(conns[db_path], batches)
+            logger.info(f"Committed {inserted}/{sum(map(len, batches))} rows from {len(batches)} pages")
+            total_inserted += inserted
+        buffered.clear()
+        for db_path, batches in watched.items():
+            detect_anomalies(conns[db_path], batches)
+        watched.clear()
+        buffered_rows = 0
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hydrology-fetch")
+    transform = ThreadPoolExecutor(max_workers=transform_workers, thread_name_prefix="hydrology-transform")
+    started = time.perf_counter()
+    try:
+        with metrics.span("measure_resolution"):
+            catalogued_maps = catalogued_measures(conns, configs)
+        for config, catalogued in zip(configs, catalogued_maps):
+            futures.append(pool.submit(fetch_station, config, catalogued, results))
+        pending = len(futures)
+
+        while pending:
+            message: Tuple[Any, ...] = results.get()
+            kind = message[0]
+            if kind != "batch":
+                pending -= 1
+
+            if kind == "station":
+                _, config, station, measure_map = message
+                conn = writer_for(conns, config)
+                store = store_for(stores, conns, config)
+                upsert_station(conn, station)
+                marks = {}
+                if config.incremental:
+                    ids = measure_map.values()
+                    marks = store.high_water_marks(ids) if store else get_high_water_marks(conn, ids)
+                batched: Dict[str, str] = {}
+                batch_since: List[str] = []
+                for param, measure_id in measure_map.items():
+                    since = marks.get(measure_id, config.since)
+                    if config.incremental:
+                        logger.info(f"Incremental sync for {measure_id} from {since or f'latest {config.limit}'}")
+                    if config.batch_measures and since and not config.csv:
+                        batched[measure_id] = param
+                        batch_since.append(since)
+                        continue
+                    futures.append(
+                        pool.submit(
+                            _fetch_measure, config, station.station_id, param, measure_id, since, results, transform
+                        )
+                    )
+                    pending += 1
+                if batched:
+                    # One request for all measures, starting at the earliest one's mark;
+                    # rows a measure already has are skipped by the primary key.
+                    futures.append(
+                        pool.submit(
+                            _fetch_station_batch,
+                            config,
+                            station.station_id,
+                            batched,
+                            min(batch_since),
+                            results,
+                            transform,
+                        )
+                    )
+                    pending += 1
+
+            elif kind == "batch":
+                _, config, batch = message
+                if any(failed is config for failed, _ in failures):
+                    # Later pages of a failed station are dropped, so its high-water mark stays before the failure.
+                    continue
+                try:
+                    batch, rejects = batch.result()
+                except Exception as exc:  # type: Exception
+                    # The station is reported failed and the others carry on.
+                    logger.error(f"Station {config.station_notation} failed: {exc}")
+                    if not any(failed is config for failed, _ in failures):
+                        failures.append((config, exc))
+                    continue
+                buffered.setdefault(config.db_path, []).append(batch)
+                if config.detect_anomalies:
+                    watched.setdefault(config.db_path, []).append(batch)
+                if rejects:
+                    rejected.setdefault(config.db_path, []).extend(rejects)
+                buffered_rows += len(batch)
+
+            elif kind == "done":
+                continue
+
+            else:
+                _, config, exc = message
+                logger.error(f"Station {config.station_notation} failed: {exc}")
+                if not any(failed is config for failed, _ in failures):
+                    failures.append((config, exc))
+
+            if buffered_rows >= commit_rows or (buffered and results.empty()):
+                flush()
+        flush()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        transform.shutdown(wait=False, cancel_futures=True)
+        # Drain the queue so workers blocked on a full queue can exit.
+        while any(not f.done() for f in futures):
+            try:
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for store in stores.values():
+            store.close()
+        for conn in conns.values():
+            conn.close()
+        metrics.observe("stage_seconds", time.perf_counter() - started, stage="run")
+
+    metrics.inc("stations_total", len(configs) - len(failures), status="ok")
+    metrics.inc("stations_total", len(failures), status="failed")
+    logger.info(
+        f"Done. Stations={len(configs)} (failed={len(failures)}). Total inserted={total_inserted}."
+    )
+    if failures:
+        raise failures[0][1]
+    return total_inserted
+
+
+def run(config: PipelineConfig, max_workers: int = DEFAULT_MAX_WORKERS) -> int:
+    """
+    Execute the end-to-end ETL pipeline for a single station.
+
+    Steps:
+    1. Connect to SQLite and initialize schema
+    2. Fetch station metadata
+    3. Resolve measure IDs for requested parameters
+    4. Retrieve latest readings from API (one concurrent request per measure)
+    5. Normalize and insert into database (idempotent)
+
+    Returns the number of newly inserted measurement rows.
+    """
+    return run_many([config], max_workers=max_workers)
+
+
+def sync_measure_catalogue(
+    db_path: Path,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    timeout: int = 30,
+) -> int:
+    """
+    Crawl /id/measures page by page into the local measures catalogue.
+
+    Returns the number of catalogue records written.
+    """
+    conn = connect(db_path)
+    try:
+        init_db(conn)
+        total = 0
+        for page in iter_measures(page_size=page_size, timeout=timeout):
+            rows: List[MeasureRow] = []
+            for item in page:
+                try:
+                    rows.append(normalize_measure(item))
+                except ValueError as exc:
+                    logger.warning(f"Skipping measure: {exc}")
+            total += upsert_measures(conn, rows)
+    finally:
+        conn.close()
+
+    logger.info(f"Measure catalogue synced: {total} records. DB={db_path}")
+    return total
+
+
+def sync_station_catalogue(
+    db_path: Path,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    timeout: int = 30,
+) -> int:
+    """
+    Crawl /id/stations page by page into the `stations` table (and its spatial index).
+
+    Returns the number of station records written.
+    """
+    conn = connect(db_path)
+    try:
+        init_db(conn)
+        total = 0
+        for page in iter_stations(page_size=page_size, timeout=timeout):
+            rows: List[StationRow] = []
+            for item in page:
+                try:
+                    rows.append(normalize_station(item))
+                except ValueError as exc:
+                    logger.warning(f"Skipping station: {exc}")
+            total += upsert_stations(conn, rows)
+    finally:
+        conn.close()
+
+    logger.info(f"Station catalogue synced: {total} records. DB={db_path}")
+    return total
+
+
+def rebuild_rollup_tables(db_path: Path, wal: bool = False, partitioned: bool = False) -> int:
+    """
+    Recompute the hourly/daily rollups of an existing database from its readings.
+
+    With `partitioned`, `db_path` is a partitioned store and every shard is rebuilt.
+    Returns the number of rollup buckets written.
+    """
+    conn = connect(catalog_path(db_path) if partitioned else db_path, wal=wal)
+    try:
+        init_db(conn)
+        if partitioned:
+            store = PartitionedStore(db_path, conn, wal=wal)
+            try:
+                return store.rebuild_rollups()
+            finally:
+                store.close()
+        return rebuild_rollups(conn)
+    finally:
+        conn.close()
+
+
+def export_measure_archive(db_path: Path, archive_dir: Path, full: bool = False, partitioned: bool = False) -> int:
+    """
+    Append the readings of every stored measure to its memory-mappable column files.
+
+    With `partitioned`, `db_path` is a partitioned store read through all of its shards.
+    Returns the number of rows appended.
+    """
+    conn = connect(catalog_path(db_path) if partitioned else db_path)
+    try:
+        init_db(conn)
+        if partitioned:
+            reader = PartitionedStore(db_path, conn).reader()
+            try:
+                total = export_archive(reader, archive_dir, full=full)
+            finally:
+                reader.close()
+        else:
+            total = export_archive(conn, archive_dir, full=full)
+    finally:
+        conn.close()
+
+    logger.info(f"Archive export complete: {total} rows appended. DIR={archive_dir}")
+    return total
+
+
+def drop_partitions(db_path: Path, before: int) -> List[int]:
+    """
+    Apply retention to a partitioned store: delete the shards of all years before `before`.
+
+    Returns the dropped years.
+    """
+    conn = connect(catalog_path(db_path))
+    store = PartitionedStore(db_path, conn)
+    try:
+        dropped = store.drop_before(before)
+    finally:
+        store.close()
+        conn.close()
+
+    logger.info(f"Dropped {len(dropped)} partitions before {before}. DIR={db_path}")
+    return dropped
+
+
+def compact_partitions(db_path: Path, years: Optional[Sequence[int]] = None) -> List[int]:
+    """
+    VACUUM the shards of a partitioned store (default: every year before the current one).
+
+    Returns the compacted years.
+    """
+    conn = connect(catalog_path(db_path))
+    store = PartitionedStore(db_path, conn)
+    try:
+        compacted = store.compact(years)
+    finally:
+        store.close()
+        conn.close()
 
-    logger.info(f"Done. Station={station.station_id}. Total inserted={total_inserted}. DB={config.db_path}")
\ No newline at end of file
+    logger.info(f"Compacted {len(compacted)} partitions. DIR={db_path}")
+    return compacted
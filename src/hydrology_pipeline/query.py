@@ -0,0 +1,274 @@
+import logging
+import math
+import re
+import sqlite3
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+from .db import ROLLUP_GRAINS
+from .transform import StationRow, parse_epoch
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# SQL aggregate per supported `agg` name
+AGGREGATES = {"mean": "AVG", "min": "MIN", "max": "MAX", "count": "COUNT", "sum": "SUM"}
+
+# The same aggregates over precomputed `rollups` rows
+ROLLUP_AGGREGATES = {
+    "mean": "SUM(total) / SUM(n)",
+    "min": "MIN(minimum)",
+    "max": "MAX(maximum)",
+    "count": "SUM(n)",
+    "sum": "SUM(total)",
+}
+
+_FREQ_UNITS = {"s": 1, "min": 60, "h": 3600, "d": 86400}
+
+TimeBound = Union[str, int]
+
+# Mean Earth radius used for station distances (km)
+EARTH_RADIUS_KM = 6371.0088
+
+# Kilometres per degree of latitude
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+@dataclass(frozen=True)
+class Series:
+    """
+    A time series as two aligned typed arrays.
+
+    `epochs` holds int64 UTC epoch seconds and `values` float64 values (NaN
+    for missing). Both support the buffer protocol, e.g.
+    `numpy.frombuffer(series.values)` wraps them without copying.
+    """
+
+    epochs: array = field(default_factory=lambda: array("q"))
+    values: array = field(default_factory=lambda: array("d"))
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+
+def freq_seconds(freq: str) -> int:
+    """
+    Convert a bucket frequency such as "15min", "1h" or "1d" to seconds.
+
+    Raises ValueError for unsupported frequencies.
+    """
+    match = re.fullmatch(r"(\d*)(s|min|h|d)", freq.strip())
+    if not match:
+        raise ValueError(f"Unsupported frequency: {freq!r} (use e.g. 15min, 1h, 1d)")
+    width = int(match.group(1) or 1) * _FREQ_UNITS[match.group(2)]
+    if width <= 0:
+        raise ValueError(f"Unsupported frequency: {freq!r}")
+    return width
+
+
+def _to_epoch(bound: TimeBound) -> int:
+    """Accept epoch seconds or an ISO-8601 string (naive values as UTC)."""
+    if isinstance(bound, int):
+        return bound
+    return parse_epoch(bound)
+
+
+def _measure_filter(
+    station_id: str,
+    observed_property: str,
+    measure_id: Optional[str],
+) -> Tuple[str, List[object]]:
+    """SQL selecting the measure keys of a station/property via idx_measures_station_prop."""
+    sql = "SELECT measure_key FROM measures WHERE station_id = ? AND observed_property = ?"
+    params: List[object] = [station_id, observed_property]
+    if measure_id is not None:
+        sql += " AND measure_id = ?"
+        params.append(measure_id)
+    return sql, params
+
+
+def _fill(rows: List[Tuple[int, Optional[float]]]) -> Series:
+    """Build a Series from (epoch, value) rows, mapping NULL values to NaN."""
+    nan = float("nan")
+    return Series(
+        epochs=array("q", [r[0] for r in rows]),
+        values=array("d", [nan if r[1] is None else r[1] for r in rows]),
+    )
+
+
+def get_series(
+    conn: sqlite3.Connection,
+    station_id: str,
+    observed_property: str,
+    start: TimeBound,
+    end: TimeBound,
+    measure_id: Optional[str] = None,
+) -> Series:
+    """
+    Return the raw readings of a station/property in [start, end) in time order.
+
+    The measures are found via idx_measures_station_prop and the readings
+    with a range scan of the (measure_key, epoch) primary key. Pass
+    `measure_id` when a station has several measures for the same property.
+    """
+    keys_sql, params = _measure_filter(station_id, observed_property, measure_id)
+    sql = f"""
+    SELECT epoch, value FROM readings
+    WHERE measure_key IN ({keys_sql}) AND epoch >= ? AND epoch < ?
+    ORDER BY epoch;
+    """
+    rows = conn.execute(sql, [*params, _to_epoch(start), _to_epoch(end)]).fetchall()
+    logger.debug(f"get_series {station_id}/{observed_property}: {len(rows)} rows")
+    return _fill(rows)
+
+
+def latest(
+    conn: sqlite3.Connection,
+    station_id: str,
+    n: int = 10,
+    observed_property: Optional[str] = None,
+) -> Dict[str, Series]:
+    """
+    Return the latest `n` readings of each measure of a station, in time order, keyed by measure_id.
+
+    Each measure costs one backwards range scan of the (measure_key, epoch)
+    primary key. Pass `observed_property` to restrict the measures.
+    """
+    if n <= 0:
+        raise ValueError("n must be a positive integer")
+    sql = "SELECT measure_key, measure_id FROM measures WHERE station_id = ?"
+    params: List[object] = [station_id]
+    if observed_property is not None:
+        sql += " AND observed_property = ?"
+        params.append(observed_property)
+
+    found: Dict[str, Series] = {}
+    for key, measure_id in conn.execute(f"{sql} ORDER BY measure_id;", params).fetchall():
+        rows = conn.execute(
+            "SELECT epoch, value FROM readings WHERE measure_key = ? ORDER BY epoch DESC LIMIT ?;", (key, n)
+        ).fetchall()
+        if rows:
+            found[measure_id] = _fill(rows[::-1])
+    return found
+
+
+def resample(
+    conn: sqlite3.Connection,
+    station_id: str,
+    observed_property: str,
+    start: TimeBound,
+    end: TimeBound,
+    freq: str = "1h",
+    agg: str = "mean",
+    measure_id: Optional[str] = None,
+) -> Series:
+    """
+    Aggregate a station/property into fixed UTC time buckets inside SQLite.
+
+    Buckets are `freq` wide (e.g. "15min", "1h", "1d") and labelled by their
+    start time. `agg` is one of mean, min, max, count or sum. Only one row per
+    non-empty bucket leaves SQLite, so raw readings are never loaded into Python.
+
+    Hourly and daily windows aligned to the bucket width are answered from the
+    `rollups` table, so their cost depends on the number of buckets, not on
+    the number of raw readings.
+    """
+    if agg not in AGGREGATES:
+        raise ValueError(f"Unsupported aggregate: {agg!r} (use one of {sorted(AGGREGATES)})")
+    width = freq_seconds(freq)
+    lo, hi = _to_epoch(start), _to_epoch(end)
+
+    keys_sql, params = _measure_filter(station_id, observed_property, measure_id)
+    if width in ROLLUP_GRAINS.values() and lo % width == 0 and hi % width == 0:
+        sql = f"""
+        SELECT bucket, {ROLLUP_AGGREGATES[agg]}
+        FROM rollups
+        WHERE measure_key IN ({keys_sql}) AND grain = ? AND bucket >= ? AND bucket < ?
+        GROUP BY bucket
+        ORDER BY bucket;
+        """
+        return _fill(conn.execute(sql, [*params, width, lo, hi]).fetchall())
+
+    sql = f"""
+    SELECT (epoch / ?) * ? AS bucket, {AGGREGATES[agg]}(value)
+    FROM readings
+    WHERE measure_key IN ({keys_sql}) AND epoch >= ? AND epoch < ?
+    GROUP BY bucket
+    ORDER BY bucket;
+    """
+    rows = conn.execute(sql, [width, width, *params, lo, hi]).fetchall()
+    return _fill(rows)
+
+
+def _station_rows(
+    conn: sqlite3.Connection,
+    min_lat: float,
+    min_long: float,
+    max_lat: float,
+    max_long: float,
+) -> List[StationRow]:
+    """Stations inside a lat/long box, through `stations_rtree` when the database has it."""
+    rtree = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'stations_rtree';").fetchone()
+    columns = "s.station_id, s.label, s.lat, s.long, s.river_name, s.date_opened"
+    if rtree:
+        # R*Tree coordinates are float32 rounded outwards; the exact test runs on `stations`.
+        sql = f"""
+        SELECT {columns} FROM stations_rtree r JOIN stations s ON s.rowid = r.id
+        WHERE r.max_lat >= :min_lat AND r.min_lat <= :max_lat
+          AND r.max_long >= :min_long AND r.min_long <= :max_long
+          AND s.lat BETWEEN :min_lat AND :max_lat AND s.long BETWEEN :min_long AND :max_long
+        """
+    else:
+        sql = f"""
+        SELECT {columns} FROM stations s
+        WHERE s.lat BETWEEN :min_lat AND :max_lat AND s.long BETWEEN :min_long AND :max_long
+        """
+    params = {"min_lat": min_lat, "max_lat": max_lat, "min_long": min_long, "max_long": max_long}
+    return [StationRow(*row) for row in conn.execute(sql, params)]
+
+
+def within_bbox(
+    conn: sqlite3.Connection,
+    min_lat: float,
+    min_long: float,
+    max_lat: float,
+    max_long: float,
+) -> List[StationRow]:
+    """Return the stations inside a latitude/longitude box (inclusive), ordered by station_id."""
+    if min_lat > max_lat or min_long > max_long:
+        raise ValueError("Bounding box minimum must not exceed its maximum")
+    return sorted(_station_rows(conn, min_lat, min_long, max_lat, max_long), key=lambda s: s.station_id)
+
+
+def distance_km(lat1: float, long1: float, lat2: float, long2: float) -> float:
+    """Great-circle (haversine) distance between two points in kilometres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(long2 - long1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def nearest(conn: sqlite3.Connection, lat: float, long: float, k: int = 5) -> List[Tuple[StationRow, float]]:
+    """
+    Return the `k` stations closest to a point as (station, distance in km), nearest first.
+
+    Searches a box around the point that doubles in size until it holds `k`
+    stations that are closer than any point outside the box, so only a few
+    index pages are read however many stations are stored.
+    """
+    if k <= 0:
+        raise ValueError("k must be a positive integer")
+
+    half = 0.1  # box half-height in degrees of latitude
+    while True:
+        widen = math.cos(math.radians(min(89.0, abs(lat) + half)))
+        half_long = min(180.0, half / widen)
+        box = (lat - half, long - half_long, lat + half, long + half_long)
+        ranked = sorted(
+            ((s, distance_km(lat, long, s.lat, s.long)) for s in _station_rows(conn, *box)),
+            key=lambda pair: (pair[1], pair[0].station_id),
+        )
+        # Every point outside the box is at least this far away
+        covered = _KM_PER_DEGREE * min(half, half_long * widen)
+        if half >= 180 or (len(ranked) >= k and ranked[k - 1][1] <= covered):
+            return ranked[:k]
+        half *= 2
@@ -0,0 +1,382 @@
+import asyncio
+import json
+import logging
+import queue
+import signal
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from . import metrics
+from .config import (
+    DEFAULT_READ_POOL_SIZE,
+    DEFAULT_RESULT_CACHE_ENTRIES,
+    DEFAULT_SERVE_HOST,
+    DEFAULT_SERVE_PORT,
+)
+from .partitions import list_years, open_reader
+from .query import Series, get_series, latest, resample
+from .transform import epoch_to_iso
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Largest accepted request line plus headers (bytes)
+MAX_REQUEST_HEAD = 16 * 1024
+
+# Upper bound on the `n` of /latest
+MAX_LATEST_READINGS = 10000
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+Params = Dict[str, str]
+
+
+def open_read_connection(db_path: Path, partitioned: bool = False) -> sqlite3.Connection:
+    """
+    Open a read-only connection that may be used from any (one at a time) thread.
+
+    With `partitioned`, `db_path` is a partitioned store and every shard is attached (see partitions.open_reader).
+    """
+    if partitioned:
+        return open_reader(db_path, check_same_thread=False)
+    return sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+
+
+class ResultCache:
+    """
+    LRU cache of encoded responses, valid for one version of the database.
+
+    The version is the tuple of `PRAGMA data_version` values of the served
+    database files (preceded, for a partitioned store, by its shard years),
+    which changes whenever another connection (e.g. the ETL writer in
+    another process) commits or a shard is created or dropped. validate() drops every entry once
+    the version moved, and put() ignores results computed against an older
+    version, so a response is never served after a commit it predates.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_RESULT_CACHE_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.version: Optional[Tuple[Hashable, ...]] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def validate(self, version: Tuple[Hashable, ...]) -> None:
+        if version != self.version:
+            if self._entries:
+                logger.debug(f"Database changed; dropping {len(self._entries)} cached results")
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: Hashable, body: bytes, version: Tuple[Hashable, ...]) -> None:
+        if version != self.version or self.max_entries <= 0:
+            return
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class ReadPool:
+    """
+    A fixed set of read-only connections, lent to queries running on a thread pool.
+
+    Keeps SQLite work off the event loop; at most `size` queries run at once.
+    """
+
+    def __init__(self, open_conn: Callable[[], sqlite3.Connection], size: int = DEFAULT_READ_POOL_SIZE) -> None:
+        if size <= 0:
+            raise ValueError("size must be a positive integer")
+        self._idle: queue.Queue = queue.Queue()
+        for _ in range(size):
+            self._idle.put(open_conn())
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="hydrology-read")
+        self.size = size
+
+    def _call(self, fn: Callable[..., Any], args: Tuple[Any, ...]) -> Any:
+        conn = self._idle.get()
+        try:
+            return fn(conn, *args)
+        finally:
+            self._idle.put(conn)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(conn, *args) with a pooled connection and return its result."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, fn, args)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        for _ in range(self.size):
+            self._idle.get().close()
+
+
+def _series_rows(series: Series) -> List[Dict[str, Any]]:
+    return [
+        {"date_time": epoch_to_iso(epoch), "value": None if value != value else value}
+        for epoch, value in zip(series.epochs, series.values)
+    ]
+
+
+def _required(params: Params, name: str) -> str:
+    value = params.get(name)
+    if not value:
+        raise ValueError(f"Missing query parameter: {name}")
+    return value
+
+
+def _time(params: Params, name: str) -> Union[int, str]:
+    """A required time parameter: epoch seconds when numeric, else an ISO-8601 string."""
+    value = _required(params, name)
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+def _stations(conn: sqlite3.Connection, params: Params) -> List[Dict[str, Any]]:
+    rows = conn.execute("SELECT station_id, label, lat, long, river_name FROM stations ORDER BY station_id;")
+    return [
+        {"station_id": s, "label": label, "lat": lat, "long": long, "river_name": river}
+        for s, label, lat, long, river in rows
+    ]
+
+
+def _latest(conn: sqlite3.Connection, params: Params) -> Dict[str, List[Dict[str, Any]]]:
+    try:
+        n = int(params.get("n", 10))
+    except ValueError:
+        raise ValueError("n must be an integer") from None
+    if not 0 < n <= MAX_LATEST_READINGS:
+        raise ValueError(f"n must be between 1 and {MAX_LATEST_READINGS}")
+    found = latest(conn, _required(params, "station"), n, params.get("param"))
+    return {measure_id: _series_rows(series) for measure_id, series in found.items()}
+
+
+def _range(conn: sqlite3.Connection, params: Params) -> List[Dict[str, Any]]:
+    series = get_series(
+        conn,
+        _required(params, "station"),
+        _required(params, "param"),
+        _time(params, "start"),
+        _time(params, "end"),
+        measure_id=params.get("measure"),
+    )
+    return _series_rows(series)
+
+
+def _aggregate(conn: sqlite3.Connection, params: Params) -> List[Dict[str, Any]]:
+    series = resample(
+        conn,
+        _required(params, "station"),
+        _required(params, "param"),
+        _time(params, "start"),
+        _time(params, "end"),
+        freq=params.get("freq", "1h"),
+        agg=params.get("agg", "mean"),
+        measure_id=params.get("measure"),
+    )
+    return _series_rows(series)
+
+
+# Path -> handler(conn, query parameters) returning a JSON-serializable result
+ROUTES: Dict[str, Callable[[sqlite3.Connection, Params], Any]] = {
+    "/stations": _stations,
+    "/latest": _latest,
+    "/range": _range,
+    "/aggregate": _aggregate,
+}
+
+
+class ReadServer:
+    """
+    Minimal asyncio HTTP/1.1 server answering read queries from the SQLite store.
+
+    Endpoints (GET, JSON responses):
+
+    - /stations
+    - /latest?station=S&n=10[&param=P]: latest n readings per measure
+    - /range?station=S&param=P&start=T&end=T[&measure=M]: raw readings in [start, end)
+    - /aggregate?station=S&param=P&start=T&end=T[&freq=1h][&agg=mean][&measure=M]
+
+    Times are ISO-8601 strings or epoch seconds. Queries run on a pool of
+    read-only connections, so clients share a few connections instead of
+    each opening their own next to the ETL writer. Encoded responses are kept
+    in an LRU ResultCache, checked against the database's data_version on
+    every request: repeated queries are answered from memory until the
+    writer commits. For a partitioned store the shard files are listed on
+    every request too; when a year is created or dropped the connections
+    are reopened over the new set of shards and the cache is dropped.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        partitioned: bool = False,
+        host: str = DEFAULT_SERVE_HOST,
+        port: int = DEFAULT_SERVE_PORT,
+        pool_size: int = DEFAULT_READ_POOL_SIZE,
+        cache_entries: int = DEFAULT_RESULT_CACHE_ENTRIES,
+    ) -> None:
+        self.db_path = db_path
+        self.partitioned = partitioned
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.cache = ResultCache(cache_entries)
+        self.pool: Optional[ReadPool] = None
+        self._watcher: Optional[sqlite3.Connection] = None
+        self._schemas: List[str] = []
+        self._years: Tuple[int, ...] = ()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def _open(self) -> None:
+        """(Re)open the watcher and the pool over the current shards, then close the previous ones."""
+        # Listed before opening: a shard created in between only causes one more reopen.
+        self._years = tuple(list_years(self.db_path)) if self.partitioned else ()
+        watcher, pool = self._watcher, self.pool
+        self._watcher = open_read_connection(self.db_path, self.partitioned)
+        self._schemas = [name for _, name, _ in self._watcher.execute("PRAGMA database_list;") if name != "temp"]
+        self.pool = ReadPool(lambda: open_read_connection(self.db_path, self.partitioned), self.pool_size)
+        if watcher is not None:
+            logger.info(f"Shards of {self.db_path} changed; reopened read connections over {list(self._years)}")
+            watcher.close()
+        if pool is not None:
+            # Lets queries still running on the old connections finish first.
+            await asyncio.get_running_loop().run_in_executor(None, pool.close)
+
+    async def _version(self) -> Tuple[Hashable, ...]:
+        if self.partitioned and tuple(list_years(self.db_path)) != self._years:
+            await self._open()
+        data_versions = (
+            self._watcher.execute(f"PRAGMA {schema}.data_version;").fetchone()[0] for schema in self._schemas
+        )
+        return (self._years, *data_versions)
+
+    async def start(self) -> Tuple[str, int]:
+        """Open the connections and start listening. Returns the bound (host, port)."""
+        await self._open()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_REQUEST_HEAD)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        logger.info(f"Serving {self.db_path} on http://{self.host}:{self.port}")
+        return self.host, self.port
+
+    async def close(self) -> None:
+        """Stop listening and close the connections."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.pool is not None:
+            self.pool.close()
+        if self._watcher is not None:
+            self._watcher.close()
+        logger.info(f"Read API stopped (cache hits={self.cache.hits}, misses={self.cache.misses}).")
+
+    async def respond(self, target: str) -> Tuple[int, bytes]:
+        """Answer one GET request target (path and query string) as (status, JSON body)."""
+        started = time.perf_counter()
+        url = urlsplit(target)
+        handler = ROUTES.get(url.path)
+        if handler is None:
+            return 404, json.dumps({"error": f"Unknown path: {url.path}"}).encode()
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        key = (url.path, tuple(sorted(params.items())))
+
+        version = await self._version()
+        self.cache.validate(version)
+        body = self.cache.get(key)
+        if body is not None:
+            metrics.inc("serve_requests_total", endpoint=url.path, cache="hit")
+            return 200, body
+
+        try:
+            result = await self.pool.run(handler, params)
+        except ValueError as exc:
+            metrics.inc("serve_requests_total", endpoint=url.path, cache="error")
+            return 400, json.dumps({"error": str(exc)}).encode()
+        except Exception as exc:  # type: Exception
+            logger.error(f"Failed to answer {target}: {exc}")
+            metrics.inc("serve_requests_total", endpoint=url.path, cache="error")
+            return 500, json.dumps({"error": "Internal error"}).encode()
+        body = json.dumps(result, separators=(",", ":")).encode()
+        self.cache.put(key, body, version)
+        metrics.inc("serve_requests_total", endpoint=url.path, cache="miss")
+        metrics.observe("serve_query_seconds", time.perf_counter() - started, endpoint=url.path)
+        return 200, body
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve the requests of one client connection (keep-alive until the client closes)."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                parts = lines[0].split(" ")
+                fields = (line.partition(":") for line in lines[1:] if line)
+                headers = {name.strip().lower(): value.strip() for name, _, value in fields}
+                keep_alive = (
+                    len(parts) == 3 and parts[2] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                )
+
+                if len(parts) != 3 or headers.get("content-length", "0") != "0":
+                    status, body, keep_alive = 400, b'{"error":"Malformed request"}', False
+                elif parts[0] not in ("GET", "HEAD"):
+                    status, body = 405, b'{"error":"Only GET is supported"}'
+                else:
+                    status, body = await self.respond(parts[1])
+
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(body)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    ).encode()
+                    + (body if parts[0] != "HEAD" else b"")
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def serve(
+    db_path: Path,
+    partitioned: bool = False,
+    host: str = DEFAULT_SERVE_HOST,
+    port: int = DEFAULT_SERVE_PORT,
+    pool_size: int = DEFAULT_READ_POOL_SIZE,
+    cache_entries: int = DEFAULT_RESULT_CACHE_ENTRIES,
+) -> None:
+    """Run a ReadServer until SIGINT/SIGTERM."""
+
+    async def main() -> None:
+        server = ReadServer(db_path, partitioned, host, port, pool_size, cache_entries)
+        await server.start()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        try:
+            await stop.wait()
+        finally:
+            await server.close()
+
+    asyncio.run(main())
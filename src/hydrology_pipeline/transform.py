@@ -1,14 +1,34 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Any, Dict, Optional
+from array import array
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
 ALLOWED_QUALITY = {"Good", "Estimated", "Suspect", "Unchecked", "Missing"}
 
+# Dictionary codes for quality flags; unexpected flags are appended per batch
+QUALITY_CODES: Dict[Optional[str], int] = {
+    None: 0,
+    "Good": 1,
+    "Estimated": 2,
+    "Suspect": 3,
+    "Unchecked": 4,
+    "Missing": 5,
+}
+
+# Raw reading as parsed from a CSV download: (dateTime, value, quality)
+RawReadingTuple = Tuple[str, Optional[str], Optional[str]]
+
+# Measurement in insert column order:
+# (station_id, observed_property, measure_id, date_time, value, quality)
+MeasurementTuple = Tuple[str, str, str, str, Optional[float], Optional[str]]
+
 
 @dataclass(frozen=True)
 class StationRow:
@@ -20,6 +40,17 @@ class StationRow:
     date_opened: Optional[str]
 
 
+@dataclass(frozen=True)
+class MeasureRow:
+    measure_id: str
+    station_id: Optional[str]
+    observed_property: Optional[str]
+    unit: Optional[str]
+    period: Optional[int]
+    value_type: Optional[str]
+    label: Optional[str]
+
+
 @dataclass(frozen=True)
 class MeasurementRow:
     station_id: str
@@ -57,14 +88,89 @@ def normalize_station(item: Dict[str, Any]) -> StationRow:
         date_opened=item.get("dateOpened"),
     )
 
+def _uri_tail(value: Any) -> Optional[str]:
+    """Return the last path segment of a URI, or of the @id of a linked resource."""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get("notation") or value.get("@id")
+    if not value:
+        return None
+    return str(value).rstrip("/").rsplit("/", 1)[-1]
+
+
+def normalize_measure(item: Dict[str, Any]) -> MeasureRow:
+    """
+    Normalize a measure payload from /id/measures into a MeasureRow for the catalogue.
+
+    The observed property is the API `parameter` slug (e.g. conductivity, ph, flow).
+    Raises ValueError if the measure identifier is missing.
+    """
+    measure_id = item.get("notation") or _uri_tail(item.get("@id"))
+    if not measure_id:
+        raise ValueError("Measure payload missing an identifier (notation/@id)")
+
+    try:
+        period = int(item["period"]) if item.get("period") is not None else None
+    except (TypeError, ValueError):
+        period = None
+
+    return MeasureRow(
+        measure_id=str(measure_id),
+        station_id=_uri_tail(item.get("station")),
+        observed_property=item.get("parameter") or _uri_tail(item.get("observedProperty")),
+        unit=item.get("unitName") or _uri_tail(item.get("unit")),
+        period=period,
+        value_type=item.get("valueType"),
+        label=item.get("label"),
+    )
+
+_EPOCH_DATE = date(1970, 1, 1)
+
+
+def parse_epoch(dt_str: str, day_cache: Optional[Dict[str, int]] = None) -> int:
+    """
+    Convert an ISO-8601 timestamp to UTC epoch seconds; naive values are taken as UTC.
+
+    The common `YYYY-MM-DDTHH:MM:SS[Z|+00:00]` forms are parsed by slicing, with
+    the day offset cached per date in `day_cache`, so a page of readings parses
+    each date once. Anything else goes through datetime.fromisoformat.
+    Raises ValueError.
+    """
+    if day_cache is None:
+        day_cache = {}
+    if len(dt_str) >= 19 and dt_str[10] == "T" and dt_str[19:] in ("", "Z", "+00:00"):
+        hms = dt_str[11:13] + dt_str[14:16] + dt_str[17:19]
+        if dt_str[13] == dt_str[16] == ":" and hms.isascii() and hms.isdigit():
+            hours, minutes, seconds = int(hms[0:2]), int(hms[2:4]), int(hms[4:6])
+            if hours < 24 and minutes < 60 and seconds < 60:
+                day = day_cache.get(dt_str[:10])
+                if day is None:
+                    day = (date.fromisoformat(dt_str[:10]) - _EPOCH_DATE).days * 86400
+                    day_cache[dt_str[:10]] = day
+                return day + hours * 3600 + minutes * 60 + seconds
+
+    parsed = datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def epoch_to_iso(epoch: int) -> str:
+    """Format UTC epoch seconds as the canonical ISO-8601 string (`...+00:00`)."""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
 def _to_iso(dt_str: str) -> str:
-    """Validate and normalize ISO-8601 timestamps. Raises on invalid values."""
-    cleaned = dt_str.replace("Z", "+00:00")
+    """
+    Validate and normalize ISO-8601 timestamps to UTC (`...+00:00`). Raises on invalid values.
+
+    Naive timestamps are taken as UTC, matching the Hydrology API.
+    """
     try:
-        datetime.fromisoformat(cleaned)
+        return epoch_to_iso(parse_epoch(dt_str))
     except ValueError as exc:
         raise ValueError(f"Invalid datetime format: {dt_str}") from exc
-    return cleaned
 
 
 def normalize_reading(
@@ -100,4 +206,145 @@ def normalize_reading(
         date_time=_to_iso(str(dt)),
         value=value,
         quality=quality,
-    )
\ No newline at end of file
+    )
+
+
+@dataclass
+class MeasurementBatch:
+    """
+    Columnar batch of readings for one measure.
+
+    Readings are held in typed contiguous arrays instead of one object per
+    row: int64 epoch seconds (UTC), float64 values (NaN when missing) and uint8
+    quality codes dictionary-encoded against `quality_labels`. The arrays
+    support the buffer protocol, so numpy.frombuffer can wrap them without
+    copying. `rejected` lists (input index, reason) for readings that failed
+    validation.
+    """
+
+    station_id: str
+    observed_property: str
+    measure_id: str
+    epochs: array = field(default_factory=lambda: array("q"))
+    values: array = field(default_factory=lambda: array("d"))
+    quality_codes: array = field(default_factory=lambda: array("B"))
+    quality_labels: List[Optional[str]] = field(default_factory=lambda: list(QUALITY_CODES))
+    rejected: List[Tuple[int, str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def iter_tuples(self) -> Iterator[MeasurementTuple]:
+        """Yield MeasurementTuple rows in insert column order."""
+        labels = self.quality_labels
+        for epoch, value, code in zip(self.epochs, self.values, self.quality_codes):
+            yield (
+                self.station_id,
+                self.observed_property,
+                self.measure_id,
+                epoch_to_iso(epoch),
+                None if value != value else value,
+                labels[code],
+            )
+
+
+def _build_batch(
+    readings: Iterable[Tuple[Any, Any, Any]],
+    station_id: str,
+    observed_property: str,
+    measure_id: str,
+    reject_invalid: bool = False,
+) -> MeasurementBatch:
+    """
+    Validate (dateTime, value, quality) triples into a MeasurementBatch.
+
+    With `reject_invalid` set, readings with an unparsable value or an unexpected
+    quality flag are rejected instead of being stored as NULL / a new label.
+    """
+    batch = MeasurementBatch(station_id, observed_property, measure_id)
+    codes: Dict[Optional[str], int] = dict(QUALITY_CODES)
+    day_cache: Dict[str, int] = {}
+    nan = float("nan")
+    add_epoch, add_value, add_code = batch.epochs.append, batch.values.append, batch.quality_codes.append
+
+    with metrics.span("transform"):
+        for index, (dt, raw_val, quality) in enumerate(readings):
+            if not dt:
+                batch.rejected.append((index, "missing dateTime/date"))
+                continue
+            try:
+                epoch = parse_epoch(str(dt), day_cache)
+            except ValueError:
+                batch.rejected.append((index, f"invalid dateTime {dt!r}"))
+                continue
+
+            if raw_val is None or raw_val == "":
+                value = nan
+            else:
+                try:
+                    value = float(raw_val)
+                except (TypeError, ValueError):
+                    if reject_invalid:
+                        batch.rejected.append((index, f"unparsable value {raw_val!r}"))
+                        continue
+                    value = nan
+
+            quality = quality or None
+            code = codes.get(quality)
+            if code is None:
+                if reject_invalid:
+                    batch.rejected.append((index, f"unexpected quality flag {quality!r}"))
+                    continue
+                logger.warning("Unexpected quality flag '%s' for measure_id=%s", quality, measure_id)
+                if len(batch.quality_labels) > 255:
+                    batch.rejected.append((index, f"too many distinct quality flags ({quality!r})"))
+                    continue
+                code = codes[quality] = len(batch.quality_labels)
+                batch.quality_labels.append(quality)
+
+            add_epoch(epoch)
+            add_value(value)
+            add_code(code)
+
+    metrics.inc("rows_normalized_total", len(batch))
+    if batch.rejected:
+        metrics.inc("rows_rejected_total", len(batch.rejected))
+    return batch
+
+
+def normalize_readings(
+    items: Iterable[Dict[str, Any]],
+    station_id: str,
+    observed_property: str,
+    measure_id: str,
+    reject_invalid: bool = False,
+) -> MeasurementBatch:
+    """
+    Normalize a page of reading payloads into a columnar MeasurementBatch.
+
+    Applies the rules of normalize_reading to the whole page at once. Readings
+    without a valid timestamp are reported in `rejected` instead of raising;
+    unparsable values become NaN (stored as NULL) unless `reject_invalid` is set,
+    which also rejects them and unexpected quality flags.
+    """
+    return _build_batch(
+        ((r.get("dateTime") or r.get("date"), r.get("value"), r.get("quality")) for r in items),
+        station_id,
+        observed_property,
+        measure_id,
+        reject_invalid,
+    )
+
+
+def normalize_raw_readings(
+    rows: Iterable[RawReadingTuple],
+    station_id: str,
+    observed_property: str,
+    measure_id: str,
+    reject_invalid: bool = False,
+) -> MeasurementBatch:
+    """
+    Normalize raw (dateTime, value, quality) tuples, e.g. from a CSV download,
+    into a columnar MeasurementBatch (see normalize_readings for `reject_invalid`).
+    """
+    return _build_batch(rows, station_id, observed_property, measure_id, reject_invalid)
@@ -1,38 +1,334 @@
 import logging
 import argparse
 from pathlib import Path
-from src.hydrology_pipeline.config import PipelineConfig
-from src.hydrology_pipeline.pipeline import run
+from src.hydrology_pipeline import metrics
+from src.hydrology_pipeline.api_client import HydrologyClient, ResponseCache, set_default_client
+from src.hydrology_pipeline.backfill import repair_gaps, run_backfill
+from src.hydrology_pipeline.config import (
+    DEFAULT_BACKFILL_CHUNK_DAYS,
+    DEFAULT_CACHE_MAX_BYTES,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_POLL_JITTER,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_READ_POOL_SIZE,
+    DEFAULT_RESULT_CACHE_ENTRIES,
+    DEFAULT_SERVE_HOST,
+    DEFAULT_SERVE_PORT,
+    PipelineConfig,
+    load_manifest,
+)
+from src.hydrology_pipeline.daemon import PollingDaemon
+from src.hydrology_pipeline.db import connect, init_db
+from src.hydrology_pipeline.partitions import catalog_path
+from src.hydrology_pipeline.pipeline import (
+    compact_partitions,
+    drop_partitions,
+    export_measure_archive,
+    rebuild_rollup_tables,
+    run_many,
+    sync_measure_catalogue,
+    sync_station_catalogue,
+)
+from src.hydrology_pipeline.query import nearest, within_bbox
+from src.hydrology_pipeline.serve import serve
 
 def parse_args() -> argparse.Namespace:
     """Parse CLI arguments for the hydrology ETL pipeline."""
     p = argparse.ArgumentParser(description="Hydrology ETL: API -> SQLite (stations + measurements)")
+    p.add_argument(
+        "command",
+        nargs="?",
+        default="run",
+        choices=[
+            "run",
+            "backfill",
+            "repair",
+            "crawl-stations",
+            "crawl-measures",
+            "rebuild-rollups",
+            "export-archive",
+            "daemon",
+            "drop-partitions",
+            "compact-partitions",
+            "serve",
+        ],
+        help=(
+            "run: load readings (default); backfill: load the --since/--until history in resumable chunks; "
+            "repair: refetch only the missing intervals recorded in the gaps table for the selected stations; "
+            "crawl-stations: refresh the local station list and spatial index; "
+            "crawl-measures: refresh the local measure catalogue; "
+            "rebuild-rollups: recompute hourly/daily aggregates from stored readings; "
+            "export-archive: append stored readings to memory-mappable column files; "
+            "daemon: keep polling each measure on its reading cadence until SIGINT/SIGTERM; "
+            "drop-partitions: delete the yearly shards before --before (with --partitioned); "
+            "compact-partitions: VACUUM the yearly shards of past years (with --partitioned); "
+            "serve: answer latest/range/aggregate queries over HTTP from a read-only pool and result cache"
+        ),
+    )
     p.add_argument("--station", default="E64999A", help="Station notation (e.g., E64999A)")
-    p.add_argument("--db", default="data/hydrology.db", help="SQLite path")
+    p.add_argument("--db", default="data/hydrology.db", help="SQLite path (a directory with --partitioned)")
+    p.add_argument(
+        "--partitioned",
+        action="store_true",
+        help="Store readings in one SQLite file per year under the --db directory, next to catalog.db",
+    )
+    p.add_argument("--before", type=int, default=None, help="With drop-partitions, the oldest year to keep")
     p.add_argument("--limit", type=int, default=10, help="Number of latest readings per parameter")
     p.add_argument(
         "--params",
         nargs="+",
         default=["conductivity", "dissolved-oxygen"],
-        help="Exactly two parameters: conductivity dissolved-oxygen",
+        help="Parameters to download (any catalogued parameter; without a catalogue: conductivity dissolved-oxygen)",
+    )
+    p.add_argument("--since", default=None, help="Stream history from this ISO-8601 time instead of --limit")
+    p.add_argument("--until", default=None, help="Exclusive ISO-8601 end of the history window (with --since)")
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only fetch readings newer than the latest stored reading per measure",
+    )
+    p.add_argument(
+        "--batch-measures",
+        action="store_true",
+        help="With --since/--incremental, fetch all measures of a station in one paginated request",
+    )
+    p.add_argument(
+        "--csv",
+        action="store_true",
+        help="With --since/--incremental, stream readings.csv into the bulk loader",
+    )
+    p.add_argument(
+        "--lenient",
+        action="store_true",
+        help="Store invalid readings in rejected_readings and load the valid ones instead of failing",
+    )
+    p.add_argument(
+        "--detect-anomalies",
+        action="store_true",
+        help="Score loaded readings against rolling per-measure statistics and record spikes/sags in alerts",
+    )
+    p.add_argument(
+        "--wal",
+        action="store_true",
+        help="Use the WAL / synchronous=NORMAL bulk-load profile for SQLite",
+    )
+    p.add_argument("--archive-dir", default="data/archive", help="Output directory of export-archive")
+    p.add_argument(
+        "--archive-full",
+        action="store_true",
+        help="With export-archive, rewrite each measure's archive instead of appending",
+    )
+    p.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Readings per page when streaming history")
+    p.add_argument(
+        "--manifest",
+        default=None,
+        help="JSON file listing stations to run (overrides --station)",
+    )
+    p.add_argument(
+        "--near",
+        nargs=2,
+        type=float,
+        metavar=("LAT", "LONG"),
+        default=None,
+        help="Run the stored stations nearest to this point (see crawl-stations)",
+    )
+    p.add_argument("--near-count", type=int, default=5, help="Number of stations selected with --near")
+    p.add_argument(
+        "--bbox",
+        nargs=4,
+        type=float,
+        metavar=("MIN_LAT", "MIN_LONG", "MAX_LAT", "MAX_LONG"),
+        default=None,
+        help="Run the stored stations inside this box (see crawl-stations)",
     )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Number of concurrent API workers",
+    )
+    p.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="Keep-alive HTTP connection pool size")
+    p.add_argument(
+        "--rate-limit",
+        type=float,
+        default=DEFAULT_RATE_LIMIT,
+        help="Maximum API requests per second (0 disables rate limiting)",
+    )
+    p.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES, help="Retries for 429/5xx responses")
+    p.add_argument(
+        "--http-cache",
+        default=None,
+        help="SQLite file caching station/measure metadata responses (e.g. data/http_cache.db)",
+    )
+    p.add_argument(
+        "--http-cache-mb",
+        type=int,
+        default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024),
+        help="Size cap of the HTTP response cache in MB",
+    )
+    p.add_argument(
+        "--chunk-days",
+        type=int,
+        default=DEFAULT_BACKFILL_CHUNK_DAYS,
+        help="With backfill, days of history fetched and checkpointed per chunk",
+    )
+    p.add_argument(
+        "--recheck-gaps",
+        action="store_true",
+        help="With repair, also refetch gaps an earlier repair found missing upstream",
+    )
+    p.add_argument(
+        "--poll-jitter",
+        type=float,
+        default=DEFAULT_POLL_JITTER,
+        help="With daemon, random spread of each poll interval as a fraction of it",
+    )
+    p.add_argument("--host", default=DEFAULT_SERVE_HOST, help="With serve, address to listen on")
+    p.add_argument("--port", type=int, default=DEFAULT_SERVE_PORT, help="With serve, port to listen on")
+    p.add_argument(
+        "--read-pool",
+        type=int,
+        default=DEFAULT_READ_POOL_SIZE,
+        help="With serve, number of read-only SQLite connections",
+    )
+    p.add_argument(
+        "--cache-entries",
+        type=int,
+        default=DEFAULT_RESULT_CACHE_ENTRIES,
+        help="With serve, responses kept in the in-memory LRU cache (0 disables)",
+    )
+    p.add_argument("--metrics-json", default=None, help="Write a JSON run report with stage timings and counters")
+    p.add_argument("--metrics-prom", default=None, help="Write metrics as a Prometheus textfile (node_exporter)")
     return p.parse_args()
 
+def catalog_db(args: argparse.Namespace) -> Path:
+    """Return the database holding stations and measures: --db, or its catalog with --partitioned."""
+    return catalog_path(Path(args.db)) if args.partitioned else Path(args.db)
+
+def select_stations(args: argparse.Namespace) -> list:
+    """Look up the station notations chosen with --near or --bbox in the local stations table."""
+    conn = connect(catalog_db(args))
+    try:
+        # A fresh database has no stations table yet; create it so an empty selection is reported instead.
+        init_db(conn)
+        if args.near:
+            found = nearest(conn, args.near[0], args.near[1], k=args.near_count)
+            for station, km in found:
+                logging.info(f"Selected {station.station_id} ({station.label}) at {km:.1f} km")
+            return [station.station_id for station, _ in found]
+        return [station.station_id for station in within_bbox(conn, *args.bbox)]
+    finally:
+        conn.close()
+
+def build_configs(args: argparse.Namespace) -> list:
+    """Build the list of PipelineConfig objects requested on the command line."""
+    defaults = {
+        "db_path": Path(args.db),
+        "limit": args.limit,
+        "params": args.params,
+        "since": args.since,
+        "until": args.until,
+        "page_size": args.page_size,
+        "incremental": args.incremental,
+        "wal": args.wal,
+        "batch_measures": args.batch_measures,
+        "csv": args.csv,
+        "lenient": args.lenient,
+        "detect_anomalies": args.detect_anomalies,
+        "partitioned": args.partitioned,
+    }
+    if args.manifest:
+        return load_manifest(Path(args.manifest), defaults=defaults)
+    if args.near or args.bbox:
+        stations = select_stations(args)
+        if not stations:
+            raise ValueError("No stored stations match --near/--bbox; run crawl-stations first")
+        return [PipelineConfig(station_notation=s, required_station_label=None, **defaults) for s in stations]
+    return [PipelineConfig(station_notation=args.station, **defaults)]
+
+def repair_stations(configs: list, include_checked: bool, max_workers: int) -> None:
+    """Repair the recorded gaps of every selected station; failures are re-raised once all were tried."""
+    failures = []
+    for config in configs:
+        try:
+            repair_gaps(
+                config, include_checked=include_checked, max_workers=max_workers, station_ids=[config.station_notation]
+            )
+        except Exception as exc:  # type: Exception
+            logging.error(f"Repair of {config.station_notation} failed: {exc}")
+            failures.append(exc)
+    if failures:
+        raise failures[0]
+
 def main() -> None:
     """Entrypoint for running the ETL pipeline from the command line."""
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     args = parse_args()
-    cfg = PipelineConfig(
-        station_notation=args.station,
-        db_path=Path(args.db),
-        limit=args.limit,
-        params=args.params,
+    set_default_client(
+        HydrologyClient(
+            pool_size=max(args.pool_size, args.workers),
+            rate_limit=args.rate_limit or None,
+            max_retries=args.max_retries,
+            cache=(
+                ResponseCache(Path(args.http_cache), max_bytes=args.http_cache_mb * 1024 * 1024)
+                if args.http_cache
+                else None
+            ),
+        )
     )
     try:
-        run(cfg)
+        if args.command == "crawl-stations":
+            sync_station_catalogue(catalog_db(args), page_size=args.page_size)
+        elif args.command == "crawl-measures":
+            sync_measure_catalogue(catalog_db(args), page_size=args.page_size)
+        elif args.command == "rebuild-rollups":
+            rebuild_rollup_tables(Path(args.db), wal=args.wal, partitioned=args.partitioned)
+        elif args.command in ("drop-partitions", "compact-partitions"):
+            if not args.partitioned:
+                raise ValueError(f"{args.command} needs --partitioned")
+            if args.command == "compact-partitions":
+                compact_partitions(Path(args.db))
+            elif args.before is None:
+                raise ValueError("drop-partitions needs --before YEAR")
+            else:
+                drop_partitions(Path(args.db), args.before)
+        elif args.command == "backfill":
+            run_backfill(build_configs(args), chunk_days=args.chunk_days, max_workers=args.workers)
+        elif args.command == "repair":
+            repair_stations(build_configs(args), include_checked=args.recheck_gaps, max_workers=args.workers)
+        elif args.command == "daemon":
+            PollingDaemon(
+                build_configs(args),
+                max_workers=args.workers,
+                jitter=args.poll_jitter,
+                metrics_prom=Path(args.metrics_prom) if args.metrics_prom else None,
+            ).run_forever()
+        elif args.command == "serve":
+            serve(
+                Path(args.db),
+                partitioned=args.partitioned,
+                host=args.host,
+                port=args.port,
+                pool_size=args.read_pool,
+                cache_entries=args.cache_entries,
+            )
+        elif args.command == "export-archive":
+            export_measure_archive(
+                Path(args.db), Path(args.archive_dir), full=args.archive_full, partitioned=args.partitioned
+            )
+        else:
+            run_many(build_configs(args), max_workers=args.workers)
     except Exception as exc:
         logging.error(f"Pipeline execution failed: {exc}")
         raise
+    finally:
+        if args.metrics_json:
+            metrics.REGISTRY.write_json(Path(args.metrics_json))
+        if args.metrics_prom:
+            metrics.REGISTRY.write_prometheus(Path(args.metrics_prom))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,20 @@
+def station_payload(notation):
+    """A station API item with one conductivity and one dissolved-oxygen measure."""
+    return {
+        "notation": notation,
+        "label": f"Station {notation}",
+        "lat": 53.0,
+        "long": -1.5,
+        "measures": [
+            {"@id": f"https://example.com/measures/{notation}-cond-i-subdaily-uS"},
+            {"@id": f"https://example.com/measures/{notation}-do-i-subdaily-mgL"},
+        ],
+    }
+
+
+def latest_readings(measure_id, limit=10, timeout=30):
+    """Stand-in for fetch_latest_readings_for_measure: two good readings at 00:00 and 00:15."""
+    return [
+        {"dateTime": "2024-01-01T00:00:00Z", "value": 1.0, "quality": "Good"},
+        {"dateTime": "2024-01-01T00:15:00Z", "value": 2.0, "quality": "Good"},
+    ]
@@ -0,0 +1,65 @@
+import tempfile
+from pathlib import Path
+
+from src.hydrology_pipeline.anomaly import detect_anomalies
+from src.hydrology_pipeline.db import connect, init_db, insert_batch
+from src.hydrology_pipeline.transform import epoch_to_iso, normalize_readings
+
+BASE = 1704067200  # 2024-01-01T00:00:00Z
+
+
+def _page(values, measure_id, prop, start=0):
+    """A newest-first page of 15-minute readings, as the latest-readings endpoint returns them."""
+    items = [
+        {"dateTime": epoch_to_iso(BASE + (start + i) * 900), "value": v, "quality": "Good"}
+        for i, v in enumerate(values)
+    ]
+    return normalize_readings(items[::-1], "S1", prop, measure_id)
+
+
+def test_detect_anomalies_flags_watched_direction_once():
+    """Conductivity spikes and dissolved-oxygen sags are flagged once; rescoring a page adds nothing."""
+    noise = [100.0 + (1 if i % 2 else -1) for i in range(40)]
+    cond = _page(noise + [200.0, 100.0, 0.0], "S1-cond", "conductivity")
+    do = _page([v / 10 for v in noise] + [20.0, 10.0, 0.0], "S1-do", "dissolved-oxygen")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        init_db(conn)
+        for batch in (cond, do):
+            insert_batch(conn, batch)
+        assert detect_anomalies(conn, [cond, do]) == 2
+        assert detect_anomalies(conn, [cond, do]) == 0
+
+        rows = conn.execute(
+            "SELECT m.measure_id, a.epoch, a.kind, a.value FROM alerts a "
+            "JOIN measures m USING (measure_key) ORDER BY m.measure_id;"
+        ).fetchall()
+        assert rows == [
+            ("S1-cond", BASE + 40 * 900, "spike", 200.0),
+            ("S1-do", BASE + 42 * 900, "sag", 0.0),
+        ]
+        conn.close()
+
+
+def test_detect_anomalies_state_persists_between_runs():
+    """Scoring a series in two runs leaves the same state and alerts as one pass over it."""
+    values = [5.0 + (i % 3) * 0.1 for i in range(60)] + [9.0]
+    states = []
+    for split in (len(values), 35):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = Path(tmpdir) / "test.db"
+            found = 0
+            for start, end in ((0, split), (split, len(values))):
+                conn = connect(db_path)
+                init_db(conn)
+                batch = _page(values[start:end], "M1", "ph", start)
+                insert_batch(conn, batch)
+                found += detect_anomalies(conn, [batch])
+                conn.close()
+            conn = connect(db_path)
+            states.append((found, conn.execute("SELECT last_epoch, n, mean, var FROM anomaly_state;").fetchall()))
+            conn.close()
+
+    assert states[0][0] == 1
+    assert states[0] == states[1]
@@ -0,0 +1,115 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from src.hydrology_pipeline.api_client import HydrologyApiError, HydrologyClient, ResponseCache, TokenBucket
+
+
+def _response(status, payload=None, headers=None):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.headers = headers or {}
+    resp.json.return_value = payload
+    resp.content = json.dumps(payload).encode() if payload is not None else b""
+    if status >= 400:
+        resp.raise_for_status.side_effect = requests.HTTPError(f"{status} error")
+    return resp
+
+
+def test_client_retries_on_503_honoring_retry_after():
+    client = HydrologyClient(rate_limit=None, max_retries=2)
+    responses = [_response(503, headers={"Retry-After": "3"}), _response(200, {"items": []})]
+    with patch.object(client.session, "get", side_effect=responses) as mock_get, \
+         patch("src.hydrology_pipeline.api_client.time.sleep") as mock_sleep:
+        assert client.get_json("https://example.com/x.json") == {"items": []}
+
+    assert mock_get.call_count == 2
+    mock_sleep.assert_called_once_with(3.0)
+
+
+def test_client_caps_retry_after_at_backoff_cap():
+    client = HydrologyClient(rate_limit=None, max_retries=1, backoff_cap=30.0)
+    responses = [_response(429, headers={"Retry-After": "86400"}), _response(200, {"items": []})]
+    with patch.object(client.session, "get", side_effect=responses), \
+         patch("src.hydrology_pipeline.api_client.time.sleep") as mock_sleep:
+        assert client.get_json("https://example.com/x.json") == {"items": []}
+
+    mock_sleep.assert_called_once_with(30.0)
+
+
+def test_client_does_not_retry_client_errors():
+    client = HydrologyClient(rate_limit=None, max_retries=3)
+    with patch.object(client.session, "get", return_value=_response(404)) as mock_get:
+        with pytest.raises(HydrologyApiError):
+            client.get_json("https://example.com/missing.json")
+    assert mock_get.call_count == 1
+
+
+def test_token_bucket_throttle_and_recover():
+    bucket = TokenBucket(rate=8.0)
+    bucket.throttle()
+    assert bucket.rate == 4.0
+    for _ in range(100):
+        bucket.recover()
+    assert bucket.rate == 8.0
+
+
+def test_client_caches_station_metadata_and_revalidates():
+    """Fresh entries skip the network; stale ones are revalidated with If-None-Match."""
+    url = "https://example.com/hydrology/id/stations/S1.json"
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResponseCache(Path(tmpdir) / "cache.db")
+        client = HydrologyClient(rate_limit=None, cache=cache)
+        first = _response(200, {"items": [{"notation": "S1"}]}, headers={"ETag": '"v1"'})
+        with patch.object(client.session, "get", side_effect=[first, _response(304)]) as mock_get:
+            assert client.get_json(url)["items"][0]["notation"] == "S1"
+            assert client.get_json(url)["items"][0]["notation"] == "S1"
+            assert mock_get.call_count == 1
+
+            cache.refresh(ResponseCache.make_key(url), ttl=-1)
+            assert client.get_json(url)["items"][0]["notation"] == "S1"
+            assert mock_get.call_count == 2
+            assert mock_get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+        client.close()
+
+
+def test_response_cache_skips_catalogue_listings():
+    """Single station/measure documents are cacheable; the paginated crawl listings are always fetched."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResponseCache(Path(tmpdir) / "cache.db")
+        base = "https://environment.data.gov.uk/hydrology/id"
+        assert cache.ttl_for(f"{base}/stations/S1.json") == 24 * 3600
+        assert cache.ttl_for(f"{base}/measures/M1.json") == 24 * 3600
+        assert cache.ttl_for(f"{base}/stations.json") is None
+        assert cache.ttl_for(f"{base}/measures.json") is None
+        assert cache.ttl_for(f"{base}/measures/M1/readings.json") is None
+        cache.close()
+
+
+def test_response_cache_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResponseCache(Path(tmpdir) / "cache.db", max_bytes=10)
+        cache.put("a", b"123456", None, None, ttl=60)
+        time.sleep(0.01)
+        cache.put("b", b"123456", None, None, ttl=60)
+        assert cache.get("a") is None
+        assert cache.get("b") is not None
+        cache.close()
+
+
+def test_client_iter_csv_streams_rows():
+    client = HydrologyClient(rate_limit=None)
+    resp = _response(200)
+    resp.encoding = None
+    resp.iter_lines.return_value = iter(["dateTime,value", "2024-01-01T00:00:00,1.5", ""])
+    with patch.object(client.session, "get", return_value=resp) as mock_get:
+        rows = list(client.iter_csv("https://example.com/readings.csv"))
+
+    assert rows == [["dateTime", "value"], ["2024-01-01T00:00:00", "1.5"]]
+    assert mock_get.call_args.kwargs["stream"] is True
+    resp.close.assert_called_once()
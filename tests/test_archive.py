@@ -0,0 +1,60 @@
+import math
+import tempfile
+from pathlib import Path
+
+from src.hydrology_pipeline import archive
+from src.hydrology_pipeline.archive import MeasureArchive, export_archive
+from src.hydrology_pipeline.db import connect, init_db, insert_measurement_tuples
+from src.hydrology_pipeline.transform import epoch_to_iso
+
+
+def _rows(start, count):
+    return [
+        ("S1", "conductivity", "M1", epoch_to_iso(e), None if e % 3600 == 0 else float(e), "Good")
+        for e in range(start, start + count * 900, 900)
+    ]
+
+
+def test_export_appends_and_reader_slices_by_time(monkeypatch):
+    monkeypatch.setattr(archive, "BLOCK_ROWS", 4)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        init_db(conn)
+        archive_dir = Path(tmpdir) / "archive"
+        insert_measurement_tuples(conn, _rows(0, 10))
+        assert export_archive(conn, archive_dir) == 10
+        insert_measurement_tuples(conn, _rows(9000, 5))
+        assert export_archive(conn, archive_dir) == 5
+        assert export_archive(conn, archive_dir) == 0
+        conn.close()
+
+        with MeasureArchive(archive_dir, "M1") as measure:
+            assert measure.rows == 15
+            epochs, values, qualities = measure.slice(1800, 10800)
+            assert list(epochs) == list(range(1800, 10800, 900))
+            assert values.format == "d" and values[0] == 1800.0 and math.isnan(values[2])
+            assert {measure.quality_labels[q] for q in qualities} == {"Good"}
+            assert len(measure.slice(20000)[0]) == 0
+            assert len(measure.slice()[0]) == 15
+            del epochs, values, qualities
+
+
+def test_reader_ignores_unpublished_tail():
+    """Rows written after the last index update (e.g. a crashed export) are not exposed."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        init_db(conn)
+        archive_dir = Path(tmpdir) / "archive"
+        insert_measurement_tuples(conn, _rows(0, 3))
+        export_archive(conn, archive_dir)
+        with open(archive.measure_dir(archive_dir, "M1") / "epoch.i64", "ab") as f:
+            f.write(b"\0" * 16)
+
+        with MeasureArchive(archive_dir, "M1") as measure:
+            assert list(measure.slice()[0]) == [0, 900, 1800]
+
+        insert_measurement_tuples(conn, _rows(2700, 1))
+        assert export_archive(conn, archive_dir) == 1
+        conn.close()
+        with MeasureArchive(archive_dir, "M1") as measure:
+            assert list(measure.slice()[0]) == [0, 900, 1800, 2700]
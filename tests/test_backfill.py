@@ -0,0 +1,102 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.hydrology_pipeline.backfill import plan_chunks, repair_gaps, run_backfill
+from src.hydrology_pipeline.config import PipelineConfig
+from src.hydrology_pipeline.db import connect, find_gaps, init_db, insert_measurement_tuples, upsert_measures
+from src.hydrology_pipeline.transform import MeasureRow, epoch_to_iso, parse_epoch
+from tests.conftest import station_payload
+
+DAY = 86400
+
+
+def test_plan_chunks_aligns_boundaries_and_skips_completed():
+    """Chunks are aligned to the chunk size and completed ranges are not planned again."""
+    start = 10 * DAY + 3600
+    assert plan_chunks(start, 13 * DAY, DAY) == [(start, 11 * DAY), (11 * DAY, 12 * DAY), (12 * DAY, 13 * DAY)]
+    assert plan_chunks(start, 13 * DAY, DAY, completed=[(10 * DAY, 12 * DAY)]) == [(12 * DAY, 13 * DAY)]
+    assert plan_chunks(start, start, DAY) == []
+
+
+def test_backfill_resumes_only_missing_chunks():
+    """An interrupted backfill is resumed from its checkpoints, refetching only the failed chunk."""
+    fetched = []
+    fail = {"2024-01-02T00:00:00+00:00"}
+
+    def history(measure_id, since=None, until=None, page_size=2000, timeout=30):
+        fetched.append((measure_id, since))
+        if "cond" in measure_id and since in fail:
+            raise ConnectionError("connection reset")
+        lo, hi = parse_epoch(since), parse_epoch(until)
+        yield [{"dateTime": epoch_to_iso(e), "value": 1.0, "quality": "Good"} for e in range(lo, hi, 6 * 3600)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        config = PipelineConfig(
+            station_notation="S1",
+            required_station_label=None,
+            db_path=db_path,
+            since="2024-01-01T00:00:00Z",
+            until="2024-01-04T00:00:00Z",
+        )
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.iter_readings", side_effect=history):
+            with pytest.raises(ConnectionError):
+                run_backfill([config], chunk_days=1, max_workers=4)
+            assert len(fetched) == 6
+
+            fetched.clear()
+            fail.clear()
+            inserted = run_backfill([config], chunk_days=1, max_workers=4)
+
+        assert fetched == [("S1-cond-i-subdaily-uS", "2024-01-02T00:00:00+00:00")]
+        assert inserted == 4
+        conn = sqlite3.connect(str(db_path))
+        assert conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0] == 24
+        assert conn.execute("SELECT COUNT(*), SUM(rows) FROM backfill_chunks").fetchone() == (6, 24)
+        conn.close()
+
+
+def test_repair_fetches_only_gaps_and_flags_upstream_holes():
+    """Repair requests exactly the missing intervals; holes the API cannot fill are not fetched again."""
+    base = parse_epoch("2024-01-01T00:00:00Z")
+    fetched = []
+
+    def history(measure_id, since=None, until=None, page_size=2000, timeout=30):
+        fetched.append((since, until))
+        # 01:45 is missing upstream as well
+        lo = parse_epoch(since)
+        epochs = [e for e in range(lo + -lo % 900, parse_epoch(until), 900) if e != base + 6300]
+        yield [{"dateTime": epoch_to_iso(e), "value": 1.0} for e in epochs]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        conn = connect(db_path)
+        init_db(conn)
+        upsert_measures(conn, [MeasureRow("M1", "S1", "conductivity", "uS/cm", 900, "instantaneous", None)])
+        insert_measurement_tuples(conn, [
+            ("S1", "conductivity", "M1", epoch_to_iso(base + m * 60), 1.0, None) for m in (0, 15, 60, 75, 150)
+        ])
+        conn.close()
+
+        config = PipelineConfig(station_notation="S1", required_station_label=None, db_path=db_path)
+        with patch("src.hydrology_pipeline.pipeline.iter_readings", side_effect=history):
+            assert repair_gaps(config, station_ids=["S2"]) == 0
+            assert fetched == []
+            assert repair_gaps(config, max_workers=2, station_ids=["S1"]) == 5
+            assert sorted(fetched) == [
+                ("2024-01-01T00:15:01+00:00", "2024-01-01T01:00:00+00:00"),
+                ("2024-01-01T01:15:01+00:00", "2024-01-01T02:30:00+00:00"),
+            ]
+            fetched.clear()
+            assert repair_gaps(config) == 0
+            assert fetched == []
+
+        conn = connect(db_path)
+        assert [g[3:] for g in find_gaps(conn, include_checked=True)] == [(base + 5400, base + 7200, 1)]
+        conn.close()
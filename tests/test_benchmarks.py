@@ -0,0 +1,28 @@
+from unittest.mock import patch
+
+from benchmarks.fake_api import FakeHydrologyApi
+from benchmarks.run import check_regressions
+from src.hydrology_pipeline.api_client import HydrologyClient
+from src.hydrology_pipeline.extract import fetch_station_by_notation, iter_readings
+
+
+def test_fake_api_serves_paginated_history():
+    """The stand-in honours the paging and time filters the extractors send."""
+    with FakeHydrologyApi(stations=1, readings_per_measure=25) as api, \
+         HydrologyClient(rate_limit=None) as client, \
+         patch("src.hydrology_pipeline.extract.BASE_URL", api.base_url), \
+         patch("src.hydrology_pipeline.api_client.get_default_client", return_value=client):
+        station = fetch_station_by_notation("FAKE0000")
+        pages = list(iter_readings(api.measure_ids("FAKE0000")[0], since="2024-01-01T01:00:00Z", page_size=10))
+
+    assert len(station["measures"]) == 2
+    assert [len(p) for p in pages] == [10, 10, 1]
+    assert pages[0][0]["dateTime"] == "2024-01-01T01:00:00+00:00"
+    assert api.requests == 4
+
+
+def test_check_regressions_flags_throughput_and_memory():
+    baseline = {"extract": {"rows_per_s": 1000.0, "peak_rss_mb": 50.0}}
+    assert check_regressions({"extract": {"rows_per_s": 900.0, "peak_rss_mb": 55.0}}, baseline, 0.15) == []
+    problems = check_regressions({"extract": {"rows_per_s": 800.0, "peak_rss_mb": 60.0}}, baseline, 0.15)
+    assert len(problems) == 2 and problems[0].startswith("extract: 800 rows/s")
@@ -0,0 +1,72 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from src.hydrology_pipeline.config import MIN_POLL_INTERVAL, PipelineConfig
+from src.hydrology_pipeline.daemon import PollingDaemon
+from tests.conftest import station_payload
+
+
+def _latest(measure_id, limit=10, timeout=30):
+    return [
+        {"dateTime": "2024-01-01T00:00:00Z", "value": 1.0},
+        {"dateTime": "2024-01-01T00:15:00Z", "value": 2.0},
+    ]
+
+
+def test_daemon_polls_from_high_water_mark_on_observed_cadence():
+    """The first poll fetches the latest readings; later polls resume from the newest stored one."""
+    def history(measure_id, since=None, until=None, page_size=2000, timeout=30):
+        yield [{"dateTime": since, "value": 2.0}, {"dateTime": "2024-01-01T00:30:00Z", "value": 3.0}]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        config = PipelineConfig(station_notation="S1", required_station_label=None, db_path=db_path)
+        # One worker and no delay between polls: cond, do, cond, do.
+        daemon = PollingDaemon([config], max_workers=1, jitter=0.0)
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)) as mock_station, \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure", side_effect=_latest), \
+             patch("src.hydrology_pipeline.pipeline.iter_readings", side_effect=history) as mock_iter, \
+             patch.object(PollingDaemon, "_jittered", return_value=0.0):
+            daemon.run_forever(max_polls=4)
+
+        assert mock_station.call_count == 1
+        assert [c.kwargs["since"] for c in mock_iter.call_args_list] == ["2024-01-01T00:15:00+00:00"] * 2
+        assert {(t.period, t.since) for t in daemon._heap} == {(900, "2024-01-01T00:30:00+00:00")}
+        conn = sqlite3.connect(str(db_path))
+        assert conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0] == 6
+        conn.close()
+
+
+def test_daemon_backs_off_after_failed_write_without_advancing():
+    bad = [{"dateTime": "not-a-date", "value": 1.0}]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = PipelineConfig(station_notation="S1", required_station_label=None, db_path=Path(tmpdir) / "t.db")
+        daemon = PollingDaemon([config], max_workers=2, jitter=0.0)
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure", return_value=bad):
+            daemon.run_forever(max_polls=2)
+
+    assert [(t.failures, t.since, t.broken) for t in daemon._heap] == [(1, None, False), (1, None, False)]
+
+
+def test_daemon_poll_period_ignores_bursts_and_has_a_floor():
+    """A corrected reading seconds after another does not shrink the cadence; a burst-only measure is floored."""
+    def latest(measure_id, limit=10, timeout=30):
+        if "-cond-" in measure_id:
+            return [{"dateTime": f"2024-01-01T00:00:{s:02d}Z", "value": 1.0} for s in range(0, 30, 5)]
+        times = ["00:00:00", "00:00:02", "00:15:00", "00:30:00", "00:45:00", "01:00:00"]
+        return [{"dateTime": f"2024-01-01T{t}Z", "value": 1.0} for t in times]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = PipelineConfig(station_notation="S1", required_station_label=None, db_path=Path(tmpdir) / "t.db")
+        daemon = PollingDaemon([config], max_workers=1, jitter=0.0)
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure", side_effect=latest):
+            daemon.run_forever(max_polls=2)
+
+    assert sorted(t.period for t in daemon._heap) == [MIN_POLL_INTERVAL, 900]
@@ -1,7 +1,19 @@
 import tempfile
 from pathlib import Path
-from src.hydrology_pipeline.db import connect, init_db, upsert_station, insert_measurements
-from src.hydrology_pipeline.transform import StationRow, MeasurementRow
+from src.hydrology_pipeline.db import (
+    connect,
+    find_gaps,
+    find_measures,
+    get_high_water_marks,
+    init_db,
+    insert_measurement_tuples,
+    insert_measurements,
+    rebuild_gaps,
+    rebuild_rollups,
+    upsert_measures,
+    upsert_station,
+)
+from src.hydrology_pipeline.transform import MeasureRow, MeasurementRow, StationRow, epoch_to_iso
 
 def test_db_upsert_and_insert():
     """Ensure station upsert is idempotent and duplicate measurements are ignored."""
@@ -19,3 +31,147 @@ def test_db_upsert_and_insert():
         # Check data
         cur = conn.execute("SELECT COUNT(*) FROM measurements WHERE station_id='S1'")
         assert cur.fetchone()[0] == 1
+
+def test_get_high_water_marks():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        init_db(conn)
+        upsert_station(conn, StationRow("S1", "Test", 1.0, 2.0, None, None))
+        insert_measurements(conn, [
+            MeasurementRow("S1", "conductivity", "M1", "2024-01-01T00:00:00+00:00", 1.0, None),
+            MeasurementRow("S1", "conductivity", "M1", "2024-01-01T00:15:00+00:00", 2.0, None),
+        ])
+        marks = get_high_water_marks(conn, ["M1", "M2"])
+        assert marks == {"M1": "2024-01-01T00:15:00+00:00"}
+
+def test_chunked_insert_counts_only_new_rows():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db", wal=True)
+        init_db(conn)
+        upsert_station(conn, StationRow("S1", "Test", 1.0, 2.0, None, None))
+        rows = [
+            ("S1", "conductivity", "M1", f"2024-01-01T00:{m:02d}:00+00:00", float(m), "Good")
+            for m in range(0, 60, 15)
+        ]
+        assert insert_measurement_tuples(conn, rows[:2], batch_size=1) == 2
+        assert insert_measurement_tuples(conn, rows + rows, batch_size=3) == 2
+        assert conn.execute("SELECT COUNT(*) FROM measurements").fetchone()[0] == 4
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        conn.close()
+
+def test_find_measures_prefers_instantaneous_preferred_unit():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        init_db(conn)
+        upsert_measures(conn, [
+            MeasureRow("S1-do-i-subdaily-%", "S1", "dissolved-oxygen", "%", 900, "instantaneous", None),
+            MeasureRow("S1-do-i-subdaily-mgL", "S1", "dissolved-oxygen", "mg/L", 900, "instantaneous", None),
+            MeasureRow("S1-do-m-86400-mgL", "S1", "dissolved-oxygen", "mg/L", 86400, "mean", None),
+            MeasureRow("S2-ph-i-subdaily", "S2", "ph", None, 900, "instantaneous", None),
+        ])
+        found = find_measures(conn, ["S1", "S2", "S3"], ["dissolved-oxygen", "pH"])
+        assert found == {
+            "S1": {"dissolved-oxygen": "S1-do-i-subdaily-mgL"},
+            "S2": {"ph": "S2-ph-i-subdaily"},
+        }
+
+def test_init_db_migrates_v1_measurements_table():
+    """A version 1 text fact table is moved into the compact readings layout."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        conn.executescript(
+            """
+            CREATE TABLE stations (station_id TEXT PRIMARY KEY, label TEXT NOT NULL, lat REAL NOT NULL,
+                long REAL NOT NULL, river_name TEXT, date_opened TEXT, extracted_at TEXT);
+            CREATE TABLE measurements (station_id TEXT NOT NULL, observed_property TEXT NOT NULL,
+                measure_id TEXT NOT NULL, date_time TEXT NOT NULL, value REAL, quality TEXT,
+                ingested_at TEXT DEFAULT (datetime('now')), PRIMARY KEY (measure_id, date_time));
+            INSERT INTO stations VALUES ('S1', 'Test', 1.0, 2.0, NULL, NULL, NULL);
+            INSERT INTO measurements(station_id, observed_property, measure_id, date_time, value, quality) VALUES
+                ('S1', 'conductivity', 'M1', '2024-01-01T00:00:00', 1.0, 'Good'),
+                ('S1', 'conductivity', 'M1', '2024-01-01T00:00:00+00:00', 1.0, 'Good'),
+                ('S1', 'conductivity', 'M1', '2024-01-01T00:15:00+00:00', 2.0, 'Odd');
+            """
+        )
+        init_db(conn)
+
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 3
+        assert conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0] == 2
+        assert conn.execute("SELECT n FROM rollups WHERE grain = 86400").fetchall() == [(2,)]
+        rows = conn.execute("SELECT date_time, value, quality FROM measurements ORDER BY date_time").fetchall()
+        assert rows == [("2024-01-01T00:00:00+00:00", 1.0, "Good"), ("2024-01-01T00:15:00+00:00", 2.0, "Odd")]
+
+        # New inserts land next to the migrated rows and dedupe against them.
+        row = MeasurementRow("S1", "conductivity", "M1", "2024-01-01T00:15:00+00:00", 2.0, None)
+        assert insert_measurements(conn, [row]) == 0
+        init_db(conn)
+        conn.close()
+
+def test_inserts_maintain_rollups_and_rebuild_matches():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        init_db(conn)
+        upsert_station(conn, StationRow("S1", "Test", 1.0, 2.0, None, None))
+        rows = [
+            ("S1", "conductivity", "M1", f"2024-01-01T{h:02d}:{m:02d}:00+00:00", float(m), "Good")
+            for h in (0, 1)
+            for m in range(0, 60, 15)
+        ]
+        insert_measurement_tuples(conn, rows[:3])
+        insert_measurement_tuples(conn, rows[3:] + rows[:3])
+        insert_measurement_tuples(conn, [("S1", "conductivity", "M1", "2024-01-02T00:00:00+00:00", 5.0, None)])
+
+        sql = "SELECT grain, bucket, n, total, minimum, maximum, sumsq FROM rollups ORDER BY grain, bucket"
+        maintained = conn.execute(sql).fetchall()
+        assert maintained == [
+            (3600, 1704067200, 4, 90.0, 0.0, 45.0, 3150.0),
+            (3600, 1704070800, 4, 90.0, 0.0, 45.0, 3150.0),
+            (3600, 1704153600, 1, 5.0, 5.0, 5.0, 25.0),
+            (86400, 1704067200, 8, 180.0, 0.0, 45.0, 6300.0),
+            (86400, 1704153600, 1, 5.0, 5.0, 5.0, 25.0),
+        ]
+        assert rebuild_rollups(conn) == 5
+        assert conn.execute(sql).fetchall() == maintained
+        conn.close()
+
+def test_inserts_maintain_gaps_and_rebuild_matches():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        init_db(conn)
+        upsert_measures(conn, [MeasureRow("M1", "S1", "conductivity", "uS/cm", 900, "instantaneous", None)])
+
+        def row(minute):
+            return ("S1", "conductivity", "M1", f"2024-01-01T{minute // 60:02d}:{minute % 60:02d}:00+00:00", 1.0, None)
+
+        # Readings every 15 minutes with 00:30-00:45 and 01:30-02:30 missing
+        insert_measurement_tuples(conn, [row(m) for m in (0, 15, 60, 75)])
+        insert_measurement_tuples(conn, [row(m) for m in (165, 180)])
+        base = 1704067200
+        assert [g[3:] for g in find_gaps(conn)] == [
+            (base + 900, base + 3600, 2),
+            (base + 4500, base + 9900, 5),
+        ]
+
+        # Filling part of the second hole splits it; rebuilding finds the same gaps.
+        insert_measurement_tuples(conn, [row(120)])
+        maintained = [g[3:] for g in find_gaps(conn)]
+        assert maintained == [(base + 900, base + 3600, 2), (base + 4500, base + 7200, 2), (base + 7200, base + 9900, 2)]
+        assert rebuild_gaps(conn) == 3
+        assert [g[3:] for g in find_gaps(conn)] == maintained
+        conn.close()
+
+def test_off_cadence_reading_does_not_shrink_the_gap_period():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        init_db(conn)
+        upsert_measures(conn, [MeasureRow("M1", "S1", "conductivity", "uS/cm", None, "instantaneous", None)])
+
+        def row(second):
+            return ("S1", "conductivity", "M1", epoch_to_iso(1704067200 + second), 1.0, None)
+
+        # Every 15 minutes for three hours, 01:30 missing, plus one reading a minute after 02:45
+        seconds = [m * 60 for m in range(0, 181, 15) if m != 90] + [9960]
+        insert_measurement_tuples(conn, [row(s) for s in seconds])
+        assert [g[3:] for g in find_gaps(conn)] == [(1704067200 + 4500, 1704067200 + 6300, 1)]
+        conn.close()
+
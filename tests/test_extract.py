@@ -4,6 +4,9 @@ from unittest.mock import patch
 from src.hydrology_pipeline.extract import (
     resolve_measures_from_station,
     fetch_latest_readings_for_measure,
+    iter_readings,
+    iter_readings_csv,
+    iter_station_readings,
 )
 
 def test_resolve_measures_invalid_param():
@@ -38,3 +41,48 @@ def test_fetch_latest_readings_uses_sort_and_limit():
 def test_fetch_latest_readings_limit_must_be_positive():
     with pytest.raises(ValueError):
         fetch_latest_readings_for_measure("MEASURE_ID", limit=0)
+
+def test_iter_readings_walks_offset_pages():
+    """Pages are requested by _offset until a short page is returned."""
+    pages = [
+        {"items": [{"dateTime": "2024-01-01T00:00:00Z"}, {"dateTime": "2024-01-01T00:15:00Z"}]},
+        {"items": [{"dateTime": "2024-01-01T00:30:00Z"}]},
+    ]
+
+    with patch("src.hydrology_pipeline.extract.get_json", side_effect=pages) as mock_get:
+        out = list(iter_readings("MEASURE_ID", since="2024-01-01T00:00:00Z", page_size=2))
+
+    assert [len(p) for p in out] == [2, 1]
+    offsets = [c.kwargs["params"]["_offset"] for c in mock_get.call_args_list]
+    assert offsets == [0, 2]
+    assert mock_get.call_args.kwargs["params"]["mineq-dateTime"] == "2024-01-01T00:00:00Z"
+    assert mock_get.call_args.kwargs["params"]["_sort"] == "dateTime"
+
+def test_iter_station_readings_splits_pages_by_measure():
+    page = {"items": [
+        {"measure": {"@id": "https://example.com/measures/M1"}, "dateTime": "2024-01-01T00:00:00Z"},
+        {"measure": {"@id": "https://example.com/measures/M2"}, "dateTime": "2024-01-01T00:00:00Z"},
+        {"measure": {"@id": "https://example.com/measures/M1"}, "dateTime": "2024-01-01T00:15:00Z"},
+    ]}
+
+    with patch("src.hydrology_pipeline.extract.get_json", return_value=page) as mock_get:
+        out = list(iter_station_readings(["M1", "M2"], since="2024-01-01T00:00:00Z", page_size=10))
+
+    assert mock_get.call_count == 1
+    assert mock_get.call_args.kwargs["params"]["measure"] == ["M1", "M2"]
+    assert {k: len(v) for k, v in out[0].items()} == {"M1": 2, "M2": 1}
+
+def test_iter_readings_csv_yields_fixed_size_tuple_batches():
+    csv_rows = [
+        ["measure", "dateTime", "date", "value", "completeness", "quality", "qcode"],
+        ["M1", "2024-01-01T00:00:00", "2024-01-01", "1.5", "", "Good", ""],
+        ["M1", "2024-01-01T00:15:00", "2024-01-01", "1.6", "", "Good", ""],
+        ["M1", "2024-01-01T00:30:00", "2024-01-01", "", "", "Missing", ""],
+    ]
+
+    with patch("src.hydrology_pipeline.extract.iter_csv", return_value=iter(csv_rows)):
+        batches = list(iter_readings_csv("M1", since="2024-01-01", batch_size=2))
+
+    assert [len(b) for b in batches] == [2, 1]
+    assert batches[0][0] == ("2024-01-01T00:00:00", "1.5", "Good")
+    assert batches[1][0] == ("2024-01-01T00:30:00", "", "Missing")
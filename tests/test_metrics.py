@@ -0,0 +1,57 @@
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from src.hydrology_pipeline import metrics
+from src.hydrology_pipeline.config import PipelineConfig
+from src.hydrology_pipeline.metrics import MetricsRegistry
+from src.hydrology_pipeline.pipeline import run_many
+from tests.conftest import latest_readings, station_payload
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.inc("http_requests_total", endpoint="stations", status=200)
+    registry.inc("http_requests_total", endpoint="stations", status=200)
+    with registry.span("insert"):
+        pass
+    registry.observe("http_request_seconds", 0.3, endpoint='a"b')
+
+    text = registry.to_prometheus()
+    assert '# TYPE hydrology_http_requests_total counter' in text
+    assert 'hydrology_http_requests_total{endpoint="stations",status="200"} 2' in text
+    assert 'hydrology_http_request_seconds_bucket{endpoint="a\\"b",le="0.25"} 0' in text
+    assert 'hydrology_http_request_seconds_bucket{endpoint="a\\"b",le="0.5"} 1' in text
+    assert 'hydrology_stage_seconds_count{stage="insert"} 1' in text
+    assert registry.report()["stages"]["insert"]["count"] == 1
+
+
+def test_prometheus_counters_keep_every_digit():
+    """Large counters are written exactly, not rounded to six significant digits."""
+    registry = MetricsRegistry()
+    registry.inc("rows_inserted_total", 12345678)
+    registry.inc("bytes_total", 2.5)
+
+    text = registry.to_prometheus()
+    assert "hydrology_rows_inserted_total 12345678\n" in text
+    assert "hydrology_bytes_total 2.5\n" in text
+
+
+def test_run_many_reports_stage_timings_and_row_counters():
+    metrics.REGISTRY.reset()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = PipelineConfig(station_notation="S1", required_station_label=None, db_path=Path(tmpdir) / "t.db")
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure", side_effect=latest_readings):
+            run_many([config])
+            run_many([config])
+        metrics.REGISTRY.write_json(Path(tmpdir) / "report.json")
+        assert (Path(tmpdir) / "report.json").exists()
+
+    report = metrics.REGISTRY.report()
+    assert {"run", "station_fetch", "measure_resolution", "transform", "insert"} <= set(report["stages"])
+    counters = {name: sum(s["value"] for s in series) for name, series in report["counters"].items()}
+    assert counters["rows_inserted_total"] == 4
+    assert counters["rows_skipped_total"] == 4
+    assert counters["rows_normalized_total"] == 8
@@ -0,0 +1,113 @@
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from src.hydrology_pipeline.backfill import run_backfill
+from src.hydrology_pipeline.config import PipelineConfig
+from src.hydrology_pipeline.db import connect, init_db
+from src.hydrology_pipeline.partitions import PartitionedStore, catalog_path, list_years
+from src.hydrology_pipeline.pipeline import run_many
+from src.hydrology_pipeline.query import get_series, resample
+from src.hydrology_pipeline.transform import MeasurementRow, epoch_to_iso, parse_epoch
+from tests.conftest import station_payload
+
+
+def test_partitioned_store_routes_by_year_and_attaches_only_needed_shards():
+    """Readings land in their year's shard; a reader attaches only the years its range overlaps."""
+    start = parse_epoch("2022-12-31T23:00:00Z")
+    rows = [
+        MeasurementRow("S1", "conductivity", "M1", epoch_to_iso(start + h * 3600), float(h), "Good")
+        for h in range(0, 366 * 24 + 2, 6)
+    ]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / "store"
+        catalog = connect(catalog_path(root))
+        init_db(catalog)
+        store = PartitionedStore(root, catalog)
+        assert store.insert_measurements(rows) == len(rows)
+        assert store.insert_measurements(rows) == 0
+        assert list_years(root) == [2022, 2023, 2024]
+        assert store.high_water_marks(["M1"]) == {"M1": rows[-1].date_time}
+
+        lo, hi = parse_epoch("2022-12-31T00:00:00Z"), parse_epoch("2023-01-02T00:00:00Z")
+        reader = store.reader(lo, hi)
+        assert [r[1] for r in reader.execute("PRAGMA database_list;")][2:] == ["y2022", "y2023"]
+        assert list(get_series(reader, "S1", "conductivity", lo, hi).values) == [0.0, 6.0, 12.0, 18.0, 24.0]
+        assert len(resample(reader, "S1", "conductivity", lo, hi, freq="1d", agg="count")) == 2
+        reader.close()
+
+        assert store.drop_before(2023) == [2022]
+        assert list_years(root) == [2023, 2024]
+        store.close()
+        catalog.close()
+
+
+def test_run_many_partitioned_resumes_from_newest_shard():
+    """A partitioned run writes readings to yearly shards and incremental runs resume from them."""
+    def readings(measure_id, limit=10, timeout=30):
+        return [
+            {"dateTime": "2023-12-31T23:45:00Z", "value": 1.0, "quality": "Good"},
+            {"dateTime": "2024-01-01T00:15:00Z", "value": 2.0, "quality": "Good"},
+        ]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / "store"
+        config = PipelineConfig(station_notation="S1", required_station_label=None, db_path=root, partitioned=True)
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure", side_effect=readings):
+            assert run_many([config]) == 4
+
+        incremental = PipelineConfig(
+            station_notation="S1", required_station_label=None, db_path=root, partitioned=True, incremental=True
+        )
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.iter_readings", return_value=iter([])) as mock_iter:
+            run_many([incremental])
+
+        assert list_years(root) == [2023, 2024]
+        catalog = connect(catalog_path(root))
+        assert catalog.execute("SELECT COUNT(*) FROM stations").fetchone()[0] == 1
+        assert catalog.execute("SELECT COUNT(*) FROM readings").fetchone()[0] == 0
+        reader = PartitionedStore(root, catalog).reader()
+        assert reader.execute("SELECT COUNT(*) FROM measurements").fetchone()[0] == 4
+        reader.close()
+        catalog.close()
+
+    assert {c.kwargs["since"] for c in mock_iter.call_args_list} == {"2024-01-01T00:15:00+00:00"}
+
+
+def test_backfill_after_drop_refetches_dropped_years():
+    """Dropping a year also forgets its backfill checkpoints, so backfilling it again reloads it."""
+    def history(measure_id, since=None, until=None, page_size=2000, timeout=30):
+        lo, hi = parse_epoch(since), parse_epoch(until)
+        yield [{"dateTime": epoch_to_iso(e), "value": 1.0, "quality": "Good"} for e in range(lo, hi, 6 * 3600)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / "store"
+        config = PipelineConfig(
+            station_notation="S1",
+            required_station_label=None,
+            db_path=root,
+            partitioned=True,
+            since="2023-12-31T00:00:00Z",
+            until="2024-01-02T00:00:00Z",
+        )
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.iter_readings", side_effect=history) as mock_iter:
+            assert run_backfill([config], chunk_days=1) == 16
+
+            catalog = connect(catalog_path(root))
+            store = PartitionedStore(root, catalog)
+            assert store.drop_before(2024) == [2023]
+            assert catalog.execute("SELECT COUNT(*) FROM backfill_chunks").fetchone()[0] == 2
+            store.close()
+            catalog.close()
+
+            mock_iter.reset_mock()
+            assert run_backfill([config], chunk_days=1) == 8
+
+        assert [c.kwargs["since"] for c in mock_iter.call_args_list] == ["2023-12-31T00:00:00+00:00"] * 2
+        assert list_years(root) == [2023, 2024]
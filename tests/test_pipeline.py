@@ -0,0 +1,291 @@
+import dataclasses
+import json
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.hydrology_pipeline.config import PipelineConfig, load_manifest
+from src.hydrology_pipeline.db import connect, get_high_water_marks, init_db, insert_batches, upsert_measures
+from src.hydrology_pipeline.pipeline import run_many, sync_station_catalogue
+from src.hydrology_pipeline.transform import MeasureRow
+from tests.conftest import latest_readings, station_payload
+
+
+def test_run_many_loads_all_stations():
+    """Every station's measures are fetched and written through one writer."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        configs = [
+            PipelineConfig(station_notation=s, required_station_label=None, db_path=db_path)
+            for s in ("S1", "S2", "S3")
+        ]
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure",
+                   side_effect=latest_readings):
+            inserted = run_many(configs, max_workers=4)
+
+        assert inserted == 12
+        conn = sqlite3.connect(str(db_path))
+        assert conn.execute("SELECT COUNT(*) FROM stations").fetchone()[0] == 3
+        conn.close()
+
+
+def test_run_many_reports_failed_station_after_others():
+    """A failing station is re-raised only after the other stations are loaded."""
+    def fetch_station(notation, timeout=30):
+        if notation == "BAD":
+            raise ValueError("No station found for notation=BAD")
+        return station_payload(notation)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        configs = [
+            PipelineConfig(station_notation=s, required_station_label=None, db_path=db_path)
+            for s in ("S1", "BAD")
+        ]
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation", side_effect=fetch_station), \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure", side_effect=latest_readings):
+            with pytest.raises(ValueError):
+                run_many(configs, max_workers=2)
+
+        conn = sqlite3.connect(str(db_path))
+        assert conn.execute("SELECT COUNT(*) FROM measurements").fetchone()[0] == 4
+        conn.close()
+
+
+def test_run_many_invalid_reading_fails_only_its_station():
+    """A page that fails validation is reported for its station while the other stations still load."""
+    def readings(measure_id, limit=10, timeout=30):
+        if measure_id.startswith("BAD"):
+            return [{"dateTime": "not a date", "value": 1.0}]
+        return latest_readings(measure_id)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        configs = [
+            PipelineConfig(station_notation=s, required_station_label=None, db_path=db_path)
+            for s in ("S1", "BAD", "S2")
+        ]
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure", side_effect=readings):
+            with pytest.raises(ValueError, match="Invalid reading"):
+                run_many(configs, max_workers=2)
+
+        conn = sqlite3.connect(str(db_path))
+        assert conn.execute("SELECT station_id, COUNT(*) FROM measurements GROUP BY station_id").fetchall() == [
+            ("S1", 4),
+            ("S2", 4),
+        ]
+        conn.close()
+
+
+def test_run_many_drops_pages_after_a_failed_page():
+    """Pages after one that fails validation are not committed, so the high-water mark stays before it."""
+    def pages(measure_id, since=None, until=None, page_size=2000, timeout=30):
+        if "-do-" in measure_id:
+            return
+        yield [{"dateTime": "2024-01-01T00:00:00Z", "value": 1.0}]
+        yield [{"dateTime": "not a date", "value": 2.0}, {"dateTime": "2024-01-01T00:15:00Z", "value": 2.0}]
+        yield [{"dateTime": "2024-01-01T00:30:00Z", "value": 3.0}]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        config = PipelineConfig(
+            station_notation="S1",
+            required_station_label=None,
+            db_path=db_path,
+            since="2024-01-01T00:00:00Z",
+        )
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.iter_readings", side_effect=pages):
+            with pytest.raises(ValueError, match="Invalid reading"):
+                run_many([config], commit_rows=1)
+
+        conn = connect(db_path)
+        assert conn.execute("SELECT date_time FROM measurements").fetchall() == [("2024-01-01T00:00:00+00:00",)]
+        assert get_high_water_marks(conn, ["S1-cond-i-subdaily-uS"]) == {
+            "S1-cond-i-subdaily-uS": "2024-01-01T00:00:00+00:00"
+        }
+        conn.close()
+
+
+def test_load_manifest_applies_defaults():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "stations.json"
+        path.write_text(json.dumps({"stations": ["S1", {"station_notation": "S2", "limit": 5}]}))
+        configs = load_manifest(path, defaults={"limit": 20})
+
+    assert [c.station_notation for c in configs] == ["S1", "S2"]
+    assert [c.limit for c in configs] == [20, 5]
+    assert configs[0].required_station_label is None
+
+
+def test_run_many_streams_history_pages_when_since_is_set():
+    """With since set, each history page is inserted as it arrives."""
+    def pages(measure_id, since=None, until=None, page_size=2000, timeout=30):
+        yield [{"dateTime": "2024-01-01T00:00:00Z", "value": 1.0}]
+        yield [{"dateTime": "2024-01-01T00:15:00Z", "value": 2.0}]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        config = PipelineConfig(
+            station_notation="S1",
+            required_station_label=None,
+            db_path=db_path,
+            since="2024-01-01T00:00:00Z",
+        )
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.iter_readings", side_effect=pages) as mock_iter, \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure") as mock_latest:
+            inserted = run_many([config])
+
+    assert inserted == 4
+    assert mock_iter.call_count == 2
+    mock_latest.assert_not_called()
+
+
+def test_run_many_groups_pages_into_bounded_commits():
+    """Normalized pages are committed together, never much more than commit_rows at once."""
+    def pages(measure_id, since=None, until=None, page_size=2000, timeout=30):
+        for p in range(3):
+            yield [{"dateTime": f"2024-01-0{p + 1}T0{h}:00:00Z", "value": float(h)} for h in range(4)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        configs = [
+            PipelineConfig(station_notation=s, required_station_label=None, db_path=db_path, since="2024-01-01T00:00:00Z")
+            for s in ("S1", "S2", "S3")
+        ]
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.iter_readings", side_effect=pages), \
+             patch("src.hydrology_pipeline.pipeline.insert_batches", wraps=insert_batches) as mock_insert:
+            inserted = run_many(configs, max_workers=4, transform_workers=2, commit_rows=8)
+
+        assert inserted == 72
+        # A commit starts once 8 rows are buffered, i.e. after at most two 4-row pages.
+        assert max(sum(map(len, c.args[1])) for c in mock_insert.call_args_list) <= 8
+        conn = sqlite3.connect(str(db_path))
+        assert conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0] == 72
+        conn.close()
+
+
+def test_run_many_lenient_stores_rejects_and_loads_valid_rows():
+    """In lenient mode a malformed reading is stored in rejected_readings instead of failing the run."""
+    def readings(measure_id, limit=10, timeout=30):
+        return [
+            {"dateTime": "2024-01-01T00:00:00Z", "value": 1.0, "quality": "Good"},
+            {"value": 2.0, "quality": "Good"},
+            {"dateTime": "2024-01-01T00:30:00Z", "value": "n/a", "quality": "Good"},
+        ]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        config = PipelineConfig(station_notation="S1", required_station_label=None, db_path=db_path)
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure", side_effect=readings):
+            with pytest.raises(ValueError, match="missing dateTime"):
+                run_many([config])
+            inserted = run_many([dataclasses.replace(config, lenient=True)])
+            run_many([dataclasses.replace(config, lenient=True)])
+
+        assert inserted == 2
+        conn = sqlite3.connect(str(db_path))
+        rejects = conn.execute(
+            "SELECT measure_id, payload, reason FROM rejected_readings ORDER BY measure_id, reason"
+        ).fetchall()
+        conn.close()
+        assert len(rejects) == 4
+        assert rejects[0] == ("S1-cond-i-subdaily-uS", '{"value": 2.0, "quality": "Good"}', "missing dateTime/date")
+        assert rejects[1][2] == "unparsable value 'n/a'"
+
+
+def test_run_many_incremental_fetches_from_high_water_mark():
+    """Known measures resume from their latest reading; unseen ones fetch the latest N."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        config = PipelineConfig(station_notation="S1", required_station_label=None, db_path=db_path)
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure", side_effect=latest_readings):
+            run_many([config])
+
+        incremental = PipelineConfig(
+            station_notation="S1", required_station_label=None, db_path=db_path, incremental=True
+        )
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.iter_readings", return_value=iter([])) as mock_iter, \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure") as mock_latest:
+            run_many([incremental])
+
+    assert mock_iter.call_count == 2
+    assert {c.kwargs["since"] for c in mock_iter.call_args_list} == {"2024-01-01T00:15:00+00:00"}
+    mock_latest.assert_not_called()
+
+
+def test_run_many_resolves_any_parameter_from_catalogue():
+    """Catalogued stations skip payload matching and accept any parameter."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        conn = connect(db_path)
+        init_db(conn)
+        upsert_measures(conn, [MeasureRow("S1-ph-i", "S1", "ph", None, 900, "instantaneous", None)])
+        conn.close()
+
+        config = PipelineConfig(station_notation="S1", required_station_label=None, db_path=db_path, params=["ph"])
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.fetch_latest_readings_for_measure",
+                   side_effect=latest_readings) as mock_latest:
+            assert run_many([config]) == 2
+
+    assert mock_latest.call_args.kwargs["measure_id"] == "S1-ph-i"
+
+
+def test_run_many_batches_measures_of_a_station():
+    """With batch_measures, one station-level request replaces one request per measure."""
+    def station_pages(measure_ids, since, until=None, page_size=2000, timeout=30):
+        yield {m: [{"dateTime": "2024-01-01T00:00:00Z", "value": 1.0}] for m in measure_ids}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config = PipelineConfig(
+            station_notation="S1",
+            required_station_label=None,
+            db_path=Path(tmpdir) / "test.db",
+            since="2024-01-01T00:00:00Z",
+            batch_measures=True,
+        )
+        with patch("src.hydrology_pipeline.pipeline.fetch_station_by_notation",
+                   side_effect=lambda n, timeout=30: station_payload(n)), \
+             patch("src.hydrology_pipeline.pipeline.iter_station_readings",
+                   side_effect=station_pages) as mock_batch, \
+             patch("src.hydrology_pipeline.pipeline.iter_readings") as mock_iter:
+            assert run_many([config]) == 2
+
+    assert mock_batch.call_count == 1
+    mock_iter.assert_not_called()
+
+
+def test_sync_station_catalogue_upserts_pages_into_spatial_index():
+    pages = [
+        [station_payload("S1"), station_payload("S2")],
+        [{"notation": "S3", "label": "No coordinates"}, station_payload("S4")],
+    ]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = Path(tmpdir) / "test.db"
+        with patch("src.hydrology_pipeline.pipeline.iter_stations", return_value=iter(pages)):
+            assert sync_station_catalogue(db_path) == 3
+
+        conn = sqlite3.connect(str(db_path))
+        assert conn.execute("SELECT COUNT(*) FROM stations").fetchone()[0] == 3
+        assert conn.execute("SELECT COUNT(*) FROM stations_rtree").fetchone()[0] == 3
+        conn.close()
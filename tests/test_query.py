@@ -0,0 +1,106 @@
+import math
+import random
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from src.hydrology_pipeline.db import connect, init_db, insert_measurement_tuples, upsert_station, upsert_stations
+from src.hydrology_pipeline.query import distance_km, freq_seconds, get_series, nearest, resample, within_bbox
+from src.hydrology_pipeline.transform import StationRow, parse_epoch
+
+
+def _load(conn):
+    init_db(conn)
+    upsert_station(conn, StationRow("S1", "Test", 1.0, 2.0, None, None))
+    rows = [
+        ("S1", "conductivity", "M1", f"2024-01-01T{h:02d}:{m:02d}:00+00:00", float(h * 60 + m), "Good")
+        for h in range(3)
+        for m in range(0, 60, 15)
+    ]
+    rows.append(("S1", "conductivity", "M1", "2024-01-01T03:00:00+00:00", None, "Missing"))
+    rows.append(("S1", "ph", "M2", "2024-01-01T00:00:00+00:00", 7.0, "Good"))
+    insert_measurement_tuples(conn, rows)
+
+
+def test_get_series_returns_window_in_time_order():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        _load(conn)
+        series = get_series(conn, "S1", "conductivity", "2024-01-01T01:00:00Z", "2024-01-01T04:00:00Z")
+        conn.close()
+
+    assert len(series) == 9
+    assert series.epochs[0] == parse_epoch("2024-01-01T01:00:00Z")
+    assert list(series.values[:4]) == [60.0, 75.0, 90.0, 105.0]
+    assert math.isnan(series.values[-1])
+    assert series.epochs.typecode == "q" and series.values.typecode == "d"
+
+
+def test_resample_buckets_in_sql():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        _load(conn)
+        start, end = "2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z"
+        means = resample(conn, "S1", "conductivity", start, end, freq="1h", agg="mean")
+        counts = resample(conn, "S1", "conductivity", start, end, freq="1d", agg="count")
+        conn.close()
+
+    base = parse_epoch(start)
+    assert list(means.epochs) == [base, base + 3600, base + 7200, base + 10800]
+    assert list(means.values[:3]) == [22.5, 82.5, 142.5]
+    assert math.isnan(means.values[3])
+    assert list(counts.epochs) == [base] and list(counts.values) == [12.0]
+
+
+def test_resample_rejects_unknown_freq_and_agg():
+    assert freq_seconds("15min") == 900
+    with pytest.raises(ValueError):
+        freq_seconds("1w")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        init_db(conn)
+        with pytest.raises(ValueError):
+            resample(conn, "S1", "ph", 0, 1, agg="median")
+        conn.close()
+
+
+def test_resample_rollups_match_raw_aggregation():
+    """Aligned windows read rollups; unaligned ones scan readings with the same result."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        _load(conn)
+        for agg in ("mean", "min", "max", "count", "sum"):
+            aligned = resample(conn, "S1", "conductivity", "2024-01-01T00:00:00Z", "2024-01-01T03:00:00Z", agg=agg)
+            raw = resample(conn, "S1", "conductivity", "2024-01-01T00:00:00Z", "2024-01-01T02:59:59Z", agg=agg)
+            assert list(aligned.epochs) == list(raw.epochs)
+            assert list(aligned.values) == list(raw.values)
+        conn.close()
+
+
+def test_nearest_and_bbox_match_brute_force():
+    rng = random.Random(7)
+    stations = [
+        StationRow(f"S{i:04d}", f"Station {i}", rng.uniform(50, 55), rng.uniform(-4, 1), None, None)
+        for i in range(2000)
+    ]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = connect(Path(tmpdir) / "test.db")
+        init_db(conn)
+        assert upsert_stations(conn, stations) == 2000
+
+        found = nearest(conn, 53.38, -1.47, k=5)
+        expected = sorted(stations, key=lambda s: distance_km(53.38, -1.47, s.lat, s.long))[:5]
+        assert [s.station_id for s, _ in found] == [s.station_id for s in expected]
+        assert found[0][1] <= found[-1][1]
+
+        inside = within_bbox(conn, 52.0, -2.0, 52.5, -1.0)
+        assert inside == sorted(
+            (s for s in stations if 52.0 <= s.lat <= 52.5 and -2.0 <= s.long <= -1.0), key=lambda s: s.station_id
+        )
+
+        # Moving a station updates the spatial index through the upsert.
+        upsert_station(conn, StationRow("S0000", "Moved", 53.38, -1.47, None, None))
+        assert nearest(conn, 53.38, -1.47, k=1)[0][0].station_id == "S0000"
+        assert len(nearest(conn, 0.0, 0.0, k=3000)) == 2000
+        conn.close()
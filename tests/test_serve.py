@@ -0,0 +1,122 @@
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+from src.hydrology_pipeline.db import connect, init_db, insert_measurements, upsert_station
+from src.hydrology_pipeline.partitions import PartitionedStore, catalog_path
+from src.hydrology_pipeline.serve import ReadServer
+from src.hydrology_pipeline.transform import MeasurementRow, StationRow
+
+
+async def _get(reader, writer, target):
+    """Send one keep-alive GET and return (status, decoded JSON body)."""
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode()
+    length = int(next(line.split(":")[1] for line in head.split("\r\n") if line.lower().startswith("content-length")))
+    return int(head.split(" ")[1]), json.loads(await reader.readexactly(length))
+
+
+def _row(minute, value):
+    return MeasurementRow("S1", "conductivity", "M1", f"2024-01-01T00:{minute:02d}:00Z", value, "Good")
+
+
+def _database(tmpdir):
+    db_path = Path(tmpdir) / "test.db"
+    conn = connect(db_path)
+    init_db(conn)
+    upsert_station(conn, StationRow("S1", "Station 1", 53.0, -1.5, None, None))
+    insert_measurements(conn, [_row(0, 1.0), _row(15, 2.0), _row(30, 3.0)])
+    return db_path, conn
+
+
+def test_read_server_caches_results_until_the_writer_commits():
+    """Repeated queries are served from the cache; a commit by another connection invalidates it."""
+    async def scenario(db_path, writer_conn):
+        server = ReadServer(db_path, port=0, pool_size=2)
+        host, port = await server.start()
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            first = await _get(reader, writer, "/latest?station=S1&n=2")
+            assert first == (200, {"M1": [
+                {"date_time": "2024-01-01T00:15:00+00:00", "value": 2.0},
+                {"date_time": "2024-01-01T00:30:00+00:00", "value": 3.0},
+            ]})
+            assert await _get(reader, writer, "/latest?n=2&station=S1") == first
+            assert (server.cache.hits, server.cache.misses) == (1, 1)
+
+            insert_measurements(writer_conn, [_row(45, 4.0)])
+            status, body = await _get(reader, writer, "/latest?station=S1&n=2")
+            assert [r["value"] for r in body["M1"]] == [3.0, 4.0]
+            assert server.cache.hits == 1
+
+            status, body = await _get(
+                reader, writer, "/aggregate?station=S1&param=conductivity&start=1704067200&end=2024-01-01T01:00:00Z&agg=sum"
+            )
+            assert body == [{"date_time": "2024-01-01T00:00:00+00:00", "value": 10.0}]
+            status, body = await _get(reader, writer, "/stations")
+            assert [s["station_id"] for s in body] == ["S1"]
+        finally:
+            writer.close()
+            await server.close()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path, conn = _database(tmpdir)
+        asyncio.run(scenario(db_path, conn))
+        conn.close()
+
+
+def test_read_server_rejects_invalid_requests():
+    """Unknown paths answer 404 and invalid parameters 400, without being cached."""
+    async def scenario(db_path):
+        server = ReadServer(db_path, port=0, pool_size=1)
+        host, port = await server.start()
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            assert (await _get(reader, writer, "/nope"))[0] == 404
+            status, body = await _get(reader, writer, "/range?station=S1&param=conductivity")
+            assert (status, body) == (400, {"error": "Missing query parameter: start"})
+            assert (await _get(reader, writer, "/latest?station=S1&n=0"))[0] == 400
+            assert len(server.cache) == 0
+        finally:
+            writer.close()
+            await server.close()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path, conn = _database(tmpdir)
+        conn.close()
+        asyncio.run(scenario(db_path))
+
+
+def test_read_server_follows_created_and_dropped_shards():
+    """A partitioned server sees a year's shard created after startup, and stops serving a dropped one."""
+    async def scenario(root, store):
+        server = ReadServer(root, partitioned=True, port=0, pool_size=1)
+        host, port = await server.start()
+        reader, writer = await asyncio.open_connection(host, port)
+        target = "/range?station=S1&param=conductivity&start=2024-01-01T00:00:00Z&end=2026-01-01T00:00:00Z"
+        try:
+            assert [r["value"] for r in (await _get(reader, writer, target))[1]] == [1.0]
+            assert [r["value"] for r in (await _get(reader, writer, target))[1]] == [1.0]
+
+            store.insert_measurements([MeasurementRow("S1", "conductivity", "M1", "2025-06-01T00:00:00Z", 2.0, "Good")])
+            assert [r["value"] for r in (await _get(reader, writer, target))[1]] == [1.0, 2.0]
+
+            assert store.drop_before(2025) == [2024]
+            assert [r["value"] for r in (await _get(reader, writer, target))[1]] == [2.0]
+            assert (server.cache.hits, server.cache.misses) == (1, 3)
+        finally:
+            writer.close()
+            await server.close()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / "store"
+        catalog = connect(catalog_path(root))
+        init_db(catalog)
+        upsert_station(catalog, StationRow("S1", "Station 1", 53.0, -1.5, None, None))
+        store = PartitionedStore(root, catalog)
+        store.insert_measurements([_row(0, 1.0)])
+        asyncio.run(scenario(root, store))
+        store.close()
+        catalog.close()
@@ -1,5 +1,11 @@
 import pytest
-from src.hydrology_pipeline.transform import normalize_station, normalize_reading
+from src.hydrology_pipeline.transform import (
+    normalize_measure,
+    normalize_raw_readings,
+    normalize_reading,
+    normalize_readings,
+    normalize_station,
+)
 
 
 def test_normalize_station_missing_id():
@@ -21,3 +27,59 @@ def test_normalize_reading_invalid_value():
     reading = {"dateTime": "2024-01-01T00:00:00Z", "value": "bad"}
     row = normalize_reading(reading, "X", "conductivity", "M1")
     assert row.value is None
+
+
+def test_normalize_measure_reads_catalogue_fields():
+    item = {
+        "@id": "http://environment.data.gov.uk/hydrology/id/measures/abc-cond-i-subdaily-uS",
+        "notation": "abc-cond-i-subdaily-uS",
+        "parameter": "conductivity",
+        "unitName": "uS/cm",
+        "period": 900,
+        "valueType": "instantaneous",
+        "station": {"@id": "http://environment.data.gov.uk/hydrology/id/stations/abc"},
+    }
+    row = normalize_measure(item)
+    assert row.station_id == "abc"
+    assert (row.observed_property, row.unit, row.period) == ("conductivity", "uS/cm", 900)
+
+
+def test_normalize_reading_canonicalizes_to_utc():
+    row = normalize_reading({"dateTime": "2024-06-01T01:00:00+01:00"}, "X", "conductivity", "M1")
+    assert row.date_time == "2024-06-01T00:00:00+00:00"
+    naive = normalize_reading({"dateTime": "2024-06-01T00:00:00"}, "X", "conductivity", "M1")
+    assert naive.date_time == row.date_time
+
+
+def test_normalize_readings_builds_columnar_batch():
+    items = [
+        {"dateTime": "2024-01-01T00:00:00Z", "value": 1.5, "quality": "Good"},
+        {"value": 2.0},
+        {"dateTime": "2024-01-01T00:15:00", "value": "bad", "quality": "Weird"},
+        {"dateTime": "not-a-date", "value": 3.0},
+    ]
+    batch = normalize_readings(items, "X", "conductivity", "M1")
+
+    assert list(batch.epochs) == [1704067200, 1704068100]
+    assert batch.values[0] == 1.5 and batch.values[1] != batch.values[1]
+    assert [batch.quality_labels[c] for c in batch.quality_codes] == ["Good", "Weird"]
+    assert [i for i, _ in batch.rejected] == [1, 3]
+    assert list(batch.iter_tuples())[1] == ("X", "conductivity", "M1", "2024-01-01T00:15:00+00:00", None, "Weird")
+
+
+def test_normalize_readings_reject_invalid_rejects_bad_values_and_flags():
+    items = [
+        {"dateTime": "2024-01-01T00:00:00Z", "value": 1.5, "quality": "Good"},
+        {"dateTime": "2024-01-01T00:15:00Z", "value": "bad", "quality": "Good"},
+        {"dateTime": "2024-01-01T00:30:00Z", "value": 2.0, "quality": "Weird"},
+        {"dateTime": "2024-01-01T00:45:00Z", "value": None},
+    ]
+    batch = normalize_readings(items, "X", "conductivity", "M1", reject_invalid=True)
+
+    assert list(batch.epochs) == [1704067200, 1704069900]
+    assert batch.rejected == [(1, "unparsable value 'bad'"), (2, "unexpected quality flag 'Weird'")]
+
+
+def test_normalize_raw_readings_from_csv_tuples():
+    batch = normalize_raw_readings([("2024-01-01T00:00:00Z", "", "")], "X", "conductivity", "M1")
+    assert list(batch.iter_tuples()) == [("X", "conductivity", "M1", "2024-01-01T00:00:00+00:00", None, None)]